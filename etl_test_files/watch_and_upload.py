@@ -1,88 +1,332 @@
 # watch_and_upload.py
-# Usage: python watch_and_upload.py
-# Polls the folder every N seconds, and uploads new files that are stable (size unchanged across two polls).
-# Conservative default: check every 3 seconds, requires size stable for 2 checks.
+# Usage: python watch_and_upload.py [--workers 4] [--quiet-seconds 2] [--poll 3]
+# Watches this folder and uploads new or changed files once they are stable.
+#
+# - Change notifications come from watchdog (inotify on Linux, native APIs on
+#   Windows/macOS) when it is installed (pip install watchdog); otherwise the
+#   folder is rescanned every --poll seconds. A slow rescan also runs alongside
+#   watchdog as a safety net for missed events.
+# - A file counts as stable once its size and mtime have not changed for
+#   --quiet-seconds. Stability checks are scheduled on a timer heap, so many files
+#   are tracked at once without blocking each other.
+# - A bounded pool of uploaders shares one keep-alive requests.Session with
+#   retry/backoff on connection errors and 429/5xx responses.
+# - A ledger (.upload_ledger.json: path, size, mtime, sha256) survives restarts;
+#   files already uploaded with the same content are not uploaded again.
+# - Each upload prints its detection-to-ingest latency; a summary (p50/p95/max)
+#   is printed every --report-every seconds and on exit.
 
+import argparse
+import hashlib
+import heapq
+import json
+import os
+import sys
+import threading
 import time
-import requests
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import sys
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 BASE = "http://127.0.0.1:8000"
 UPLOAD_ENDPOINT = f"{BASE}/upload"
 DIR = Path(__file__).resolve().parent
+LEDGER = DIR / ".upload_ledger.json"
+# same extensions the API accepts (config.SUPPORTED_FILE_TYPES)
+UPLOAD_EXT = (".txt", ".pdf", ".md", ".html")
 POLL = 3
-STABLE_ROUNDS = 2
+QUIET_SECONDS = 2.0
+CHECK_INTERVAL = 0.5
+UPLOAD_WORKERS = 4
+RETRIES = 3
+BACKOFF = 0.5
+TIMEOUT = 60
 
 def source_id(name):
     s = Path(name).stem
     return "".join(c if c.isalnum() else "_" for c in s).lower() or f"file_{int(time.time())}"
 
-def is_file_stable(p: Path, rounds=STABLE_ROUNDS, poll=POLL):
-    last_size = -1
-    for _ in range(rounds):
+def sha256_file(p: Path) -> str:
+    h = hashlib.sha256()
+    with open(p, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def make_session(workers: int) -> requests.Session:
+    """Keep-alive session sized for the upload pool, with retry and exponential backoff."""
+    retry_kwargs = dict(total=RETRIES, backoff_factor=BACKOFF,
+                        status_forcelist=(429, 500, 502, 503, 504), raise_on_status=False)
+    try:
+        retry = Retry(allowed_methods=frozenset(["POST"]), **retry_kwargs)
+    except TypeError:
+        # urllib3 < 1.26
+        retry = Retry(method_whitelist=frozenset(["POST"]), **retry_kwargs)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers, max_retries=retry)
+    s = requests.Session()
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
+
+class Ledger:
+    """Uploaded files keyed by path, persisted atomically after every change."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        if path.exists():
+            try:
+                self.entries = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                print(f"[LEDGER] unreadable ({e}); starting empty")
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def is_current(self, p: Path, st) -> bool:
+        e = self.entries.get(str(p))
+        return bool(e) and e["size"] == st.st_size and e["mtime"] == st.st_mtime
+
+    def has_hash(self, p: Path, digest: str) -> bool:
+        e = self.entries.get(str(p))
+        return bool(e) and e.get("sha256") == digest
+
+    def record(self, p: Path, st, digest: str, sid: str = None):
+        with self.lock:
+            self.entries[str(p)] = {"size": st.st_size, "mtime": st.st_mtime, "sha256": digest,
+                                    "source_id": sid, "uploaded_at": time.time() if sid else None}
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.entries, indent=1), encoding="utf-8")
+            os.replace(tmp, self.path)
+
+class LatencyStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = []
+        self.failed = 0
+
+    def add(self, seconds: float):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def summary(self) -> str:
+        with self.lock:
+            xs = sorted(self.samples)
+            failed = self.failed
+        if not xs:
+            return f"uploads=0 failed={failed}"
+        pick = lambda q: xs[min(len(xs) - 1, int(q * len(xs)))]
+        return (f"uploads={len(xs)} failed={failed} detect->ingest "
+                f"p50={pick(0.5):.2f}s p95={pick(0.95):.2f}s max={xs[-1]:.2f}s")
+
+class Watcher:
+    def __init__(self, directory: Path, workers: int, quiet: float, poll: float):
+        self.dir = directory
+        self.quiet = quiet
+        self.poll = poll
+        self.ledger = Ledger(LEDGER)
+        self.stats = LatencyStats()
+        self.session = make_session(workers)
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        # path -> {"detected": t, "sig": (size, mtime), "changed": t}
+        self.pending = {}
+        self.in_flight = set()
+        # in-flight paths that changed again during their upload
+        self.dirty = set()
+        self.timers = []  # heap of (due, path)
+        self.cond = threading.Condition()
+        self.stopping = False
+
+    # -- detection -------------------------------------------------------
+
+    def wanted(self, p: Path) -> bool:
+        return p.suffix.lower() in UPLOAD_EXT and p.parent == self.dir and not p.name.startswith(".")
+
+    def notify(self, path: str):
+        """Called for every create/modify/move event (or a scan hit); cheap and non-blocking."""
+        p = Path(path)
+        if not self.wanted(p):
+            return
+        with self.cond:
+            if p in self.in_flight:
+                # the upload may have read the old content; look again once it finishes
+                self.dirty.add(p)
+                return
+            self._queue(p)
+
+    def _queue(self, p: Path):
+        # caller holds self.cond
+        now = time.monotonic()
+        if p not in self.pending:
+            self.pending[p] = {"detected": now, "sig": None, "changed": now}
+        heapq.heappush(self.timers, (now + CHECK_INTERVAL, p))
+        self.cond.notify()
+
+    def scan(self):
+        for p in self.dir.iterdir():
+            if not p.is_file() or not self.wanted(p):
+                continue
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            if not self.ledger.is_current(p, st):
+                self.notify(str(p))
+
+    def seed_ledger(self):
+        # first run: like the old watcher, files already present are not uploaded
+        for p in self.dir.iterdir():
+            if p.is_file() and self.wanted(p):
+                self.ledger.record(p, p.stat(), sha256_file(p))
+        print(f"[LEDGER] seeded with {len(self.ledger.entries)} existing file(s)")
+
+    # -- stability timers --------------------------------------------------
+
+    def timer_loop(self):
+        while True:
+            with self.cond:
+                while not self.stopping and (not self.timers or self.timers[0][0] > time.monotonic()):
+                    timeout = self.timers[0][0] - time.monotonic() if self.timers else None
+                    self.cond.wait(timeout)
+                if self.stopping:
+                    return
+                _, p = heapq.heappop(self.timers)
+                state = self.pending.get(p)
+            if state is not None:
+                self.check(p, state)
+
+    def check(self, p: Path, state: dict):
+        now = time.monotonic()
         try:
-            size = p.stat().st_size
+            st = p.stat()
         except FileNotFoundError:
-            return False
-        if last_size == -1:
-            last_size = size
-        else:
-            if size != last_size:
-                return False
-            last_size = size
-        time.sleep(poll)
-    return True
-
-def upload(p: Path):
-    sid = source_id(p.name)
-    try:
-        with open(p, "rb") as fh:
-            files = {"file": (p.name, fh)}
-            data = {"source_id": sid}
-            r = requests.post(UPLOAD_ENDPOINT, files=files, data=data, timeout=30)
-        if r.status_code == 200:
-            print(f"[UPLOAD OK] {p.name} -> {sid}")
-            return True
-        else:
-            print(f"[UPLOAD ERR] {p.name} -> {r.status_code} {r.text}")
-            return False
-    except Exception as e:
-        print(f"[UPLOAD EXC] {p.name} -> {e}")
-        return False
+            with self.cond:
+                self.pending.pop(p, None)
+            return
+        sig = (st.st_size, st.st_mtime)
+        with self.cond:
+            if sig != state["sig"]:
+                state["sig"], state["changed"] = sig, now
+            if now - state["changed"] < self.quiet:
+                heapq.heappush(self.timers, (now + CHECK_INTERVAL, p))
+                self.cond.notify()
+                return
+            # stable: hand over to the upload pool (duplicate timer entries are harmless)
+            if self.pending.pop(p, None) is None:
+                return
+            self.in_flight.add(p)
+        self.pool.submit(self.upload, p, state["detected"])
+
+    # -- upload ------------------------------------------------------------
+
+    def upload(self, p: Path, detected: float):
+        try:
+            st = p.stat()
+            digest = sha256_file(p)
+            if self.ledger.has_hash(p, digest):
+                # touched but identical content: just refresh size/mtime
+                self.ledger.record(p, st, digest, self.ledger.entries[str(p)].get("source_id"))
+                return
+            sid = source_id(p.name)
+            body = p.read_bytes()  # bytes, so a retried request can resend the body
+            r = self.session.post(UPLOAD_ENDPOINT, files={"file": (p.name, body)},
+                                  params={"source_id": sid}, data={"source_id": sid}, timeout=TIMEOUT)
+            if r.status_code == 200:
+                self.ledger.record(p, st, digest, sid)
+                latency = time.monotonic() - detected
+                self.stats.add(latency)
+                print(f"[UPLOAD OK] {p.name} -> {sid} ({latency:.2f}s after detection)")
+            else:
+                with self.stats.lock:
+                    self.stats.failed += 1
+                print(f"[UPLOAD ERR] {p.name} -> {r.status_code} {r.text[:200]}")
+        except Exception as e:
+            with self.stats.lock:
+                self.stats.failed += 1
+            print(f"[UPLOAD EXC] {p.name} -> {e}")
+        finally:
+            with self.cond:
+                self.in_flight.discard(p)
+                if p in self.dirty:
+                    self.dirty.discard(p)
+                    self._queue(p)
+
+    # -- main loop -----------------------------------------------------------
+
+    def start_observer(self):
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return None
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_created(self, event):
+                if not event.is_directory:
+                    watcher.notify(event.src_path)
+
+            def on_modified(self, event):
+                if not event.is_directory:
+                    watcher.notify(event.src_path)
+
+            def on_moved(self, event):
+                if not event.is_directory:
+                    watcher.notify(event.dest_path)
+
+        observer = Observer()
+        observer.schedule(Handler(), str(self.dir), recursive=False)
+        observer.start()
+        return observer
+
+    def run(self, report_every: float):
+        if not self.ledger.exists():
+            self.seed_ledger()
+        threading.Thread(target=self.timer_loop, daemon=True).start()
+        observer = self.start_observer()
+        # with events, the rescan is only a safety net for missed notifications
+        rescan = self.poll if observer is None else max(self.poll * 10, 30)
+        mode = "watchdog events" if observer else f"polling every {self.poll}s (pip install watchdog for events)"
+        print(f"Watching {self.dir} using {mode}.")
+        self.scan()  # pick up files that arrived while the watcher was down
+        next_scan = time.monotonic() + rescan
+        next_report = time.monotonic() + report_every
+        try:
+            while True:
+                time.sleep(min(1.0, rescan))
+                now = time.monotonic()
+                if now >= next_scan:
+                    self.scan()
+                    next_scan = now + rescan
+                if report_every and now >= next_report:
+                    print("[STATS]", self.stats.summary())
+                    next_report = now + report_every
+        except KeyboardInterrupt:
+            print("Stopping watcher.")
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+            with self.cond:
+                self.stopping = True
+                self.cond.notify_all()
+            self.pool.shutdown(wait=True)
+            print("[STATS]", self.stats.summary())
 
 def main():
-    print(f"Watching {DIR} for new files. Poll every {POLL}s.")
-    seen = set(p.name for p in DIR.iterdir() if p.is_file())
-    try:
-        while True:
-            current = set()
-            for p in DIR.iterdir():
-                if not p.is_file():
-                    continue
-                current.add(p.name)
-                if p.name in seen:
-                    continue
-                print("Detected new file:", p.name)
-                # Check stability
-                if is_file_stable(p):
-                    print("File stable, uploading:", p.name)
-                    ok = upload(p)
-                    if ok:
-                        seen.add(p.name)
-                    else:
-                        print("Upload failed; will retry on next detection.")
-                else:
-                    print("File not yet stable; will check later.")
-            # handle removed files from seen set
-            removed = seen - current
-            if removed:
-                for r in removed:
-                    seen.remove(r)
-            time.sleep(POLL)
-    except KeyboardInterrupt:
-        print("Stopping watcher.")
-        sys.exit(0)
+    ap = argparse.ArgumentParser(description="Watch this folder and upload new files")
+    ap.add_argument("--workers", type=int, default=UPLOAD_WORKERS, help="concurrent uploads")
+    ap.add_argument("--quiet-seconds", type=float, default=QUIET_SECONDS, help="unchanged time before a file is stable")
+    ap.add_argument("--poll", type=float, default=POLL, help="rescan interval without watchdog")
+    ap.add_argument("--report-every", type=float, default=60, help="latency summary interval (0 = only on exit)")
+    args = ap.parse_args()
+    Watcher(DIR, args.workers, args.quiet_seconds, args.poll).run(args.report_every)
+    sys.exit(0)
 
 if __name__ == "__main__":
     main()
@@ -31,6 +31,10 @@ export async function getVisualizeSummary(sourceId) {
   return safeFetch(`${BASE}/visualize/summary?source_id=${encodeURIComponent(sourceId)}`);
 }
 
+export async function getVisualizeFields(sourceId) {
+  return safeFetch(`${BASE}/visualize/fields?source_id=${encodeURIComponent(sourceId)}`);
+}
+
 export async function getSchema(sourceId) {
   return safeFetch(`${BASE}/schema?source_id=${encodeURIComponent(sourceId)}`);
 }
@@ -44,6 +48,14 @@ export async function getRecords(sourceId, limit = 100, page = 0) {
   return safeFetch(url);
 }
 
+// keyset paging: pass "" for the first page, then the returned next_cursor.
+// Resolves to { data: { docs, next_cursor } } (next_cursor is null on the last page).
+export async function getRecordsPage(sourceId, limit = 100, cursor = "", fields = null) {
+  let url = `${BASE}/records?source_id=${encodeURIComponent(sourceId)}&limit=${limit}&cursor=${encodeURIComponent(cursor || "")}`;
+  if (fields) url += `&fields=${encodeURIComponent(fields)}`;
+  return safeFetch(url);
+}
+
 export async function postBackup(sourceId) {
   return safeFetch(`${BASE}/backup?source_id=${encodeURIComponent(sourceId)}`, { method: "POST" });
 }
@@ -1,7 +1,7 @@
 // src/pages/Records.jsx
 import React, { useEffect, useMemo, useState } from "react";
 import { useParams } from "react-router-dom";
-import { getRecords, getSchema } from "../api/client";
+import { getRecordsPage, getSchema } from "../api/client";
 import { FixedSizeList as List } from "react-window";
 import JsonViewer from "../components/JsonViewer";
 
@@ -25,6 +25,8 @@ export default function Records() {
   const [loading, setLoading] = useState(true);
   const [records, setRecords] = useState([]);
   const [page, setPage] = useState(0);
+  // cursors[p] is the keyset token for the start of page p ("" = first page)
+  const [cursors, setCursors] = useState([""]);
   const [limit] = useState(100);
   const [selected, setSelected] = useState(null);
   const [schema, setSchema] = useState(null);
@@ -48,9 +50,16 @@ export default function Records() {
       try {
         const s = await getSchema(sourceId);
         if (!s.error) setSchema(s.data);
-        const r = await getRecords(sourceId, limit, page);
-        if (!r.error) setRecords(r.data || []);
-        else {
+        const r = await getRecordsPage(sourceId, limit, cursors[page] || "");
+        if (!r.error) {
+          setRecords(r.data?.docs || []);
+          const next = r.data?.next_cursor || null;
+          setCursors((cs) => {
+            const copy = cs.slice(0, page + 1);
+            if (next) copy.push(next);
+            return copy;
+          });
+        } else {
           setError(r.error);
           setRecords([]);
         }
@@ -62,8 +71,14 @@ export default function Records() {
     }
     load();
     return () => (mounted = false);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [sourceId, page, limit, isDemo]);
 
+  useEffect(() => {
+    setPage(0);
+    setCursors([""]);
+  }, [sourceId]);
+
   const columns = useMemo(() => {
     if (!schema) return ["_raw"];
     if (schema?.fields && Array.isArray(schema.fields)) return schema.fields.map((f) => (typeof f === "string" ? f : f.name));
@@ -114,7 +129,7 @@ export default function Records() {
             <div className="flex items-center justify-between mt-3">
               <div>
                 <button className="px-3 py-1 mr-2 border rounded" onClick={() => setPage((p) => Math.max(0, p - 1))}>Prev</button>
-                <button className="px-3 py-1 border rounded" onClick={() => setPage((p) => p + 1)}>Next</button>
+                <button className="px-3 py-1 border rounded" disabled={page + 1 >= cursors.length} onClick={() => setPage((p) => p + 1)}>Next</button>
               </div>
               <div className="text-sm text-gray-500">Records: {records.length}</div>
             </div>
@@ -28,7 +28,7 @@ export default function Sources() {
       setBackupCmd(res.data);
       setModal({ open: true, source: sourceId, step: "backed" });
     } else {
-      setBackupCmd({ error: res.error || "Failed to get backup command" });
+      setBackupCmd({ error: res.error || "Backup failed" });
     }
   }
 
@@ -103,16 +103,16 @@ export default function Sources() {
         {modal.step === "start" ? (
           <div>
             <div className="mb-2">
-              <button onClick={() => handleBackup(modal.source)} className="px-3 py-1 bg-primary text-white rounded">Generate Backup Command</button>
+              <button onClick={() => handleBackup(modal.source)} className="px-3 py-1 bg-primary text-white rounded">Create Backup</button>
             </div>
-            <div className="text-sm text-gray-500">You must run the backup locally before deletion. The Delete button will ask you to type the source_id to confirm.</div>
+            <div className="text-sm text-gray-500">Create a backup before deletion; it is written to the backups folder on the server. The Delete button will ask you to type the source_id to confirm.</div>
           </div>
         ) : (
           <div>
             <div className="bg-gray-100 p-3 rounded text-xs mb-2 overflow-auto max-h-36">
-              <code>{backupCmd?.data || backupCmd || "No command returned"}</code>
+              <code>{backupCmd ? JSON.stringify(backupCmd, null, 2) : "No backup returned"}</code>
             </div>
-            <div className="text-sm mb-2">After running the command on the machine hosting MongoDB, type the source_id below to enable deletion.</div>
+            <div className="text-sm mb-2">Check the backup path and record count above, then type the source_id below to enable deletion.</div>
             <input placeholder="Type source_id to confirm" value={typedConfirm} onChange={(e) => setTypedConfirm(e.target.value)} className="border p-2 rounded w-full mb-2" />
             <div className="flex justify-end gap-2">
               <button onClick={() => setModal({ open: true, source: modal.source, step: "backed" })} className="px-3 py-1 border rounded">Refresh</button>
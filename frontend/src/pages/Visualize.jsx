@@ -1,7 +1,7 @@
 // src/pages/Visualize.jsx
 import React, { useEffect, useState } from "react";
 import { useParams } from "react-router-dom";
-import { getVisualizeSummary, getRecords } from "../api/client";
+import { getVisualizeSummary, getVisualizeFields } from "../api/client";
 import {
   PieChart,
   Pie,
@@ -57,9 +57,51 @@ function TokenCloud({ tokens }) {
   );
 }
 
+function pct(x) {
+  return `${Math.round((x || 0) * 1000) / 10}%`;
+}
+
+// Per-field distributions from /visualize/fields (profiled over every record at ingest)
+function FieldProfiles({ profile }) {
+  if (!profile || !profile.fields || profile.fields.length === 0) {
+    return <div className="text-sm text-gray-500">No field profile available</div>;
+  }
+  return (
+    <table className="w-full text-sm">
+      <thead>
+        <tr className="text-left">
+          <th>Field</th>
+          <th>Present</th>
+          <th>Nulls</th>
+          <th>Types</th>
+          <th>p5 / p50 / p95</th>
+          <th>Top values</th>
+        </tr>
+      </thead>
+      <tbody>
+        {profile.fields.slice(0, 50).map((f) => (
+          <tr key={f.field}>
+            <td className="font-mono">{f.field}</td>
+            <td>{pct(f.presence_ratio)}</td>
+            <td>{pct(f.null_ratio)}</td>
+            <td>{Object.keys(f.types || {}).join(", ")}</td>
+            <td>
+              {f.numeric
+                ? ["p5", "p50", "p95"].map((q) => f.numeric.quantiles[q]).map((v) => (v == null ? "-" : +v.toFixed(2))).join(" / ")
+                : ""}
+            </td>
+            <td>{(f.top_values || []).slice(0, 3).map((v) => `${v.value} (${v.count})`).join(", ")}</td>
+          </tr>
+        ))}
+      </tbody>
+    </table>
+  );
+}
+
 export default function Visualize() {
   const { sourceId } = useParams();
   const [summary, setSummary] = useState(null);
+  const [profile, setProfile] = useState(null);
   const [loading, setLoading] = useState(true);
   const [errorMsg, setErrorMsg] = useState(null);
 
@@ -69,6 +111,7 @@ export default function Visualize() {
       setLoading(true);
       setErrorMsg(null);
       setSummary(null);
+      setProfile(null);
 
       // If this looks like demo source, use local demo summary
       if (sourceId && String(sourceId).toLowerCase().startsWith("demo")) {
@@ -79,35 +122,25 @@ export default function Visualize() {
         return;
       }
 
-      // Normal path: call backend summary endpoint
+      // Normal path: call backend summary and field profile endpoints
       try {
-        const res = await getVisualizeSummary(sourceId);
+        const [res, fields] = await Promise.all([getVisualizeSummary(sourceId), getVisualizeFields(sourceId)]);
+        const prof = !fields.error && fields.data ? fields.data : null;
+        if (mounted) setProfile(prof);
         if (res.error) {
           // backend may return 404 if source not found
           setErrorMsg(res.error && res.error.detail ? res.error.detail : String(res.error));
-          // Try fallback: fetch some records (conservative) and compute light summary
-          try {
-            const rec = await getRecords(sourceId, 200, 0);
-            if (!rec.error && rec.data && rec.data.length > 0) {
-              // compute top fields from sample
-              const counts = {};
-              rec.data.forEach((d) => {
-                Object.keys(d || {}).forEach((k) => {
-                  counts[k] = (counts[k] || 0) + 1;
-                });
-              });
-              const fallback = {
-                chunk_types: [],
-                top_fields: Object.keys(counts).map((k) => ({ field: k, count: counts[k] })).sort((a, b) => b.count - a.count).slice(0, 30),
-                schema_history: [],
-                top_tokens: []
-              };
-              setSummary(fallback);
-              setLoading(false);
-              return;
-            }
-          } catch (e) {
-            // ignore fallback errors
+          // Fallback: top fields from the field profile (counted over all records, not a sample)
+          if (prof && prof.fields.length > 0) {
+            const fallback = {
+              chunk_types: [],
+              top_fields: prof.fields.map((f) => ({ field: f.field, count: f.present })).slice(0, 30),
+              schema_history: [],
+              top_tokens: []
+            };
+            setSummary(fallback);
+            setLoading(false);
+            return;
           }
           // Nothing found
           setSummary(null);
@@ -222,6 +255,13 @@ export default function Visualize() {
           <TokenCloud tokens={summary.top_tokens || []} />
         </div>
       </div>
+
+      <div className="card mt-4">
+        <h4 className="font-semibold">Field Profiles</h4>
+        <div className="mt-3">
+          <FieldProfiles profile={profile} />
+        </div>
+      </div>
     </div>
   );
 }
@@ -1,13 +1,24 @@
 # api/api.py  (debug-friendly - copy & paste - full file)
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
-from fastapi.responses import HTMLResponse, Response, JSONResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks, Request, Body
+from fastapi.responses import HTMLResponse, Response, JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from src.pipeline import run_pipeline
-from src.loader import get_current_schema, db  # using your existing loader db connection
+from src.extractor import source_id_for_file
+from src.loader import get_current_schema, get_source_stats, ensure_source_stats, get_data_version, reset_source_record_count, db  # using your existing loader db connection
 from src.config import config
-import os, tempfile, traceback, json
+from src.exporter import iter_export, export_to_file
+from src.cache import ResponseCache
+from src.query import compile_query, run_query, indexed_fields
+from src.snapshot import SnapshotError, SnapshotUnsupported, build_snapshot, drop_snapshots, load_snapshot, snapshot_query
+from src.search import search, index_size_report
+from src.field_stats import get_field_profile
+from src.tracing import slowest_runs, stage_breakdown, get_run
+from src import metrics
+from src.blobstore import cache_stats as blob_cache_stats
+import os, tempfile, traceback, json, base64, time
 from bson import json_util, ObjectId
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional
 from datetime import datetime
 import shutil
 from pathlib import Path
@@ -31,6 +42,45 @@ app.add_middleware(
 )
 # --- end CORS middleware ---
 
+# --- request metrics (GET /metrics) ---
+# requests currently being served; only touched from the event loop thread
+_in_flight = [0]
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    t0 = time.perf_counter()
+    method = request.method
+    _in_flight[0] += 1
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        _in_flight[0] -= 1
+        # label by route template (/records, not /records?...); unmatched paths share one label
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        metrics.HTTP_LATENCY.observe((method, route), time.perf_counter() - t0)
+        metrics.HTTP_REQUESTS.inc((method, route, str(status)))
+
+_collection_cache: Dict[str, float] = {}
+
+def _collection_exists(name: str) -> bool:
+    """
+    Cached existence check so hot read paths don't call list_collection_names per request.
+    Positive answers are cached for config.COLLECTION_CACHE_TTL seconds; misses are rechecked
+    (and refresh the whole cache) so newly ingested sources show up immediately.
+    """
+    now = time.monotonic()
+    expires = _collection_cache.get(name)
+    if expires and expires > now:
+        return True
+    names = db.list_collection_names()
+    _collection_cache.clear()
+    for n in names:
+        _collection_cache[n] = now + config.COLLECTION_CACHE_TTL
+    return name in _collection_cache
+
 def json_response(obj: Any) -> Response:
     text = json_util.dumps(obj)
     return Response(content=text, media_type="application/json")
@@ -54,7 +104,7 @@ async def dashboard():
 ALLOWED_EXT = tuple(config.SUPPORTED_FILE_TYPES)
 
 @app.post("/upload")
-async def upload(file: UploadFile = File(...), source_id: str = "test_source"):
+async def upload(file: UploadFile = File(...), source_id: str = "test_source", profile: int = 0, typed: int = 0):
     fname = file.filename or ""
     if not any(fname.lower().endswith(e) for e in ALLOWED_EXT):
         raise HTTPException(400, "Invalid file type")
@@ -65,7 +115,7 @@ async def upload(file: UploadFile = File(...), source_id: str = "test_source"):
 
     # Run pipeline and capture exceptions for debugging
     try:
-        run_pipeline(path, source_id)
+        summary = run_pipeline(path, source_id, profile=bool(profile), typed=bool(typed))
     except Exception as e:
         tb = traceback.format_exc()
         # Return the error and traceback to the client to help debugging (dev only)
@@ -78,37 +128,205 @@ async def upload(file: UploadFile = File(...), source_id: str = "test_source"):
         shutil.rmtree(tmp_dir, ignore_errors=True)
     except Exception:
         pass
-    return {"status": "ok", "source_id": source_id}
+    out = {"status": "ok", "source_id": source_id, "run_id": summary["run_id"],
+           "records": summary["records"], "seconds": summary["seconds"]}
+    if profile:
+        out["profile_path"] = summary["profile_path"]
+    if typed:
+        out["typed_fields"] = summary["typed_fields"]
+        out["cast_failures"] = summary["cast_failures"]
+    return out
+
+response_cache = ResponseCache(config.RESPONSE_CACHE_SIZE)
+
+def _cache_gauges() -> Dict[tuple, float]:
+    out: Dict[tuple, float] = {}
+    rc = response_cache.stats()
+    out[("response", "entries")] = rc["entries"]
+    out[("response", "hits")] = rc["hits"]
+    out[("response", "misses")] = rc["misses"]
+    out[("response", "hit_rate")] = round(rc["hit_rate"], 4)
+    for name, st in blob_cache_stats().items():
+        out[(name, "entries")] = st["entries"]
+        out[(name, "hits")] = st["hits"]
+        out[(name, "misses")] = st["misses"]
+        out[(name, "hit_rate")] = round(st["hit_rate"], 4)
+    out[("collection_exists", "entries")] = len(_collection_cache)
+    return out
+
+metrics.gauge("etl_cache", "Cache sizes, hit/miss counts and hit rates", _cache_gauges, ("cache", "stat"))
+metrics.gauge("etl_http_requests_in_flight", "Requests currently being served", lambda: {(): _in_flight[0]})
+
+def cached_json_response(request: Request, endpoint: str, params: tuple, version: int,
+                         build: Callable[[], Any]) -> Response:
+    """
+    Serve a read endpoint through the response cache.
+    The key is (endpoint, params, data version); the version only changes when an
+    ingest/delete touches the data, so a matching If-None-Match gets a 304 without
+    building anything, and repeated polls reuse the serialized (and gzipped) body.
+    """
+    key = (endpoint, params, version)
+    accepts_gzip = "gzip" in request.headers.get("accept-encoding", "")
+    headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    # the client may hold either representation's ETag (identity or gzip)
+    sent = {t.strip().removeprefix("W/") for t in request.headers.get("if-none-match", "").split(",")}
+    for encoding in (("identity", "gzip") if accepts_gzip else ("identity",)):
+        etag = ResponseCache.etag_for(key, encoding)
+        if etag in sent:
+            headers["ETag"] = etag
+            return Response(status_code=304, headers=headers)
+
+    entry = response_cache.get(key)
+    if entry is None:
+        entry = response_cache.put(key, json_util.dumps(build()).encode("utf-8"))
+
+    body = entry.body
+    headers["ETag"] = entry.etag
+    if len(body) >= config.GZIP_MIN_BYTES and accepts_gzip:
+        body = entry.gzipped()
+        headers["Content-Encoding"] = "gzip"
+        headers["ETag"] = ResponseCache.etag_for(key, "gzip")
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @app.get("/schema")
-async def get_schema(source_id: str):
-    s = get_current_schema(source_id)
-    if not s:
-        raise HTTPException(404, "Not found")
-    return json_response(s)
+async def get_schema(source_id: str, request: Request):
+    def build():
+        s = get_current_schema(source_id)
+        if not s:
+            raise HTTPException(404, "Not found")
+        return s
+    return cached_json_response(request, "schema", (source_id,), get_data_version(source_id), build)
 
 @app.get("/schema/history")
-async def schema_history(source_id: str):
-    docs = list(db[config.SCHEMA_REGISTRY_COLLECTION].find({"source_id": source_id}).sort("version", 1))
-    return json_response(docs)
+async def schema_history(source_id: str, request: Request):
+    def build():
+        return list(db[config.SCHEMA_REGISTRY_COLLECTION].find({"source_id": source_id}).sort("version", 1))
+    return cached_json_response(request, "schema_history", (source_id,), get_data_version(source_id), build)
+
+def _encode_cursor(last_id: Any) -> str:
+    token = json_util.dumps({"after": last_id})
+    return base64.urlsafe_b64encode(token.encode("utf-8")).decode("ascii")
+
+def _decode_cursor(cursor: str) -> Any:
+    try:
+        return json_util.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))["after"]
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
 
 @app.get("/records")
-async def get_records(source_id: str, query_id: int = 1, limit: int = 100, page: int = 0):
+async def get_records(source_id: str, query_id: int = 1, limit: int = 100, page: int = 0,
+                      cursor: Optional[str] = None, fields: Optional[str] = None):
+    """
+    Page through data_<source_id>.
+    - cursor: opaque keyset token; pass "" for the first page and then the returned
+      next_cursor. Paging walks the _id index, so any page costs the same as page 0.
+      When given, the response is {docs, next_cursor} (next_cursor is null at the end).
+    - page: legacy offset paging (skip-based), returns a plain list of docs.
+    - fields: comma-separated projection, e.g. fields=id,title
+    limit is capped at config.RECORDS_MAX_LIMIT.
+    """
     coll_name = f"{config.DATA_COLLECTION_PREFIX}{source_id}"
-    if coll_name not in db.list_collection_names():
+    if not _collection_exists(coll_name):
         raise HTTPException(404, "Collection not found")
-    skip = page * limit
-    docs = list(db[coll_name].find().skip(skip).limit(limit))
-    return json_response(docs)
+    limit = max(1, min(limit, config.RECORDS_MAX_LIMIT))
+    projection = None
+    if fields:
+        projection = {f.strip(): 1 for f in fields.split(",") if f.strip()}
+
+    if cursor is None:
+        skip = page * limit
+        docs = list(db[coll_name].find({}, projection).skip(skip).limit(limit))
+        return json_response(docs)
+
+    query = {"_id": {"$gt": _decode_cursor(cursor)}} if cursor else {}
+    docs = list(db[coll_name].find(query, projection).sort("_id", 1).limit(limit))
+    next_cursor = _encode_cursor(docs[-1]["_id"]) if len(docs) == limit else None
+    return json_response({"docs": docs, "next_cursor": next_cursor})
 
 @app.post("/query")
-async def llm_query(source_id: str, nl_query: str):
-    # dev: stub - return first 50 docs (LLM integration can happen later)
+async def structured_query(source_id: str, spec: Dict[str, Any] = Body(default={}), explain: int = 0, engine: str = "auto"):
+    """
+    Structured query over data_<source_id> (see src/query.py for the DSL):
+    where-predicates, select, group_by + aggregates, order_by and top_k.
+    Filters and projections run server-side as an aggregation pipeline; results
+    stream back as NDJSON. explain=1 returns the compiled pipeline and index hint instead.
+    engine=auto answers group_by/aggregates queries from the source's columnar
+    snapshot when one is current (POST /snapshot), engine=snapshot requires it,
+    engine=mongo always runs the pipeline.
+    """
+    if engine not in ("auto", "mongo", "snapshot"):
+        raise HTTPException(400, "engine must be auto, mongo or snapshot")
     coll_name = f"{config.DATA_COLLECTION_PREFIX}{source_id}"
-    docs = []
-    if coll_name in db.list_collection_names():
-        docs = list(db[coll_name].find().limit(50))
-    return json_response({"source_id": source_id, "nl_query": nl_query, "docs": docs})
+    if not _collection_exists(coll_name):
+        raise HTTPException(404, "Collection not found")
+    try:
+        pipeline, hint = compile_query(source_id, spec, indexed_fields(db[coll_name]))
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if explain:
+        snap = load_snapshot(source_id) if engine != "mongo" else None
+        return json_response({"source_id": source_id, "pipeline": pipeline, "hint": hint,
+                              "snapshot_version": snap.version if snap else None})
+
+    docs = None
+    if engine != "mongo":
+        try:
+            docs = await run_in_threadpool(snapshot_query, source_id, spec)
+        except SnapshotUnsupported as e:
+            if engine == "snapshot":
+                raise HTTPException(400, str(e))
+        if docs is None and engine == "snapshot":
+            raise HTTPException(409, "No current snapshot for this source; POST /snapshot first")
+
+    def stream():
+        for doc in docs if docs is not None else run_query(source_id, spec):
+            yield (json_util.dumps(doc) + "\n").encode("utf-8")
+    return StreamingResponse(stream(), media_type="application/x-ndjson",
+                             headers={"X-Query-Engine": "snapshot" if docs is not None else "mongo"})
+
+@app.post("/snapshot")
+async def api_build_snapshot(source_id: str):
+    """
+    Build the columnar snapshot of data_<source_id> for its current data version
+    (one collection scan). Returns the snapshot's meta: rows, columns and their kinds.
+    """
+    if not _collection_exists(f"{config.DATA_COLLECTION_PREFIX}{source_id}"):
+        raise HTTPException(404, "Collection not found")
+    try:
+        meta = await run_in_threadpool(build_snapshot, source_id)
+    except SnapshotError as e:
+        raise HTTPException(409, str(e))
+    return json_response(meta)
+
+@app.get("/snapshot/stats")
+async def api_snapshot_stats(source_id: str, fields: Optional[str] = None, top_k: int = 10):
+    """
+    Exact per-field statistics from the current snapshot: presence, nulls, min/max,
+    mean/std and quantiles for numbers and dates, distinct count and top values otherwise.
+    fields is a comma-separated list (default: every top-level field).
+    """
+    snap = load_snapshot(source_id)
+    if snap is None:
+        raise HTTPException(404, "No current snapshot for this source; POST /snapshot first")
+    names = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    try:
+        stats = await run_in_threadpool(snap.field_stats, names, max(1, min(top_k, 100)))
+    except SnapshotUnsupported as e:
+        raise HTTPException(400, str(e))
+    return json_response({"source_id": source_id, "data_version": snap.version, "rows": snap.rows, "fields": stats})
+
+@app.get("/search")
+async def api_search(q: str, source_id: Optional[str] = None, page: int = 0, limit: int = 20):
+    """
+    Ranked full-text search over chunks of all sources (or one source_id).
+    Returns {q, terms, total_candidates, results: [{source_id, chunk_id, type, score, offsets, snippet}]}.
+    """
+    limit = max(1, min(limit, 100))
+    return json_response(search(q, source_id, max(page, 0), limit))
+
+@app.get("/search/stats")
+async def api_search_stats():
+    return json_response(index_size_report())
 
 #
 # ---------------------------
@@ -129,36 +347,63 @@ def _schema_history_collection():
     return db[config.SCHEMA_EVOLUTION_LOG_COLLECTION]
 
 @app.get("/sources")
-async def api_get_sources():
+async def api_get_sources(request: Request):
     """
     Returns list of sources with record_count, last_ingest, schema_version, chunks count.
+    Served from the materialized source_stats collection (one indexed query), cached per data version.
+    Sources stored before stats were materialized are backfilled on first use.
     """
     try:
-        # derive distinct source_ids from schema_registry
-        coll = _schema_collection()
-        source_ids = coll.distinct("source_id")
-        out = []
-        for sid in source_ids:
-            last_doc = coll.find({"source_id": sid}).sort("created_at", -1).limit(1)
-            last_doc = next(last_doc, None)
-            schema_version = last_doc.get("version") if last_doc else None
-            last_ingest = last_doc.get("created_at") if last_doc else None
-            data_coll = _collection_name_for_source(sid)
-            record_count = int(db[data_coll].estimated_document_count()) if data_coll in db.list_collection_names() else 0
-            chunk_count = int(_chunks_collection().count_documents({"source_id": sid}))
-            out.append({
-                "source_id": sid,
-                "last_ingest": str(last_ingest) if last_ingest else None,
-                "record_count": record_count,
-                "schema_version": schema_version,
-                "chunks": chunk_count
-            })
-        return JSONResponse(content=out)
+        ensure_source_stats()
+        return cached_json_response(request, "sources", (), get_data_version(), _build_sources)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _build_sources() -> List[Dict[str, Any]]:
+    out = []
+    for st in get_source_stats():
+        out.append({
+            "source_id": st["source_id"],
+            "last_ingest": str(st["last_ingest"]) if st.get("last_ingest") else None,
+            "record_count": int(st.get("record_count") or 0),
+            "schema_version": st.get("latest_version"),
+            "chunks": int(st.get("chunk_count") or 0)
+        })
+    return out
+
+@app.get("/metrics")
+async def api_metrics():
+    """Prometheus text exposition of the counters, histograms and gauges in src/metrics.py."""
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/runs")
+async def api_runs(source_id: Optional[str] = None, limit: int = 20, run_id: Optional[str] = None):
+    """
+    Slowest of the recent pipeline runs (config.RUNS_RECENT_WINDOW, optionally one source)
+    plus a stage-time and chunk-type breakdown over that window.
+    With run_id, returns that run's full document (including its profile summary).
+    """
+    if run_id:
+        doc = get_run(run_id)
+        if doc is None:
+            raise HTTPException(404, "Run not found")
+        return json_response(doc)
+    recent = await run_in_threadpool(slowest_runs, config.RUNS_RECENT_WINDOW, source_id, config.RUNS_RECENT_WINDOW)
+    return json_response({"slowest": recent[:max(1, limit)], "breakdown": stage_breakdown(recent)})
+
 @app.get("/visualize/summary")
-async def api_visualize_summary(source_id: str):
+async def api_visualize_summary(source_id: str, request: Request):
+    try:
+        return cached_json_response(request, "visualize_summary", (source_id,), get_data_version(source_id),
+                                    lambda: _build_visualize_summary(source_id))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _build_visualize_summary(source_id: str) -> Dict[str, Any]:
     """
     Returns a compact summary used by the frontend:
       - chunk_types: [{type, count}, ...]
@@ -166,98 +411,120 @@ async def api_visualize_summary(source_id: str):
       - schema_history: [{version_label, field_count, created_at}, ...]
       - top_tokens: [{token, count}, ...]  (optional collection visual_tokens_<source_id>)
     """
-    try:
-        # chunk type distribution
-        chunks_coll = _chunks_collection()
-        pipeline = [
-            {"$match": {"source_id": source_id}},
-            {"$group": {"_id": "$type", "count": {"$sum": 1}}},
-            {"$project": {"type": "$_id", "count": 1, "_id": 0}}
-        ]
-        chunk_types = list(chunks_coll.aggregate(pipeline))
-
-        # top fields: try latest schema first
-        schema_coll = _schema_collection()
-        latest_cursor = schema_coll.find({"source_id": source_id}).sort("created_at", -1).limit(1)
-        latest = next(latest_cursor, None)
-        top_fields = []
-        if latest and latest.get("fields"):
-            fields = latest.get("fields")
-            # fields might be dict {field: {presence: N, type: 'string', example: ...}}
-            for k, v in fields.items():
-                if isinstance(v, dict):
-                    cnt = v.get("presence") or v.get("count") or 1
-                else:
-                    cnt = 1
-                top_fields.append({"field": k, "count": int(cnt)})
-            top_fields = sorted(top_fields, key=lambda x: -x["count"])[:30]
-        else:
-            # fallback: sample documents and count keys
-            data_coll = _collection_name_for_source(source_id)
-            if data_coll in db.list_collection_names():
-                sample_cursor = db[data_coll].aggregate([{"$sample": {"size": 300}}])
-                counts = {}
-                for d in sample_cursor:
-                    for k in d.keys():
-                        counts[k] = counts.get(k, 0) + 1
-                top_fields = [{"field": k, "count": v} for k, v in sorted(counts.items(), key=lambda x: -x[1])[:30]]
-
-        # schema history (versions)
-        hist = []
-        for doc in schema_coll.find({"source_id": source_id}).sort("created_at", 1):
-            hist.append({
-                "version_label": f"v{doc.get('version')}",
-                "field_count": len(doc.get("fields", {})) if doc.get("fields") else 0,
-                "created_at": str(doc.get("created_at"))
-            })
-
-        # top tokens (optional precomputed collection named visual_tokens_<source_id>)
-        token_coll_name = f"visual_tokens_{source_id}"
-        top_tokens = []
-        if token_coll_name in db.list_collection_names():
-            top_tokens = list(db[token_coll_name].find().sort("count", -1).limit(200))
-        # normalize types for JSON
-        return JSONResponse(content={
-            "chunk_types": chunk_types,
-            "top_fields": top_fields,
-            "schema_history": hist,
-            "top_tokens": top_tokens
+    # chunk type distribution (materialized at ingest time)
+    stats = get_source_stats(source_id)
+    chunk_types = []
+    if stats:
+        chunk_types = [{"type": t, "count": c} for t, c in (stats[0].get("chunk_types") or {}).items()]
+
+    # top fields: ingest-time field profiles (exact presence over all data) first,
+    # then the latest schema, then a document sample as a last resort
+    schema_coll = _schema_collection()
+    profile = get_field_profile(source_id)
+    latest = None if profile else schema_coll.find_one({"source_id": source_id}, sort=[("version", -1)])
+    top_fields = []
+    if profile:
+        top_fields = [{"field": k, "count": p.present} for k, p in profile.fields.items()]
+        top_fields = sorted(top_fields, key=lambda x: -x["count"])[:30]
+    elif latest and latest.get("fields"):
+        fields = latest.get("fields")
+        # fields might be dict {field: {presence: N, type: 'string', example: ...}}
+        for k, v in fields.items():
+            if isinstance(v, dict):
+                cnt = v.get("presence") or v.get("count") or 1
+            else:
+                cnt = 1
+            top_fields.append({"field": k, "count": int(cnt)})
+        top_fields = sorted(top_fields, key=lambda x: -x["count"])[:30]
+    else:
+        # fallback: sample documents and count keys ($sample on a missing collection yields nothing)
+        data_coll = _collection_name_for_source(source_id)
+        sample_cursor = db[data_coll].aggregate([{"$sample": {"size": 300}}])
+        counts = {}
+        for d in sample_cursor:
+            for k in d.keys():
+                counts[k] = counts.get(k, 0) + 1
+        top_fields = [{"field": k, "count": v} for k, v in sorted(counts.items(), key=lambda x: -x[1])[:30]]
+
+    # schema history (versions)
+    hist = []
+    for doc in schema_coll.find({"source_id": source_id}, {"version": 1, "fields": 1, "generated_at": 1}).sort("version", 1):
+        hist.append({
+            "version_label": f"v{doc.get('version')}",
+            "field_count": len(doc.get("fields", {})) if doc.get("fields") else 0,
+            "created_at": str(doc.get("generated_at"))
         })
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+
+    # top tokens (optional precomputed collection named visual_tokens_<source_id>)
+    token_coll_name = f"visual_tokens_{source_id}"
+    top_tokens = list(db[token_coll_name].find({}, {"_id": 0}).sort("count", -1).limit(200))
+    return {
+        "chunk_types": chunk_types,
+        "top_fields": top_fields,
+        "schema_history": hist,
+        "top_tokens": top_tokens
+    }
+
+@app.get("/visualize/fields")
+async def api_visualize_fields(source_id: str, request: Request, version: Optional[int] = None):
+    """
+    Per-field distributions computed at ingest over all data (not a sample):
+    presence/null ratios, observed types, numeric quantiles (KLL sketch) and mean,
+    top-k values and a string-length histogram. Defaults to the latest version.
+    """
+    def build():
+        profile = get_field_profile(source_id, version)
+        if profile is None:
+            raise HTTPException(404, "No field profile for this source/version")
+        return {"source_id": source_id, "records": profile.records, "fields": profile.summary()}
+    return cached_json_response(request, "visualize_fields", (source_id, version), get_data_version(source_id), build)
 
 @app.post("/backup")
-async def api_backup(source_id: str, background_tasks: BackgroundTasks = None):
+async def api_backup(source_id: str, format: str = "ndjson"):
     """
-    Returns a safe mongodump command string for the given source_id and (optionally) starts a background dump.
-    By default this returns the command to run on the host -- safer than executing directly inside the container.
+    Writes a gzip-compressed NDJSON (or CSV) export of data_<source_id> into ../backups,
+    alongside a .manifest.json with record count and sha256, and verifies it.
+    Returns the manifest. Restore with: python export_source.py import <file> <source_id>
     """
     try:
         coll = _collection_name_for_source(source_id)
-        if coll not in db.list_collection_names():
+        if not _collection_exists(coll):
             raise HTTPException(status_code=404, detail="Source collection not found")
+        if format not in ("ndjson", "csv"):
+            raise HTTPException(status_code=400, detail="format must be ndjson or csv")
 
         timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
         backups_dir = os.path.abspath(os.path.join(os.getcwd(), "..", "backups"))
         os.makedirs(backups_dir, exist_ok=True)
-        outpath = os.path.join(backups_dir, f"{source_id}_backup_{timestamp}.gz")
-
-        # Build mongodump command string using config.MONGO_URI and config.DATABASE_NAME
-        # This returns a command that the user can run locally (PowerShell friendly).
-        cmd = f'mongodump --uri="{config.MONGO_URI}" --db={config.DATABASE_NAME} --collection={coll} --archive="{outpath}" --gzip'
-
-        # Optionally: if environment allows, we could run mongodump here. For safety we don't by default.
-        # If you want to run it from the server, uncomment below (not recommended for local dev demo).
-        # import subprocess
-        # proc = subprocess.Popen(cmd, shell=True)
-        # background_tasks.add_task(proc.wait)
+        outpath = os.path.join(backups_dir, f"{source_id}_backup_{timestamp}.{format}.gz")
 
-        return JSONResponse(content={"command": cmd, "backup_path_suggested": outpath, "started_background": False})
+        # export runs in the threadpool so the event loop keeps serving requests
+        manifest = await run_in_threadpool(export_to_file, source_id, outpath, format, True)
+        return JSONResponse(content={"backup_path": outpath, "manifest": manifest})
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/export")
+async def api_export(source_id: str, format: str = "ndjson", compress: int = 1):
+    """
+    Streams data_<source_id> as NDJSON or CSV (gzip-compressed unless compress=0)
+    with constant server memory. CSV column order follows the latest schema.
+    """
+    coll = _collection_name_for_source(source_id)
+    if not _collection_exists(coll):
+        raise HTTPException(status_code=404, detail="Source collection not found")
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be ndjson or csv")
+    filename = f"{source_id}.{format}" + (".gz" if compress else "")
+    media_type = "application/gzip" if compress else ("text/csv" if format == "csv" else "application/x-ndjson")
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "X-Expected-Records": str(db[coll].estimated_document_count())
+    }
+    return StreamingResponse(iter_export(source_id, format, bool(compress)), media_type=media_type, headers=headers)
+
 # Use config.TEST_FILES_DIR if present, otherwise fallback to default path
 TEST_FILES_DIR = getattr(config, "TEST_FILES_DIR", None) or r"C:\Hackathon\etl_test_files"
 
@@ -294,8 +561,7 @@ async def api_process_file(filename: str = Query(..., description="Filename with
             raise HTTPException(status_code=400, detail="Invalid filename")
         if not target.exists() or not target.is_file():
             raise HTTPException(status_code=404, detail="File not found")
-        # Derive source_id from filename stem
-        source_id = "".join(c if c.isalnum() else "_" for c in target.stem).lower() or f"file_{int(datetime.utcnow().timestamp())}"
+        source_id = source_id_for_file(str(target))
         # Run pipeline in background so we return immediately
         background_tasks.add_task(run_pipeline, str(target), source_id)
         return JSONResponse(content={"status": "started", "source_id": source_id, "filename": filename})
@@ -316,12 +582,15 @@ async def api_delete_dataset(source_id: str, confirm: int = 0):
 
     try:
         src = _collection_name_for_source(source_id)
-        if src not in db.list_collection_names():
+        if not _collection_exists(src):
             raise HTTPException(status_code=404, detail="Source collection not found")
         ts = int(datetime.utcnow().timestamp())
         tgt = f"quarantine_{source_id}_{ts}"
         # renameCollection is atomic in MongoDB
         db[src].rename(tgt)
+        _collection_cache.pop(src, None)
+        reset_source_record_count(source_id)
+        drop_snapshots(source_id)
         return JSONResponse(content={"status": "ok", "moved_to": tgt})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,239 @@
+# bench_api.py
+# Concurrent load generator and latency benchmark for the HTTP API.
+# Mixes /upload writes with /records, /schema and /sources reads from C concurrent
+# clients for a fixed duration, then reports throughput and p50/p95/p99 latency
+# per endpoint and writes the results as JSON (compare runs with --compare).
+#
+# Usage (from hackathon_etl_v2 with venv active):
+#   python bench_api.py --base-url http://127.0.0.1:8000 --concurrency 16 --duration 30
+#   python bench_api.py --in-process                      # app in this process (needs httpx)
+#   python bench_api.py --in-process --mongomock          # ... and an in-memory Mongo stand-in
+#   python bench_api.py --mix upload=1,records=5,schema=3,sources=1 --synthetic 50
+#   python bench_api.py --compare bench_results/api_20250101T000000.json
+import argparse, json, os, platform, random, subprocess, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+HERE = Path(__file__).resolve().parent
+TEST_FILES = HERE.parent / "etl_test_files"
+UPLOAD_EXT = (".txt", ".md", ".html")
+DEFAULT_MIX = "upload=1,records=4,schema=3,sources=2"
+
+def parse_mix(spec: str) -> List[Tuple[str, float]]:
+    mix = []
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("upload", "records", "schema", "sources"):
+            raise SystemExit(f"Unknown endpoint in --mix: {name}")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+def synthetic_file(i: int, rng: random.Random) -> Tuple[str, bytes]:
+    """A small mixed-format text file (kv block, JSON object, CSV table)."""
+    lines = [f"name: item_{i}", f"category: {rng.choice(['a', 'b', 'c'])}", f"price: {rng.randint(1, 999)}", ""]
+    lines.append(json.dumps({"id": i, "tags": [rng.choice(["x", "y", "z"]) for _ in range(3)],
+                             "score": round(rng.random() * 100, 2)}))
+    lines += ["", "sku,qty,warehouse"]
+    lines += [f"sku{i}_{r},{rng.randint(0, 500)},w{rng.randint(1, 9)}" for r in range(rng.randint(3, 30))]
+    return f"synthetic_{i}.txt", "\n".join(lines).encode("utf-8")
+
+def load_corpus(synthetic: int, seed: int) -> List[Tuple[str, bytes]]:
+    if synthetic:
+        rng = random.Random(seed)
+        return [synthetic_file(i, rng) for i in range(synthetic)]
+    files = sorted(p for p in TEST_FILES.iterdir() if p.suffix.lower() in UPLOAD_EXT)
+    if not files:
+        raise SystemExit(f"No test files in {TEST_FILES}; use --synthetic N")
+    return [(p.name, p.read_bytes()) for p in files]
+
+def make_client_factory(args) -> Callable[[], Any]:
+    """Returns a factory giving each worker thread its own client (requests.Session or TestClient)."""
+    if args.in_process:
+        if args.mongomock:
+            # must be set before src.config is imported by the app
+            os.environ["ETL_MONGO_URI"] = "mongomock://"
+        sys.path.insert(0, str(HERE))
+        from fastapi.testclient import TestClient
+        from api.api import app
+        return lambda: TestClient(app, base_url="http://bench")
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    class _Session(requests.Session):
+        def request(self, method, url, *a, **kw):
+            return super().request(method, args.base_url.rstrip("/") + url, *a, **kw)
+
+    def factory():
+        s = _Session()
+        s.mount("http://", HTTPAdapter(pool_maxsize=1))
+        return s
+    return factory
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.status: Dict[str, Dict[str, int]] = {}
+
+    def add(self, endpoint: str, seconds: float, status: int):
+        with self.lock:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+            codes = self.status.setdefault(endpoint, {})
+            codes[str(status)] = codes.get(str(status), 0) + 1
+            if status >= 400 or status == 0:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+def percentile(xs: List[float], q: float) -> float:
+    if not xs:
+        return 0.0
+    return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+def summarize(rec: Recorder, elapsed: float) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    everything: List[float] = []
+    for ep, xs in sorted(rec.latencies.items()):
+        xs = sorted(xs)
+        everything += xs
+        out[ep] = {
+            "count": len(xs),
+            "errors": rec.errors.get(ep, 0),
+            "status": rec.status.get(ep, {}),
+            "throughput_rps": round(len(xs) / elapsed, 2),
+            "mean_ms": round(1000 * sum(xs) / len(xs), 2),
+            "p50_ms": round(1000 * percentile(xs, 0.50), 2),
+            "p95_ms": round(1000 * percentile(xs, 0.95), 2),
+            "p99_ms": round(1000 * percentile(xs, 0.99), 2),
+            "max_ms": round(1000 * xs[-1], 2),
+        }
+    everything.sort()
+    out["_total"] = {
+        "count": len(everything),
+        "errors": sum(rec.errors.values()),
+        "throughput_rps": round(len(everything) / elapsed, 2),
+        "p50_ms": round(1000 * percentile(everything, 0.50), 2),
+        "p95_ms": round(1000 * percentile(everything, 0.95), 2),
+        "p99_ms": round(1000 * percentile(everything, 0.99), 2),
+    }
+    return out
+
+def run_worker(worker_no: int, args, factory, corpus, mix, sources, deadline, rec: Recorder):
+    rng = random.Random(args.seed + worker_no)
+    client = factory()
+    names = [m[0] for m in mix]
+    weights = [m[1] for m in mix]
+    while time.perf_counter() < deadline:
+        ep = rng.choices(names, weights)[0]
+        sid = rng.choice(sources)
+        t0 = time.perf_counter()
+        try:
+            if ep == "upload":
+                name, body = rng.choice(corpus)
+                r = client.post("/upload", params={"source_id": sid}, files={"file": (name, body)})
+            elif ep == "records":
+                r = client.get("/records", params={"source_id": sid, "limit": args.page_size})
+            elif ep == "schema":
+                r = client.get("/schema", params={"source_id": sid})
+            else:
+                r = client.get("/sources")
+            status = r.status_code
+        except Exception as e:
+            status = 0
+            if args.verbose:
+                print(f"[{ep}] {e}")
+        rec.add(ep, time.perf_counter() - t0, status)
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return "unknown"
+
+def compare(current: Dict[str, Any], baseline_path: str):
+    base = json.loads(Path(baseline_path).read_text(encoding="utf-8"))["endpoints"]
+    print(f"\nvs {baseline_path}:")
+    print(f"{'endpoint':<10} {'rps':>16} {'p95 ms':>20} {'p99 ms':>20}")
+    for ep, cur in current.items():
+        if ep not in base:
+            continue
+        b = base[ep]
+        def delta(key):
+            old, new = b.get(key, 0), cur.get(key, 0)
+            pct = f"{100.0 * (new - old) / old:+.0f}%" if old else "n/a"
+            return f"{new:>9} ({pct:>5})"
+        print(f"{ep:<10} {delta('throughput_rps'):>16} {delta('p95_ms'):>20} {delta('p99_ms'):>20}")
+
+def main():
+    ap = argparse.ArgumentParser(description="API load/latency benchmark")
+    ap.add_argument("--base-url", default="http://127.0.0.1:8000")
+    ap.add_argument("--in-process", action="store_true", help="drive the FastAPI app in this process (TestClient)")
+    ap.add_argument("--mongomock", action="store_true", help="with --in-process: use the in-memory Mongo stand-in")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--duration", type=float, default=20.0, help="seconds of load after warm-up")
+    ap.add_argument("--mix", default=DEFAULT_MIX, help="endpoint weights, e.g. upload=1,records=4")
+    ap.add_argument("--sources", type=int, default=4, help="distinct source ids written and read")
+    ap.add_argument("--synthetic", type=int, default=0, help="use N synthetic files instead of etl_test_files")
+    ap.add_argument("--page-size", type=int, default=100)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", default=None, help="results JSON (default bench_results/api_<time>.json)")
+    ap.add_argument("--compare", default=None, help="baseline results JSON to diff against")
+    ap.add_argument("--verbose", action="store_true")
+    args = ap.parse_args()
+
+    mix = parse_mix(args.mix)
+    corpus = load_corpus(args.synthetic, args.seed)
+    sources = [f"bench_{i}" for i in range(args.sources)]
+    factory = make_client_factory(args)
+
+    # warm-up: every source gets data so reads don't all hit empty collections
+    warm = factory()
+    for i, sid in enumerate(sources):
+        name, body = corpus[i % len(corpus)]
+        r = warm.post("/upload", params={"source_id": sid}, files={"file": (name, body)})
+        if r.status_code != 200:
+            raise SystemExit(f"Warm-up upload failed ({r.status_code}): {r.text[:300]}")
+
+    rec = Recorder()
+    print(f"Benchmark: {args.concurrency} clients x {args.duration}s, mix {args.mix}, "
+          f"{len(corpus)} file(s), {'in-process' if args.in_process else args.base_url}")
+    t0 = time.perf_counter()
+    deadline = t0 + args.duration
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [pool.submit(run_worker, n, args, factory, corpus, mix, sources, deadline, rec)
+                   for n in range(args.concurrency)]
+        for f in futures:
+            f.result()
+    elapsed = time.perf_counter() - t0
+
+    endpoints = summarize(rec, elapsed)
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "mode": ("in-process" + ("+mongomock" if args.mongomock else "")) if args.in_process else args.base_url,
+            "concurrency": args.concurrency,
+            "duration_s": round(elapsed, 2),
+            "mix": args.mix,
+            "files": len(corpus),
+            "synthetic": bool(args.synthetic),
+            "python": platform.python_version(),
+        },
+        "endpoints": endpoints,
+    }
+
+    print(f"{'endpoint':<10} {'count':>7} {'err':>5} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for ep, s in endpoints.items():
+        print(f"{ep:<10} {s['count']:>7} {s['errors']:>5} {s['throughput_rps']:>9} "
+              f"{s['p50_ms']:>9} {s['p95_ms']:>9} {s['p99_ms']:>9}")
+
+    out = Path(args.out) if args.out else HERE / "bench_results" / f"api_{time.strftime('%Y%m%dT%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    print(f"Results written to {out}")
+    if args.compare:
+        compare(endpoints, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# bench_memory.py
+# Peak-memory comparison of the record representations between parse and storage:
+# list of dicts (parse_chunk) vs columnar RecordBatch (parse_chunk_batch), each
+# held in full and run through schema inference, on a large generated CSV and
+# JSON array chunk. Peaks are tracemalloc peaks above the input text.
+#
+# Usage (from hackathon_etl_v2 with venv active):
+#   python bench_memory.py                    # 200k rows per format
+#   python bench_memory.py --rows 1000000
+import argparse, json, random, sys, time, tracemalloc
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+
+def make_csv(rows: int, rng: random.Random) -> str:
+    lines = ["id,name,price,qty,active"]
+    for i in range(rows):
+        lines.append(f"{i},item-{rng.randrange(10**6)},{rng.random() * 100:.2f},{rng.randrange(1000)},{rng.random() < 0.5}")
+    return "\n".join(lines)
+
+def make_json(rows: int, rng: random.Random) -> str:
+    return json.dumps([{"id": i, "name": f"item-{rng.randrange(10**6)}", "price": round(rng.random() * 100, 2),
+                      "qty": rng.randrange(1000), "active": rng.random() < 0.5} for i in range(rows)], indent=1)
+
+def measure(fn):
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    t0 = time.perf_counter()
+    kept = fn()
+    seconds = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    del kept
+    return peak / 2**20, seconds
+
+def main():
+    ap = argparse.ArgumentParser(description="Record representation peak-memory benchmark")
+    ap.add_argument("--rows", type=int, default=200000)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    sys.path.insert(0, str(HERE))
+    from src.chunk_parser import parse_chunk, parse_chunk_batch
+    from src.schema import SchemaInferer
+
+    rng = random.Random(args.seed)
+    for ctype, content in (("csv", make_csv(args.rows, rng)), ("json", make_json(args.rows, rng))):
+        chunk = {"type": ctype, "content": content}
+
+        def dicts():
+            records = parse_chunk(chunk)
+            SchemaInferer.infer(records)
+            return records
+
+        def columns():
+            batch = parse_chunk_batch(chunk)
+            SchemaInferer.infer(batch)
+            return batch
+
+        d_mb, d_s = measure(dicts)
+        c_mb, c_s = measure(columns)
+        print(f"{ctype:<5} {args.rows} rows: dicts {d_mb:8.1f} MB {d_s:6.2f}s   "
+              f"batch {c_mb:8.1f} MB {c_s:6.2f}s   peak x{d_mb / c_mb:.1f} smaller")
+
+if __name__ == "__main__":
+    main()
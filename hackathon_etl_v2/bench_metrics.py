@@ -0,0 +1,107 @@
+# bench_metrics.py
+# Overhead benchmark for src/metrics.py.
+# 1. Micro: nanoseconds per Counter.inc / Histogram.observe, single-threaded and
+#    with --threads concurrent writers (the per-thread shards should keep this flat).
+# 2. Pipeline: the bench_pipeline stages over the synthetic corpus, alternating
+#    passes with metrics recording on and off; reports the relative slowdown and
+#    exits non-zero if it exceeds --max-overhead.
+#
+# Usage (from hackathon_etl_v2 with venv active):
+#   python bench_metrics.py                           # stages only, no storage
+#   python bench_metrics.py --storage mongomock       # + end_to_end (loader and ingest metrics too)
+#   python bench_metrics.py --size 16MB --repeat 5 --max-overhead 0.03
+import argparse, os, sys, threading, time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+
+def micro(n: int, threads: int):
+    from src import metrics
+    c = metrics.Counter("bench_counter", "benchmark only", ("k",))
+    h = metrics.Histogram("bench_histogram", "benchmark only", ("k",))
+    labels = ("x",)
+
+    def run_counter():
+        for _ in range(n):
+            c.inc(labels)
+
+    def run_hist():
+        for i in range(n):
+            h.observe(labels, (i % 100) / 1000.0)
+
+    def loop_only():
+        for _ in range(n):
+            pass
+
+    def timed(fn, k):
+        ts = [threading.Thread(target=fn) for _ in range(k)]
+        t0 = time.perf_counter()
+        for t in ts:
+            t.start()
+        for t in ts:
+            t.join()
+        return time.perf_counter() - t0
+
+    base = timed(loop_only, 1)
+    for name, fn in (("Counter.inc", run_counter), ("Histogram.observe", run_hist)):
+        one = (timed(fn, 1) - base) / n * 1e9
+        many = timed(fn, threads) / (n * threads) * 1e9
+        print(f"  {name:<18} {one:7.0f} ns/op (1 thread)   {many:7.0f} ns/op wall ({threads} threads)")
+    total = sum(c.values().values())
+    if total != n * (threads + 1):
+        raise SystemExit(f"Counter lost increments: {total} != {n * (threads + 1)}")
+    metrics._registry.remove(c)
+    metrics._registry.remove(h)
+
+def main():
+    ap = argparse.ArgumentParser(description="Metrics instrumentation overhead benchmark")
+    ap.add_argument("--size", default="8MB", help="pipeline corpus size")
+    ap.add_argument("--file-size", default="256KB")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=3, help="passes per mode; the fastest pass counts")
+    ap.add_argument("--storage", choices=("none", "mongomock", "mongo"), default="none")
+    ap.add_argument("--ops", type=int, default=200000, help="operations per micro benchmark")
+    ap.add_argument("--threads", type=int, default=4)
+    ap.add_argument("--max-overhead", type=float, default=0.03, help="allowed pipeline slowdown (0.03 = 3%%)")
+    args = ap.parse_args()
+
+    if args.storage == "mongomock":
+        os.environ["ETL_MONGO_URI"] = "mongomock://"
+    elif args.storage == "mongo":
+        os.environ.setdefault("ETL_DATABASE_NAME", "hackathon_bench")
+    sys.path.insert(0, str(HERE))
+    from src import metrics
+    from src.config import config
+    from src.synth import iter_files, parse_size
+    from bench_pipeline import run_stages
+    import tempfile, shutil
+
+    print("Micro:")
+    micro(args.ops, args.threads)
+
+    files = list(iter_files(parse_size(args.size), parse_size(args.file_size), args.seed))
+    print(f"Pipeline: {len(files)} file(s), storage {args.storage}, {args.repeat} pass(es) per mode")
+    config.BLOB_STORE_DIR = tempfile.mkdtemp(prefix="bench_blobs_")
+    best = {True: float("inf"), False: float("inf")}
+    try:
+        run_stages(files[:2], args.storage != "none")  # warm-up (imports, caches)
+        for _ in range(args.repeat):
+            for enabled in (False, True):
+                metrics.set_enabled(enabled)
+                res = run_stages(files, args.storage != "none")
+                best[enabled] = min(best[enabled], sum(v["seconds"] for v in res.values()))
+    finally:
+        metrics.set_enabled(config.METRICS_ENABLED)
+        shutil.rmtree(config.BLOB_STORE_DIR, ignore_errors=True)
+        if args.storage == "mongo" and config.DATABASE_NAME == "hackathon_bench":
+            from src.loader import client
+            client.drop_database(config.DATABASE_NAME)
+
+    overhead = (best[True] - best[False]) / best[False]
+    print(f"  metrics off {best[False]:.3f}s, on {best[True]:.3f}s: overhead {overhead:+.2%}")
+    if overhead > args.max_overhead:
+        print(f"FAILED: overhead above {args.max_overhead:.0%}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# bench_pipeline.py
+# Per-stage pipeline benchmark over a deterministic synthetic corpus (src/synth.py)
+# plus one large CSV export (--csv-size), so detection is also timed on a big
+# non-JSON input. Times chunk detection (budgeted, as the pipeline runs it), chunk
+# parsing, schema inference and sanitization separately, plus an end-to-end
+# run_pipeline stage when storage is available, and reports bytes/s and records/s
+# per stage. With --baseline, exits non-zero
+# if any stage's throughput dropped by more than --threshold.
+#
+# Usage (from hackathon_etl_v2 with venv active):
+#   python bench_pipeline.py --size 8MB                       # stages only, no storage
+#   python bench_pipeline.py --size 8MB --storage mongomock   # + end-to-end on in-memory Mongo
+#   python bench_pipeline.py --size 64MB --storage mongo      # + end-to-end on local Mongo (hackathon_bench db)
+#   python bench_pipeline.py --baseline bench_results/pipeline_base.json --threshold 0.15
+import argparse, json, os, platform, subprocess, sys, tempfile, time
+from pathlib import Path
+from typing import Any, Dict, List
+
+HERE = Path(__file__).resolve().parent
+STAGES = ("detect", "parse", "infer", "sanitize", "end_to_end")
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return "unknown"
+
+def run_stages(files: List[str], with_e2e: bool) -> Dict[str, Dict[str, float]]:
+    """One pass over the corpus; returns {stage: {"seconds", "records"}}."""
+    from src.extractor import detect_chunks_budgeted
+    from src.chunk_parser import parse_chunk_budgeted
+    from src.schema import SchemaInferer
+    from src.batch import RecordBatch
+
+    out = {s: {"seconds": 0.0, "records": 0} for s in STAGES if with_e2e or s != "end_to_end"}
+    for n, text in enumerate(files):
+        t0 = time.perf_counter()
+        chunks = detect_chunks_budgeted(text)
+        t1 = time.perf_counter()
+        records = RecordBatch()
+        for c in chunks:
+            records.extend(parse_chunk_budgeted(c))
+        t2 = time.perf_counter()
+        SchemaInferer.infer(records)
+        t3 = time.perf_counter()
+        for _ in records.sanitized().iter_dicts():
+            pass
+        t4 = time.perf_counter()
+        out["detect"]["seconds"] += t1 - t0
+        out["detect"]["records"] += len(chunks)
+        out["parse"]["seconds"] += t2 - t1
+        out["infer"]["seconds"] += t3 - t2
+        out["sanitize"]["seconds"] += t4 - t3
+        for s in ("parse", "infer", "sanitize"):
+            out[s]["records"] += len(records)
+
+        if with_e2e:
+            from src.pipeline import run_pipeline
+            with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False, encoding="utf-8") as f:
+                f.write(text)
+                path = f.name
+            try:
+                t0 = time.perf_counter()
+                run_pipeline(path, f"bench_{n % 8}")
+                out["end_to_end"]["seconds"] += time.perf_counter() - t0
+                out["end_to_end"]["records"] += len(records)
+            finally:
+                os.remove(path)
+    return out
+
+def check_regressions(stages: Dict[str, Any], baseline_path: str, threshold: float) -> List[str]:
+    base = json.loads(Path(baseline_path).read_text(encoding="utf-8"))["stages"]
+    failures = []
+    print(f"\nvs {baseline_path} (threshold {threshold:.0%}):")
+    for name, cur in stages.items():
+        if name not in base or not base[name].get("bytes_per_s"):
+            continue
+        old, new = base[name]["bytes_per_s"], cur["bytes_per_s"]
+        change = (new - old) / old
+        flag = "REGRESSION" if change < -threshold else "ok"
+        print(f"  {name:<11} {old / 1e6:>9.2f} -> {new / 1e6:>9.2f} MB/s ({change:+.1%}) {flag}")
+        if flag != "ok":
+            failures.append(name)
+    return failures
+
+def main():
+    ap = argparse.ArgumentParser(description="Per-stage pipeline benchmark")
+    ap.add_argument("--size", default="8MB", help="corpus size, e.g. 512KB, 64MB, 1GB")
+    ap.add_argument("--file-size", default="256KB", help="approximate size of each pipeline input")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--tiers", default="ABCD")
+    ap.add_argument("--csv-size", default="1MB", help="size of the extra CSV export input (0 skips it)")
+    ap.add_argument("--repeat", type=int, default=3, help="passes; the fastest pass per stage is reported")
+    ap.add_argument("--storage", choices=("none", "mongomock", "mongo"), default="none",
+                    help="storage for the end_to_end stage (none skips it)")
+    ap.add_argument("--baseline", default=None, help="previous results JSON to compare against")
+    ap.add_argument("--threshold", type=float, default=0.15, help="allowed throughput drop per stage (0.15 = 15%%)")
+    ap.add_argument("--out", default=None, help="results JSON (default bench_results/pipeline_<time>.json)")
+    args = ap.parse_args()
+
+    # storage must be chosen before src.config is imported
+    if args.storage == "mongomock":
+        os.environ["ETL_MONGO_URI"] = "mongomock://"
+    elif args.storage == "mongo":
+        os.environ.setdefault("ETL_DATABASE_NAME", "hackathon_bench")
+    sys.path.insert(0, str(HERE))
+    from src.config import config
+    from src.synth import csv_export, iter_files, parse_size
+    blob_dir = tempfile.mkdtemp(prefix="bench_blobs_")
+    config.BLOB_STORE_DIR = blob_dir
+
+    files = list(iter_files(parse_size(args.size), parse_size(args.file_size), args.seed, args.tiers))
+    if parse_size(args.csv_size):
+        files.append(csv_export(parse_size(args.csv_size), args.seed))
+    total_bytes = sum(len(t.encode("utf-8")) for t in files)
+    print(f"Corpus: {len(files)} file(s), {total_bytes / 1e6:.1f} MB, seed {args.seed}, tiers {args.tiers}, "
+          f"csv export {args.csv_size}")
+
+    best: Dict[str, Dict[str, float]] = {}
+    try:
+        for r in range(args.repeat):
+            res = run_stages(files, args.storage != "none")
+            for name, v in res.items():
+                if name not in best or v["seconds"] < best[name]["seconds"]:
+                    best[name] = v
+            print(f"  pass {r + 1}: " + ", ".join(f"{k} {v['seconds']:.2f}s" for k, v in res.items()))
+    finally:
+        import shutil
+        shutil.rmtree(blob_dir, ignore_errors=True)
+        if args.storage == "mongo" and config.DATABASE_NAME == "hackathon_bench":
+            from src.loader import client
+            client.drop_database(config.DATABASE_NAME)
+
+    stages = {}
+    for name, v in best.items():
+        secs = max(v["seconds"], 1e-9)
+        stages[name] = {"seconds": round(v["seconds"], 4), "records": v["records"],
+                        "bytes_per_s": round(total_bytes / secs, 1), "records_per_s": round(v["records"] / secs, 1)}
+
+    print(f"\n{'stage':<11} {'seconds':>9} {'MB/s':>9} {'records/s':>11}  (detect counts chunks)")
+    for name, s in stages.items():
+        print(f"{name:<11} {s['seconds']:>9.3f} {s['bytes_per_s'] / 1e6:>9.2f} {s['records_per_s']:>11.0f}")
+
+    result = {
+        "meta": {"commit": git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                 "size_bytes": total_bytes, "files": len(files), "seed": args.seed, "tiers": args.tiers,
+                 "csv_size": args.csv_size,
+                 "repeat": args.repeat, "storage": args.storage, "python": platform.python_version()},
+        "stages": stages,
+    }
+    out = Path(args.out) if args.out else HERE / "bench_results" / f"pipeline_{time.strftime('%Y%m%dT%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    print(f"Results written to {out}")
+
+    if args.baseline:
+        failures = check_regressions(stages, args.baseline, args.threshold)
+        if failures:
+            print(f"FAILED: throughput regression in {', '.join(failures)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# bench_snapshot.py
+# Group-by/count and field-statistics latency over a columnar snapshot
+# (src/snapshot.py) against the same aggregation done row by row over the
+# records as dicts, on generated sales-like records. Mongo isn't queried: the
+# columns are written to a temporary directory and read back memory-mapped
+# (importing src.snapshot connects the loader, so it gets the mongomock stand-in).
+#
+# Usage (from hackathon_etl_v2 with venv active, needs numpy and mongomock):
+#   python bench_snapshot.py                  # 1M records
+#   python bench_snapshot.py --rows 5000000
+import argparse, os, random, sys, tempfile, time
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+
+def make_docs(rows: int, rng: random.Random):
+    start = datetime(2024, 1, 1)
+    regions = ["eu", "us", "apac", "latam"]
+    for i in range(rows):
+        yield {"id": i, "region": rng.choice(regions), "store": f"s{rng.randrange(500)}",
+               "amount": round(rng.random() * 100, 2), "qty": rng.randrange(20),
+               "ts": start + timedelta(seconds=i)}
+
+def best_ms(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+def main():
+    ap = argparse.ArgumentParser(description="Columnar snapshot analytics benchmark")
+    ap.add_argument("--rows", type=int, default=1000000)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    os.environ["ETL_MONGO_URI"] = "mongomock://"
+    sys.path.insert(0, str(HERE))
+    from src.snapshot import Snapshot, write_columns
+
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        meta = write_columns(tmp, make_docs(args.rows, random.Random(args.seed)), {"source_id": "bench", "data_version": 0})
+        print(f"build   {args.rows} rows, {len(meta['columns'])} columns: {time.perf_counter() - t0:.2f}s")
+        snap = Snapshot(tmp, meta)
+        where = [{"field": "qty", "op": "gte", "value": 5}]
+
+        def columnar():
+            mask = snap.where_mask(where, {}, True)
+            return snap.aggregate(mask, ["region"], [{"op": "count", "as": "n"}, {"op": "sum", "field": "amount"}])
+
+        docs = list(make_docs(args.rows, random.Random(args.seed)))
+
+        def rows():
+            n, total = Counter(), Counter()
+            for d in docs:
+                if d["qty"] >= 5:
+                    n[d["region"]] += 1
+                    total[d["region"]] += d["amount"]
+            return n, total
+
+        print(f"group-by region, count+sum where qty>=5: snapshot {best_ms(columnar):8.1f} ms   "
+              f"dicts {best_ms(rows, 2):8.1f} ms")
+        print(f"group-by region+store count:             snapshot "
+              f"{best_ms(lambda: snap.aggregate(snap.where_mask([], {}, True), ['region', 'store'], [])):8.1f} ms")
+        print(f"field stats (all columns):               snapshot {best_ms(snap.field_stats, 3):8.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# build_snapshots.py
+# Build (or refresh) the memory-mapped columnar snapshots /query and /snapshot/stats
+# read from (src/snapshot.py, needs numpy). A snapshot belongs to one data version
+# of a source; ingesting into the source makes it stale until it is rebuilt.
+#
+# Usage (from hackathon_etl_v2 with venv active):
+#   python build_snapshots.py <source_id> [<source_id> ...]
+#   python build_snapshots.py --all           # every source in source_stats
+#   python build_snapshots.py <source_id> --stats
+import argparse, sys
+from bson import json_util
+from src.loader import get_source_stats
+from src.snapshot import SnapshotError, build_snapshot, load_snapshot
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Build columnar snapshots of sources")
+    ap.add_argument("source_ids", nargs="*")
+    ap.add_argument("--all", action="store_true", help="snapshot every source")
+    ap.add_argument("--stats", action="store_true", help="print field statistics after building")
+    args = ap.parse_args()
+    sources = [st["source_id"] for st in get_source_stats()] if args.all else args.source_ids
+    if not sources:
+        ap.error("give source ids or --all")
+
+    failed = False
+    for source_id in sources:
+        try:
+            meta = build_snapshot(source_id)
+        except SnapshotError as e:
+            print(f"{source_id}: error: {e}")
+            failed = True
+            continue
+        kinds = ", ".join(f"{c['name']}:{c['kind']}" for c in meta["columns"])
+        print(f"{source_id}: v{meta['data_version']} {meta['rows']} rows, {meta['bytes'] / 2**20:.1f} MB "
+              f"in {meta['seconds']:.2f}s  [{kinds}]" + (f"  skipped {meta['skipped']}" if meta["skipped"] else ""))
+        if args.stats:
+            print(json_util.dumps(load_snapshot(source_id).field_stats(), indent=2))
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,50 @@
+# export_source.py
+# Streaming export / import of a source's data collection.
+#
+# Usage (from hackathon_etl_v2 with venv active):
+#   python export_source.py export <source_id> <out_file> [--format ndjson|csv] [--no-gzip] [--batch-size N]
+#   python export_source.py import <in_file> <source_id> [--batch-size N] [--new-ids]
+#   python export_source.py verify <export_file>
+#
+# Exports write <out_file>.manifest.json (record count + sha256) and are verified after writing.
+# Import accepts NDJSON and CSV exports from this tool as well as repaired JSONL backups
+# (plain or .gz); the format comes from the manifest, else from the file name.
+import argparse, json, sys
+from src.exporter import export_to_file, import_file, verify_export
+
+def main():
+    ap = argparse.ArgumentParser(description="Streaming export/import for data_<source_id> collections")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    ex = sub.add_parser("export")
+    ex.add_argument("source_id")
+    ex.add_argument("out_file")
+    ex.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    ex.add_argument("--no-gzip", action="store_true")
+    ex.add_argument("--batch-size", type=int, default=None)
+
+    im = sub.add_parser("import")
+    im.add_argument("in_file")
+    im.add_argument("source_id")
+    im.add_argument("--batch-size", type=int, default=None)
+    im.add_argument("--new-ids", action="store_true", help="drop _id so documents get fresh ids")
+
+    ve = sub.add_parser("verify")
+    ve.add_argument("export_file")
+
+    args = ap.parse_args()
+    if args.cmd == "export":
+        out = args.out_file
+        if not args.no_gzip and not out.endswith(".gz"):
+            out += ".gz"
+        result = export_to_file(args.source_id, out, args.format, not args.no_gzip, args.batch_size)
+    elif args.cmd == "import":
+        result = import_file(args.in_file, args.source_id, args.batch_size, keep_ids=not args.new_ids)
+    else:
+        result = verify_export(args.export_file)
+    print(json.dumps(result, indent=2))
+    if args.cmd == "verify" and not result["ok"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
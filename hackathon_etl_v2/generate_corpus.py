@@ -0,0 +1,20 @@
+# generate_corpus.py
+# Write a deterministic synthetic corpus shaped like the etl_test_files tiers.
+#
+# Usage (from hackathon_etl_v2 with venv active):
+#   python generate_corpus.py data/synth --size 100MB --file-size 256KB --seed 1
+#   python generate_corpus.py data/synth_d --size 10MB --tiers D     # schema-evolution shapes only
+import argparse, time
+from src.synth import write_corpus, parse_size
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Generate a synthetic ETL corpus")
+    ap.add_argument("out_dir")
+    ap.add_argument("--size", default="10MB", help="total corpus size, e.g. 512KB, 100MB, 2GB")
+    ap.add_argument("--file-size", default="256KB", help="approximate size of each file")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--tiers", default="ABCD", help="subset of tiers A-D to draw shapes from")
+    args = ap.parse_args()
+    t0 = time.time()
+    paths = write_corpus(args.out_dir, parse_size(args.size), parse_size(args.file_size), args.seed, args.tiers)
+    print(f"Wrote {len(paths)} file(s) to {args.out_dir} in {time.time() - t0:.1f}s")
@@ -1,9 +1,65 @@
 # main.py
-import sys
-from src.pipeline import run_pipeline
+# Local ingestion without the HTTP API.
+#
+# Usage (from hackathon_etl_v2 with venv active):
+#   python main.py <file> <source_id>                      # one file, as before
+#   python main.py data/*.txt data/more/ --recursive       # many files; source id from each file name
+#   python main.py big_dump/ --source-id products          # everything into one source (runs serially)
+#   python main.py --manifest files.jsonl --workers 8      # {"path": ..., "source_id": ...} per line
+#   python main.py <file> <source_id> --profile           # + cProfile dump under data/profiles
+#   python main.py <file> <source_id> --typed             # store numbers/dates as native BSON types
+#
+# Files of different sources are ingested in parallel processes; files of the
+# same source run one after another so schema versions follow file order.
+# Finished files are recorded in --state, so re-running after an interruption
+# only ingests what is left (--state "" disables this).
+import argparse, os, sys
+from src.config import config
 
-if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python main.py <file> <source_id>")
+def is_legacy_call(inputs) -> bool:
+    """main.py <file> <source_id>: the second argument names a source, not a path."""
+    return len(inputs) == 2 and os.path.isfile(inputs[0]) and not os.path.exists(inputs[1]) \
+        and not any(ch in inputs[1] for ch in "*?[")
+
+def main():
+    ap = argparse.ArgumentParser(description="Ingest local files into the ETL store")
+    ap.add_argument("inputs", nargs="*", help="files, directories or glob patterns")
+    ap.add_argument("--manifest", action="append", default=[], help="file list (plain or JSONL); repeatable")
+    ap.add_argument("--source-id", default=None, help="source id for all files (default: derived from file name)")
+    ap.add_argument("--recursive", action="store_true", help="descend into subdirectories of directory inputs")
+    ap.add_argument("--workers", type=int, default=config.INGEST_WORKERS, help="parallel processes")
+    ap.add_argument("--state", default=config.INGEST_STATE_FILE, help="resume state file ('' to disable)")
+    ap.add_argument("--verbose", action="store_true", help="show the pipeline's own output")
+    ap.add_argument("--no-progress", action="store_true")
+    ap.add_argument("--profile", action="store_true", help="capture a cProfile dump per file (see /runs)")
+    ap.add_argument("--typed", action="store_true", help="cast values to int/double/date per the inferred schema")
+    args = ap.parse_args()
+    if is_legacy_call(args.inputs) and not (args.manifest or args.source_id):
+        from src.pipeline import run_pipeline
+        summary = run_pipeline(args.inputs[0], args.inputs[1], profile=args.profile, typed=args.typed)
+        if args.profile:
+            print(f"Profile written to {summary['profile_path']}")
+        return
+    if not args.inputs and not args.manifest:
+        ap.print_usage()
+        sys.exit(1)
+
+    from src.ingest import collect_inputs, run_bulk
+    files = collect_inputs(args.inputs, args.manifest, args.recursive, args.source_id)
+    if not files:
+        print("No supported files found.")
         sys.exit(1)
-    run_pipeline(sys.argv[1], sys.argv[2])
\ No newline at end of file
+    print(f"Ingesting {len(files)} file(s) with {args.workers} worker(s)")
+    summary = run_bulk(files, args.workers, args.state or None, quiet=not args.verbose,
+                       progress=not args.no_progress, profile=args.profile, typed=args.typed)
+
+    print(f"ok {summary['files']}, failed {summary['failed']}, skipped {summary['skipped']} (already done), "
+          f"{summary['sources']} source(s)")
+    print(f"{summary['records']} records in {summary['seconds']}s: "
+          f"{summary['records_per_s']} records/s, {summary['mb_per_s']} MB/s")
+    for f in summary["failures"]:
+        print(f"[FAILED] {f['path']} ({f['source_id']}): {f['error']}")
+    sys.exit(1 if summary["failures"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+# rebuild_search_index.py
+# Rebuild the inverted full-text index (search_postings / search_terms) from the chunks collection
+# and print an index-size report.
+#
+# Usage (from hackathon_etl_v2 with venv active):
+#   python rebuild_search_index.py               # all sources
+#   python rebuild_search_index.py <source_id>   # one source
+#   python rebuild_search_index.py --report      # size report only
+import json, sys, time
+from src.search import rebuild_index, index_size_report
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args and args[0] == "--report":
+        print(json.dumps(index_size_report(), indent=2))
+        sys.exit(0)
+    sid = args[0] if args else None
+    t0 = time.time()
+    n = rebuild_index(sid)
+    print(f"Indexed {n} chunk(s) in {time.time() - t0:.1f}s")
+    print(json.dumps(index_size_report(), indent=2))
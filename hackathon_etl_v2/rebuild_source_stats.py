@@ -0,0 +1,14 @@
+# rebuild_source_stats.py
+# Backfill the materialized source_stats collection from existing data
+# (chunks, data_<source_id> collections and schema_registry).
+#
+# Usage (from hackathon_etl_v2 with venv active):
+#   python rebuild_source_stats.py              # all sources
+#   python rebuild_source_stats.py src_a src_b  # selected sources
+import sys
+from src.loader import rebuild_source_stats
+
+if __name__ == "__main__":
+    ids = sys.argv[1:] or None
+    n = rebuild_source_stats(ids)
+    print(f"Rebuilt source_stats for {n} source(s)")
@@ -0,0 +1,44 @@
+# repair_keys.py
+# Repair documents whose field names are broken JSON fragments (supersedes the
+# per-document loops in repair_malformed_docs.py / repair_special_keys.py).
+# Affected documents are found server-side, fixed in bulk_write batches and the
+# _id space is scanned in parallel ranges. Findings are streamed as NDJSON.
+#
+# Usage (from hackathon_etl_v2 with venv active):
+#   python repair_keys.py test_source --dry-run          # report only
+#   python repair_keys.py test_source --workers 8
+#   python repair_keys.py --all --report repair.ndjson
+#   python repair_keys.py --collection data_test_source --drop-unparseable
+import argparse, sys, time
+from src.config import config
+from src.repair import repair_collection, iter_data_collections
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Bulk repair of malformed keys in data collections")
+    ap.add_argument("source_ids", nargs="*")
+    ap.add_argument("--all", action="store_true", help="every data_<source_id> collection")
+    ap.add_argument("--collection", action="append", default=[], help="explicit collection name (repeatable)")
+    ap.add_argument("--workers", type=int, default=config.REPAIR_WORKERS, help="parallel _id ranges per collection")
+    ap.add_argument("--dry-run", action="store_true", help="report findings without writing")
+    ap.add_argument("--drop-unparseable", action="store_true", help="also remove suspicious keys that can't be repaired")
+    ap.add_argument("--report", default="-", help="NDJSON report path ('-' = stdout)")
+    args = ap.parse_args()
+
+    colls = list(args.collection) + [f"{config.DATA_COLLECTION_PREFIX}{sid}" for sid in args.source_ids]
+    if args.all:
+        colls += list(iter_data_collections())
+    if not colls:
+        ap.error("give source ids, --collection or --all")
+
+    out = sys.stdout if args.report == "-" else open(args.report, "w", encoding="utf-8")
+    try:
+        for name in dict.fromkeys(colls):
+            t0 = time.time()
+            totals = repair_collection(name, workers=args.workers, dry_run=args.dry_run,
+                                       drop_unparseable=args.drop_unparseable, report_out=out)
+            print(f"{name}: matched {totals['matched']}, repaired {totals['repaired']}, "
+                  f"unparseable keys {totals['unparseable_keys']} in {time.time() - t0:.1f}s"
+                  + (" (dry run)" if args.dry_run else ""), file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
@@ -0,0 +1,32 @@
+# reprocess.py
+# Re-derive stored sources from their raw text after a parser or chunk-detection change.
+# Only chunks whose parser version (config.PARSER_VERSIONS) or detected type/span changed
+# are re-parsed; the regenerated data collection is swapped in atomically.
+# Interrupted runs resume from the reprocess_checkpoints collection.
+#
+# Usage (from hackathon_etl_v2 with venv active):
+#   python reprocess.py --all                      # every source
+#   python reprocess.py src_a src_b --workers 4    # selected sources, 4 in parallel
+#   python reprocess.py --all --dry-run            # show the plan only
+import argparse, json, time
+from src.loader import get_source_stats
+from src.reprocess import reprocess_sources
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Incrementally reprocess stored sources")
+    ap.add_argument("source_ids", nargs="*")
+    ap.add_argument("--all", action="store_true", help="reprocess every known source")
+    ap.add_argument("--workers", type=int, default=1, help="sources processed in parallel")
+    ap.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    args = ap.parse_args()
+
+    ids = args.source_ids
+    if args.all:
+        ids = [s["source_id"] for s in get_source_stats()]
+    if not ids:
+        ap.error("give source ids or --all")
+
+    t0 = time.time()
+    for res in reprocess_sources(ids, workers=args.workers, dry_run=args.dry_run):
+        print(json.dumps(res))
+    print(f"Reprocessed {len(ids)} source(s) in {time.time() - t0:.1f}s")
@@ -0,0 +1,38 @@
+# resume_run.py
+# Inspect, resume or roll back checkpointed pipeline runs (pipeline_runs collection).
+# A run that failed or was killed keeps its last committed batch; resuming discards
+# the half-written batch and continues from there, rolling back removes every
+# chunk, record and search posting the run wrote.
+#
+# Usage (from hackathon_etl_v2 with venv active):
+#   python resume_run.py list                 # unfinished runs (status running/error)
+#   python resume_run.py resume <run_id>      # continue from the last checkpoint
+#   python resume_run.py rollback <run_id>    # remove the run's partial writes
+import argparse, json, sys
+from src.pipeline import resume_pipeline
+from src.runs import RunStateError, list_runs, rollback_run
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Resume or roll back checkpointed pipeline runs")
+    ap.add_argument("command", choices=("list", "resume", "rollback"))
+    ap.add_argument("run_id", nargs="?")
+    ap.add_argument("--status", default=None, help="with list: only runs with this status")
+    ap.add_argument("--profile", action="store_true", help="with resume: capture a cProfile dump")
+    args = ap.parse_args()
+    if args.command != "list" and not args.run_id:
+        ap.error(f"{args.command} needs a run_id")
+
+    try:
+        if args.command == "list":
+            for run in list_runs(args.status):
+                ckpt = run.get("checkpoint") or {}
+                print(f"{run['run_id']}  {run['status']:<8} {run['source_id']:<24} {run.get('file')}  "
+                      f"batch {ckpt.get('batch', 0)}, chunks {ckpt.get('chunk_cursor', 0)}/{run.get('chunks_total', '?')}, "
+                      f"records {ckpt.get('records', 0)}  {run.get('error') or ''}")
+        elif args.command == "resume":
+            print(json.dumps(resume_pipeline(args.run_id, profile=args.profile)))
+        else:
+            print(json.dumps({"run_id": args.run_id, "removed": rollback_run(args.run_id)}))
+    except RunStateError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
@@ -0,0 +1,32 @@
+# salvage_backup.py
+# Parallel repair of a possibly-broken JSONL backup (supersedes repair_backup_jsonl.py
+# and repair_malformed_backup.py for large files). Valid lines get malformed keys
+# fixed, broken lines have embedded JSON salvaged, anything else is kept as _raw_line.
+# Output line order matches the input; the report lists only lines that changed.
+#
+# Usage (from hackathon_etl_v2 with venv active):
+#   python salvage_backup.py backups/data_test_source.jsonl backups/data_test_source_repaired.jsonl
+#   python salvage_backup.py in.jsonl out.jsonl --workers 8 --report out.report.ndjson
+import argparse, json, os, sys, time
+from src.salvage import repair_file
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Repair a JSONL backup in parallel")
+    ap.add_argument("input")
+    ap.add_argument("output")
+    ap.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    ap.add_argument("--report", default=None, help="NDJSON report path (default: <output>.report.ndjson)")
+    args = ap.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"Input file not found: {args.input}")
+        sys.exit(2)
+    report = args.report or f"{args.output}.report.ndjson"
+    t0 = time.time()
+    totals = repair_file(args.input, args.output, report, workers=args.workers)
+    elapsed = time.time() - t0
+    mb = totals["input_bytes"] / (1024 * 1024)
+    print("Wrote repaired JSONL to:", args.output)
+    print("Report written to:", report)
+    print(f"{mb:.1f} MB in {elapsed:.1f}s ({mb / max(elapsed, 1e-9):.1f} MB/s)")
+    print("Stats:", json.dumps(totals, indent=2))
@@ -0,0 +1,212 @@
+# src/batch.py
+from array import array
+from collections.abc import Mapping
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from src.sanitize import sanitize_value
+
+# Columnar record batches passed between parsing, schema inference, profiling and
+# storage. Column names are stored once per batch and values live in one list per
+# column, so narrow records cost a list slot per value instead of a dict each.
+# Fully int or fully float columns are packed into arrays by compact().
+# Records become dicts only when they are written (iter_dicts). A field a record
+# doesn't have holds MISSING, which is not the same as a None value.
+
+class _Missing:
+    __slots__ = ()
+
+    def __repr__(self):
+        return "MISSING"
+
+    def __bool__(self):
+        return False
+
+    def __reduce__(self):
+        # unpickles to the module singleton, so `is MISSING` survives worker processes
+        return "MISSING"
+
+MISSING = _Missing()
+
+# python int range that fits array('q')
+_INT64 = (-(1 << 63), (1 << 63) - 1)
+
+class RowView(Mapping):
+    """Read-only dict-like view of one row; holds no per-row copy of names or values."""
+    __slots__ = ("_batch", "_i")
+
+    def __init__(self, batch: "RecordBatch", i: int):
+        self._batch = batch
+        self._i = i
+
+    def __getitem__(self, key):
+        j = self._batch._index.get(key)
+        if j is None:
+            raise KeyError(key)
+        v = self._batch.columns[j][self._i]
+        if v is MISSING:
+            raise KeyError(key)
+        return v
+
+    def __iter__(self):
+        i = self._i
+        for name, col in zip(self._batch.names, self._batch.columns):
+            if col[i] is not MISSING:
+                yield name
+
+    def __len__(self):
+        i = self._i
+        return sum(1 for col in self._batch.columns if col[i] is not MISSING)
+
+    def items(self) -> List[Tuple[Any, Any]]:
+        i = self._i
+        return [(name, col[i]) for name, col in zip(self._batch.names, self._batch.columns) if col[i] is not MISSING]
+
+    def to_dict(self) -> Dict[Any, Any]:
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"RowView({self.to_dict()!r})"
+
+class RecordBatch:
+    __slots__ = ("names", "columns", "n", "_index")
+
+    def __init__(self, names: Sequence[Any] = (), columns: Sequence[Sequence[Any]] = None, n: int = 0):
+        self.names: List[Any] = list(names)
+        self.columns: List[Any] = list(columns) if columns is not None else [[] for _ in self.names]
+        self.n = n
+        self._index: Dict[Any, int] = {name: j for j, name in enumerate(self.names)}
+
+    @classmethod
+    def from_records(cls, records: Iterable[Any]) -> "RecordBatch":
+        """Columnize parsed records; non-dict values become {"value": v}, as records_for_chunk did."""
+        batch = cls()
+        if not isinstance(records, (list, tuple)):
+            records = [records]
+        for rec in records:
+            batch.append(rec if isinstance(rec, Mapping) else {"value": rec})
+        return batch
+
+    # -- building -----------------------------------------------------------
+
+    def _col(self, name: Any) -> List[Any]:
+        j = self._index.get(name)
+        if j is None:
+            j = self._index[name] = len(self.names)
+            self.names.append(name)
+            self.columns.append([MISSING] * self.n)
+        col = self.columns[j]
+        if isinstance(col, array):
+            col = self.columns[j] = col.tolist()
+        return col
+
+    def add_column(self, name: Any, values: List[Any]):
+        if len(values) != self.n:
+            raise ValueError(f"column {name!r} has {len(values)} values for {self.n} rows")
+        self._col(name)
+        self.columns[self._index[name]] = values
+
+    def append(self, rec: Mapping):
+        for k, v in rec.items():
+            self._col(k).append(v)
+        self.n += 1
+        for j, col in enumerate(self.columns):
+            if len(col) < self.n:
+                self._col(self.names[j]).append(MISSING)
+
+    def set_row(self, i: int, rec: Mapping):
+        """Replace row i (reservoir sampling); fields the new record lacks become MISSING."""
+        for name in self.names:
+            self._col(name)[i] = MISSING
+        for k, v in rec.items():
+            self._col(k)[i] = v
+
+    def extend(self, other: "RecordBatch"):
+        for name in list(self.names):
+            if name not in other._index:
+                self._col(name).extend([MISSING] * other.n)
+        for name, col in zip(other.names, other.columns):
+            self._col(name).extend(col)
+        self.n += other.n
+
+    def compact(self) -> "RecordBatch":
+        """Pack columns that hold only ints (int64 range) or only floats into arrays."""
+        for j, col in enumerate(self.columns):
+            if isinstance(col, array) or not col:
+                continue
+            types = set(map(type, col))
+            if types == {int} and _INT64[0] <= min(col) and max(col) <= _INT64[1]:
+                self.columns[j] = array("q", col)
+            elif types == {float}:
+                self.columns[j] = array("d", col)
+        return self
+
+    # -- reading ------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __iter__(self) -> Iterator[RowView]:
+        for i in range(self.n):
+            yield RowView(self, i)
+
+    def row(self, i: int) -> RowView:
+        return RowView(self, i)
+
+    def column(self, name: Any) -> Optional[Sequence[Any]]:
+        j = self._index.get(name)
+        return None if j is None else self.columns[j]
+
+    def present(self, name: Any) -> Iterator[Any]:
+        """Values of a column, skipping rows without the field."""
+        col = self.column(name) or ()
+        return col if isinstance(col, array) else (v for v in col if v is not MISSING)
+
+    def is_raw(self) -> bool:
+        """True for the single _raw record a chunk falls back to when nothing parsed."""
+        col = self.column("_raw")
+        return self.n == 1 and col is not None and col[0] is not MISSING
+
+    def head(self, k: int) -> List[Dict[Any, Any]]:
+        return [r.to_dict() for r in islice(self, k)]
+
+    # -- storage boundary ---------------------------------------------------
+
+    def sanitized(self, native: Tuple[type, ...] = ()) -> "RecordBatch":
+        """
+        Column-wise sanitize_value; names become strings as sanitize_doc makes them.
+        Values of the `native` types are kept as they are (typed ingest keeps dates).
+        """
+        out = RecordBatch()
+        out.n = self.n
+        keep = (str, int, float, bool) + tuple(native)
+        for name, col in zip(self.names, self.columns):
+            if not isinstance(col, array):
+                col = [v if v is MISSING or v is None or type(v) in keep else sanitize_value(v)
+                       for v in col]
+            key = str(name)
+            if key in out._index:
+                # two names with the same str() (e.g. None and "None"): later one wins, as in a dict
+                prev = out.columns[out._index[key]]
+                col = [b if b is not MISSING else a for a, b in zip(prev, col)]
+                out.columns[out._index[key]] = col
+            else:
+                out._index[key] = len(out.names)
+                out.names.append(key)
+                out.columns.append(col)
+        return out
+
+    def iter_dicts(self, extra: Dict[str, Any] = None, start: int = 0, stop: int = None) -> Iterator[Dict[Any, Any]]:
+        """Rows as plain dicts (optionally with constant fields such as _chunk_id appended)."""
+        names, columns = self.names, self.columns
+        stop = self.n if stop is None else min(stop, self.n)
+        for i in range(start, stop):
+            d = {name: col[i] for name, col in zip(names, columns) if col[i] is not MISSING}
+            if extra:
+                d.update(extra)
+            yield d
+
+    def to_dicts(self) -> List[Dict[Any, Any]]:
+        return list(self.iter_dicts())
+
+    def __repr__(self):
+        return f"RecordBatch({self.n} rows, columns={self.names!r})"
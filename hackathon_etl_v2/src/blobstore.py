@@ -0,0 +1,139 @@
+# src/blobstore.py
+import hashlib, json, os, struct, tempfile, zlib
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+from src.config import config
+
+# Content-addressed store for extracted upload text.
+#
+# Each blob is written once to <BLOB_STORE_DIR>/<id[:2]>/<id>.blob where id is the
+# SHA-256 of the UTF-8 text, so re-uploading the same content is free.
+# The text is split into fixed-size character blocks that are compressed
+# independently, so a (start, end) character range can be read by decompressing
+# only the blocks it touches. Layout:
+#
+#   b"ETLB" | u32 header_len | header JSON | block 0 | block 1 | ...
+#   header = {"codec": "zstd"|"zlib", "block_chars": N, "n_chars": total,
+#             "blocks": [[byte_offset, byte_length], ...]}   (offsets after the header)
+
+MAGIC = b"ETLB"
+
+def _codec():
+    """zstd when the optional zstandard package is installed, zlib otherwise."""
+    try:
+        import zstandard
+        return "zstd", zstandard.ZstdCompressor(level=config.BLOB_ZSTD_LEVEL).compress
+    except ImportError:
+        return "zlib", lambda b: zlib.compress(b, config.BLOB_ZLIB_LEVEL)
+
+def _decompressor(codec: str):
+    if codec == "zstd":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise RuntimeError("zstandard is required to read zstd-compressed blobs") from e
+        return zstandard.ZstdDecompressor().decompress
+    return zlib.decompress
+
+def blob_id_for(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def blob_path(blob_id: str) -> str:
+    return os.path.join(config.BLOB_STORE_DIR, blob_id[:2], f"{blob_id}.blob")
+
+def put_text(text: str) -> str:
+    """
+    Store text (if not already present) and return its blob id.
+    """
+    blob_id = blob_id_for(text)
+    path = blob_path(blob_id)
+    if os.path.exists(path):
+        return blob_id
+
+    codec, compress = _codec()
+    size = config.BLOB_BLOCK_CHARS
+    blocks: List[bytes] = [compress(text[i:i + size].encode("utf-8")) for i in range(0, len(text), size)]
+    index, offset = [], 0
+    for b in blocks:
+        index.append([offset, len(b)])
+        offset += len(b)
+    header = json.dumps({"codec": codec, "block_chars": size, "n_chars": len(text), "blocks": index}).encode("utf-8")
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # a temp file of its own per writer: threads of one process may store the same blob at once
+    fd, tmp = tempfile.mkstemp(prefix=f"{blob_id}.", suffix=".tmp", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<I", len(header)))
+            f.write(header)
+            for b in blocks:
+                f.write(b)
+        # atomic publish; a concurrent writer of the same blob produces identical bytes
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return blob_id
+
+@lru_cache(maxsize=1024)
+def _header(blob_id: str) -> Tuple[Dict[str, Any], int]:
+    with open(blob_path(blob_id), "rb") as f:
+        if f.read(4) != MAGIC:
+            raise ValueError(f"Not a blob file: {blob_id}")
+        (hlen,) = struct.unpack("<I", f.read(4))
+        return json.loads(f.read(hlen).decode("utf-8")), 8 + hlen
+
+@lru_cache(maxsize=config.BLOB_CACHE_BLOCKS)
+def _block(blob_id: str, idx: int) -> str:
+    header, data_start = _header(blob_id)
+    offset, length = header["blocks"][idx]
+    with open(blob_path(blob_id), "rb") as f:
+        f.seek(data_start + offset)
+        raw = f.read(length)
+    return _decompressor(header["codec"])(raw).decode("utf-8")
+
+def read_range(blob_id: str, start: int, end: int) -> str:
+    """
+    Return text[start:end] of a blob, decompressing only the blocks that overlap
+    the range (recently used blocks are served from a small LRU cache).
+    """
+    header, _ = _header(blob_id)
+    size = header["block_chars"]
+    start = max(0, start)
+    end = min(end, header["n_chars"])
+    if end <= start:
+        return ""
+    parts = []
+    for idx in range(start // size, (end - 1) // size + 1):
+        block = _block(blob_id, idx)
+        lo = max(start - idx * size, 0)
+        hi = min(end - idx * size, size)
+        parts.append(block[lo:hi])
+    return "".join(parts)
+
+def cache_stats() -> Dict[str, Dict[str, float]]:
+    """Entries, hits, misses and hit rate of the header and block LRU caches."""
+    out = {}
+    for name, fn in (("blob_block", _block), ("blob_header", _header)):
+        info = fn.cache_info()
+        total = info.hits + info.misses
+        out[name] = {"entries": info.currsize, "hits": info.hits, "misses": info.misses,
+                     "hit_rate": info.hits / total if total else 0.0}
+    return out
+
+def read_text(blob_id: str) -> str:
+    header, _ = _header(blob_id)
+    return read_range(blob_id, 0, header["n_chars"])
+
+def chunk_text(chunk: Dict[str, Any]) -> str:
+    """
+    Text of a stored chunk: loaded lazily from its blob, or the inline content
+    of chunks stored before the blob store existed.
+    """
+    if chunk.get("blob_id"):
+        return read_range(chunk["blob_id"], chunk.get("start", 0), chunk.get("end", 0)).strip()
+    return chunk.get("content") or ""
@@ -0,0 +1,105 @@
+# src/budget.py
+import multiprocessing
+from typing import Any, Callable, Tuple
+import yaml
+from src.config import config
+
+# Work limits for parsing untrusted chunks.
+#
+# - cheap structural limits enforced inline (YAML aliases / nesting, HTML rows)
+# - run_isolated(): runs a function in a separate process with a hard wall-time
+#   limit (and, where the OS supports it, an address-space cap), killing it on
+#   timeout, so one pathological input can't stall a whole upload.
+# Limits that trip raise ChunkBudgetExceeded; callers downgrade the chunk to a raw
+# record carrying the reason code.
+
+class ChunkBudgetExceeded(Exception):
+    """A parse exceeded one of its limits; .reason is a short machine-readable code."""
+
+    def __init__(self, reason: str, detail: str = ""):
+        super().__init__(f"{reason}: {detail}" if detail else reason)
+        self.reason = reason
+
+class LimitedSafeLoader(yaml.SafeLoader):
+    """
+    SafeLoader that caps alias references (billion-laughs style expansion) and
+    node nesting depth while composing.
+    """
+
+    def __init__(self, stream):
+        super().__init__(stream)
+        self._aliases = 0
+        self._depth = 0
+
+    def compose_node(self, parent, index):
+        if self.check_event(yaml.AliasEvent):
+            self._aliases += 1
+            if self._aliases > config.YAML_MAX_ALIASES:
+                raise ChunkBudgetExceeded("yaml_aliases", f"more than {config.YAML_MAX_ALIASES} aliases")
+        self._depth += 1
+        try:
+            if self._depth > config.YAML_MAX_DEPTH:
+                raise ChunkBudgetExceeded("yaml_depth", f"nesting deeper than {config.YAML_MAX_DEPTH}")
+            return super().compose_node(parent, index)
+        finally:
+            self._depth -= 1
+
+def _limit_memory():
+    if not config.ISOLATED_MAX_MB:
+        return
+    try:
+        import resource
+    except ImportError:
+        # not available on Windows; the wall-time limit still applies
+        return
+    cap = config.ISOLATED_MAX_MB * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (cap, cap))
+
+def _isolated_target(conn, func: Callable, args: Tuple):
+    try:
+        _limit_memory()
+        conn.send((True, func(*args)))
+    except MemoryError:
+        conn.send((False, "memory"))
+    except ChunkBudgetExceeded as e:
+        conn.send((False, e.reason))
+    except Exception as e:
+        # exceptions aren't always picklable; the message is enough
+        conn.send((False, f"error: {e}"))
+    finally:
+        conn.close()
+
+def run_isolated(func: Callable, args: Tuple, timeout: float) -> Any:
+    """
+    Run func(*args) in a spawned process and return its result. The process is
+    killed after `timeout` seconds. func must be a module-level function whose
+    module can be imported without side effects (no database connection).
+    Raises ChunkBudgetExceeded("timeout" | "memory" | "worker_died" | "worker_error").
+    """
+    ctx = multiprocessing.get_context("spawn")
+    recv, send = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_isolated_target, args=(send, func, args), daemon=True)
+    proc.start()
+    send.close()
+    ok, payload = False, "timeout"
+    try:
+        if recv.poll(timeout):
+            ok, payload = recv.recv()
+    except EOFError:
+        payload = "worker_died"
+    finally:
+        if proc.is_alive():
+            proc.terminate()
+        proc.join(1)
+        recv.close()
+    if ok:
+        return payload
+    if payload == "timeout":
+        raise ChunkBudgetExceeded("timeout", f"no result within {timeout}s")
+    if payload == "worker_died":
+        raise ChunkBudgetExceeded("worker_died", f"exit code {proc.exitcode}")
+    if payload == "memory":
+        raise ChunkBudgetExceeded("memory", f"over {config.ISOLATED_MAX_MB} MB")
+    if not payload.startswith("error: "):
+        raise ChunkBudgetExceeded(payload)
+    raise ChunkBudgetExceeded("worker_error", payload[len("error: "):])
@@ -0,0 +1,71 @@
+# src/cache.py
+import gzip, hashlib, threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+class CacheEntry:
+    __slots__ = ("etag", "body", "_gzipped")
+
+    def __init__(self, etag: str, body: bytes):
+        self.etag = etag
+        self.body = body
+        self._gzipped: Optional[bytes] = None
+
+    def gzipped(self) -> bytes:
+        # compressed lazily, once, and reused for every later hit
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, compresslevel=6)
+        return self._gzipped
+
+class ResponseCache:
+    """
+    Small thread-safe LRU of serialized response bodies.
+    Keys are (endpoint, params, data_version) tuples: a new ingest bumps the
+    version, so stale entries are never served and simply age out of the LRU.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def etag_for(key: Tuple[Any, ...], encoding: str = "identity") -> str:
+        """
+        Deterministic strong ETag for a key, so a conditional GET can be answered
+        with 304 without building (or even having cached) the body. Strong ETags
+        must differ per content-coding, so the gzip body gets its own ("...-gzip").
+        """
+        tag = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return f'"{tag}"' if encoding == "identity" else f'"{tag}-{encoding}"'
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Tuple[Any, ...], body: bytes) -> CacheEntry:
+        entry = CacheEntry(self.etag_for(key), body)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "hit_rate": (self.hits / total) if total else 0.0}
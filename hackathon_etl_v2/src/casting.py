@@ -0,0 +1,143 @@
+# src/casting.py
+import re
+from array import array
+from datetime import datetime, timezone
+from decimal import InvalidOperation
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence, Tuple
+from bson.decimal128 import Decimal128
+from src.batch import MISSING, RecordBatch
+from src.config import config
+
+# Typed ingest: string values are cast to native BSON types (int64, double or
+# Decimal128, date) one column at a time before storage, following the schema's
+# suggested_type. A string that doesn't cast is stored as None and kept verbatim
+# under ORIG_FIELD ({"_orig": {"price": "n/a"}}), so nothing is lost; empty
+# strings become None. Values that aren't strings are left as they are.
+
+ORIG_FIELD = "_orig"
+CAST_TYPES = ("integer", "decimal", "date", "datetime")
+# types sanitize must let through untouched for typed records
+NATIVE_TYPES = (datetime, Decimal128)
+
+# no leading zeros: "007" and zip codes stay strings
+INT_RE = re.compile(r"[-+]?(?:0|[1-9]\d*)")
+DECIMAL_RE = re.compile(r"[-+]?(?:(?:0|[1-9]\d*)(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?")
+DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d{1,6})?)?(?:Z|[+-]\d{2}:\d{2})?)?")
+
+_INT64 = (-(1 << 63), (1 << 63) - 1)
+
+def _to_int(s: str) -> int:
+    v = int(s)
+    if not _INT64[0] <= v <= _INT64[1]:
+        raise OverflowError(s)
+    return v
+
+def to_datetime(s: str) -> datetime:
+    dt = datetime.fromisoformat(s[:-1] + "+00:00" if s.endswith("Z") else s)
+    # BSON dates are UTC; naive values are taken as UTC already
+    return dt.astimezone(timezone.utc).replace(tzinfo=None) if dt.tzinfo else dt
+
+def _caster(target: str) -> Tuple[re.Pattern, Callable[[str], Any]]:
+    if target == "integer":
+        return INT_RE, _to_int
+    if target == "decimal":
+        return DECIMAL_RE, Decimal128 if config.TYPED_DECIMAL == "decimal128" else float
+    return DATE_RE, to_datetime
+
+def detect_string_type(values: Iterable[Any]) -> Optional[str]:
+    """
+    "integer", "decimal" or "date" when at least TYPED_MIN_MATCH of the non-empty
+    strings in `values` cast to it (the rest are cast failures, e.g. "n/a"), None
+    otherwise or when there are no strings to go by.
+    """
+    strs = [v for v in values if type(v) is str and v.strip()]
+    if not strs:
+        return None
+    n = len(strs)
+    # a lone outlier ("n/a") is tolerated in a short column too
+    need = min(config.TYPED_MIN_MATCH * n, n - 1) if n >= 4 else n
+    ints = [s for s in strs if INT_RE.fullmatch(s)]
+    if len(ints) >= need:
+        return "integer" if all(_INT64[0] <= int(s) <= _INT64[1] for s in ints) else "decimal"
+    if sum(1 for s in strs if DECIMAL_RE.fullmatch(s)) >= need:
+        return "decimal"
+    if sum(1 for s in strs if DATE_RE.fullmatch(s)) >= need:
+        return "date"
+    return None
+
+def cast_column(col: Sequence[Any], target: str) -> Tuple[Sequence[Any], Dict[int, str]]:
+    """
+    Cast the strings of one column to `target`. Returns the new column (packed into
+    an array when it came out all int64 / all double) and {row: original string}
+    for the strings that didn't cast.
+    """
+    if isinstance(col, array):
+        return col, {}
+    pattern, conv = _caster(target)
+    # fast path: a column of valid strings (the common CSV case) casts in one map
+    if all(type(v) is str for v in col) and all(map(pattern.fullmatch, col)):
+        try:
+            out = list(map(conv, col))
+        except (ValueError, OverflowError, InvalidOperation):
+            pass  # e.g. an int64 overflow or 2024-02-30: take the per-value path
+        else:
+            if target == "integer":
+                return array("q", out), {}
+            if conv is float:
+                return array("d", out), {}
+            return out, {}
+    out = list(col)
+    failed: Dict[int, str] = {}
+    for i, v in enumerate(col):
+        if type(v) is not str:
+            continue
+        if not v.strip():
+            out[i] = None
+            continue
+        try:
+            if not pattern.fullmatch(v):
+                raise ValueError(v)
+            out[i] = conv(v)
+        except (ValueError, OverflowError, InvalidOperation):
+            out[i] = None
+            failed[i] = v
+    return out, failed
+
+def plan_casts(names: Iterable[Any], guess: Dict[str, Any], known: Dict[str, Any]) -> Dict[Any, Optional[str]]:
+    """
+    Cast target per column: the stored schema's suggested_type when it names a
+    castable type, else the suggested_type inferred (with string detection) from the
+    records at hand. Internal fields (_raw, _chunk_type, ...) are never cast.
+    """
+    plan: Dict[Any, Optional[str]] = {}
+    for name in names:
+        target = None
+        if isinstance(name, str) and not name.startswith("_"):
+            target = (known.get(name) or {}).get("suggested_type")
+            if target not in CAST_TYPES:
+                target = (guess.get(name) or {}).get("suggested_type")
+        plan[name] = target if target in CAST_TYPES else None
+    return plan
+
+def cast_batch(batch: RecordBatch, plan: Dict[Any, Optional[str]]) -> Dict[Any, int]:
+    """
+    Cast the planned columns of a batch in place; failed originals go to ORIG_FIELD.
+    Returns {column: number of values that failed}.
+    """
+    orig: Dict[int, Dict[str, str]] = {}
+    failures: Dict[Any, int] = {}
+    for j, name in enumerate(batch.names):
+        target = plan.get(name)
+        if target is None:
+            continue
+        batch.columns[j], failed = cast_column(batch.columns[j], target)
+        if failed:
+            failures[name] = len(failed)
+            for i, v in failed.items():
+                orig.setdefault(i, {})[name] = v
+    if orig:
+        col = [MISSING] * batch.n
+        for i, d in orig.items():
+            col[i] = d
+        batch.add_column(ORIG_FIELD, col)
+    return failures
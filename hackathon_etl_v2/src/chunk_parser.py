@@ -0,0 +1,256 @@
+# src/chunk_parser.py
+import json, csv, re, time, yaml
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from bs4 import BeautifulSoup
+from src.config import config
+from src.tolerant_json import loads_tolerant, TolerantJSONError
+from src.budget import ChunkBudgetExceeded, LimitedSafeLoader, run_isolated
+from src.metrics import PARSE_FAILURES
+from src.batch import MISSING, RecordBatch
+from src.salvage import json_spans
+
+# Chunk -> records parsing. Kept free of database imports so it can run in an
+# isolated worker process (see parse_chunk_budgeted).
+
+def raw_record(content: str, ctype: str, reason: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Record preserving an unparsed chunk. Keeps only a short preview; the full text
+    stays in the blob store. reason is set when the chunk was downgraded by a limit.
+    """
+    snippet = content.strip()
+    if len(snippet) > config.RAW_PREVIEW_CHARS:
+        snippet = snippet[:config.RAW_PREVIEW_CHARS] + "..."
+    rec = {"_raw": snippet, "_chunk_type": ctype}
+    if reason:
+        rec["_reason"] = reason
+    return rec
+
+def parse_json_records(content: str) -> List[Dict[str, Any]]:
+    """
+    json.loads with the tolerant parser as fallback. Records recovered by repair
+    carry a _repairs list naming what was fixed (trailing_comma, missing_comma, ...).
+    Raises TolerantJSONError if the content can't be repaired within budget.
+    """
+    data, fixes = loads_tolerant(content)
+    records = [data] if isinstance(data, dict) else (data or [])
+    if fixes:
+        for rec in records:
+            if isinstance(rec, dict):
+                rec["_repairs"] = fixes
+    return records
+
+BLANK_LINE_RE = re.compile(r"\n[ \t\r]*\n")
+# a block (start of text or after a blank line) that opens with { or [
+JSON_BLOCK_RE = re.compile(r"(?:\A|\n[ \t\r]*\n)\s*[{\[]")
+
+def _json_block_records(block: str) -> List[Dict[str, Any]]:
+    # the whole block, or failing that each outermost balanced {...}/[...] span in it
+    try:
+        return parse_json_records(block)
+    except TolerantJSONError:
+        pass
+    records: List[Dict[str, Any]] = []
+    covered_until = -1
+    for start, end, _ in sorted(json_spans(block), key=lambda x: (x[0], -x[1])):
+        if start < covered_until:
+            continue
+        try:
+            records.extend(parse_json_records(block[start:end]))
+            covered_until = end
+        except TolerantJSONError:
+            continue
+    return records
+
+def json_like_records(content: str) -> Tuple[List[Dict[str, Any]], str]:
+    """
+    Broken JSON the json chunk pattern didn't match is detected as kv/yaml/csv, where
+    it would turn into garbage keys like '{"id"'. Blank-line separated blocks that open
+    with { or [ are read with the tolerant parser instead. Returns (records, rest):
+    rest is the text of the other blocks, for the chunk's own parser.
+    """
+    if not JSON_BLOCK_RE.search(content):
+        return [], content
+    if content.lstrip()[:1] in ("{", "["):
+        try:
+            return parse_json_records(content), ""
+        except TolerantJSONError:
+            pass
+    records: List[Dict[str, Any]] = []
+    rest: List[str] = []
+    for block in BLANK_LINE_RE.split(content):
+        found = _json_block_records(block) if block.lstrip()[:1] in ("{", "[") else []
+        if found:
+            records.extend(found)
+        else:
+            rest.append(block)
+    return records, "\n\n".join(rest) if records else content
+
+def _lines(text: str) -> Iterator[str]:
+    # lazy "\n"-terminated lines, as StringIO iterates them, without StringIO's
+    # 4-bytes-per-char copy of the whole chunk
+    start = 0
+    while start < len(text):
+        end = text.find("\n", start) + 1 or len(text)
+        yield text[start:end]
+        start = end
+
+def csv_batch(content: str) -> RecordBatch:
+    """
+    CSV straight into columns, without a dict per row. Same result as csv.DictReader:
+    blank lines skipped, short rows padded with None, surplus values of long rows
+    collected under the None key, and the last of duplicate header names wins.
+    """
+    reader = csv.reader(_lines(content))
+    header = next(reader, None)
+    if not header:
+        return RecordBatch()
+    width = len(header)
+    last = {name: i for i, name in enumerate(header)}
+    names = list(dict.fromkeys(header))
+    positions = [last[name] for name in names]
+    columns: List[List[Any]] = [[] for _ in names]
+    extra: List[Any] = []
+    n = 0
+    for row in reader:
+        if not row:
+            continue
+        if len(row) < width:
+            row += [None] * (width - len(row))
+        for col, i in zip(columns, positions):
+            col.append(row[i])
+        extra.append(row[width:] if len(row) > width else MISSING)
+        n += 1
+    batch = RecordBatch(names, columns, n)
+    if any(e is not MISSING for e in extra):
+        batch.add_column(None, extra)
+    return batch
+
+def parse_chunk(chunk: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Parse a detected chunk into a list of record dicts (see parse_chunk_batch).
+    """
+    return parse_chunk_batch(chunk).to_dicts()
+
+def parse_chunk_batch(chunk: Dict[str, Any]) -> RecordBatch:
+    """
+    Parse a detected chunk into a columnar RecordBatch.
+    Handles json, csv, kv, yaml (multiple docs), html (simple table).
+    Non-dict records become {"value": ...}. If parsing yields no structured
+    records, return a single raw-text record so the content is preserved.
+    """
+    content, ctype = chunk["content"], chunk["type"]
+    records: Any = []
+    reason = chunk.get("reason")
+
+    try:
+        if ctype == "json":
+            records = parse_json_records(content)
+        elif ctype == "csv":
+            found, rest = json_like_records(content)
+            records = RecordBatch.from_records(found)
+            if rest.strip():
+                records.extend(csv_batch(rest))
+        elif ctype == "kv":
+            records, rest = json_like_records(content)
+            rec = {}
+            for line in rest.strip().splitlines():
+                if ":" in line:
+                    k, v = line.split(":", 1)
+                    rec[k.strip()] = v.strip()
+            if rec:
+                records.append(rec)
+        elif ctype == "yaml":
+            records, rest = json_like_records(content)
+            # Support multiple YAML documents separated by '---'
+            docs = list(yaml.load_all(rest, Loader=LimitedSafeLoader)) if rest.strip() else []
+            for d in docs:
+                if d is None:
+                    continue
+                if isinstance(d, dict):
+                    records.append(d)
+                elif isinstance(d, list):
+                    for item in d:
+                        if isinstance(item, dict):
+                            records.append(item)
+                        else:
+                            records.append({"value": item})
+                else:
+                    records.append({"value": d})
+        elif ctype == "html":
+            soup = BeautifulSoup(content, "html.parser")
+            rows = soup.find_all("tr", limit=config.HTML_MAX_ROWS + 1)
+            if len(rows) > config.HTML_MAX_ROWS:
+                raise ChunkBudgetExceeded("html_rows", f"more than {config.HTML_MAX_ROWS} rows")
+            if rows:
+                # find headers if present
+                headers = []
+                first = rows[0]
+                ths = first.find_all("th")
+                if ths:
+                    headers = [th.get_text().strip() for th in ths]
+                    data_rows = rows[1:]
+                else:
+                    # no header row; infer columns
+                    first_tds = first.find_all(["td", "th"])
+                    col_count = len(first_tds)
+                    headers = [f"col_{i}" for i in range(col_count)]
+                    data_rows = rows
+                for row in data_rows:
+                    cells = [td.get_text().strip() for td in row.find_all(["td", "th"])]
+                    if len(cells) < len(headers):
+                        cells += [""] * (len(headers) - len(cells))
+                    records.append(dict(zip(headers, cells)))
+    except ChunkBudgetExceeded as e:
+        print(f"Parse budget exceeded ({ctype}): {e}")
+        PARSE_FAILURES.inc((ctype, e.reason))
+        records, reason = [], e.reason
+    except yaml.YAMLError as e:
+        # YAML parsing often fails for arbitrary text fragments; keep a concise warning
+        print(f"Parse warning (yaml): {e}")
+        PARSE_FAILURES.inc((ctype, "yaml_error"))
+    except (json.JSONDecodeError, TolerantJSONError) as e:
+        print(f"Parse warning (json): {e}")
+        PARSE_FAILURES.inc((ctype, "json_error"))
+    except Exception as e:
+        # general parse warning (keep short)
+        print(f"Parse warning ({ctype}): {e}")
+        PARSE_FAILURES.inc((ctype, type(e).__name__))
+
+    # If no structured records were found, preserve the raw chunk as a single record
+    if not records:
+        records = [raw_record(content, ctype, reason)]
+
+    if not isinstance(records, RecordBatch):
+        records = RecordBatch.from_records(records)
+    return records.compact()
+
+def parse_chunk_budgeted(chunk: Dict[str, Any]) -> RecordBatch:
+    """
+    parse_chunk_batch under the per-chunk budget:
+    - chunks over CHUNK_MAX_CHARS are not parsed (raw, reason "too_large")
+    - chunks over CHUNK_ISOLATE_CHARS are parsed in a separate process that is
+      killed after CHUNK_PARSE_TIMEOUT_S (raw, reason "timeout" / "memory" / ...)
+    - smaller chunks are parsed inline; their cost is bounded by their size and
+      the structural limits applied inside parse_chunk_batch
+    """
+    content, ctype = chunk["content"], chunk["type"]
+    if len(content) > config.CHUNK_MAX_CHARS:
+        PARSE_FAILURES.inc((ctype, "too_large"))
+        return RecordBatch.from_records([raw_record(content, ctype, "too_large")])
+    if len(content) <= config.CHUNK_ISOLATE_CHARS:
+        t0 = time.perf_counter()
+        records = parse_chunk_batch(chunk)
+        elapsed = time.perf_counter() - t0
+        if elapsed > config.CHUNK_PARSE_TIMEOUT_S:
+            print(f"Parse warning ({ctype}): inline parse took {elapsed:.1f}s for {len(content)} chars")
+            PARSE_FAILURES.inc((ctype, "slow_inline"))
+        return records
+    try:
+        # only what parse_chunk reads is sent to the worker; the columnar result
+        # also pickles much smaller than a list of dicts
+        job = {"type": ctype, "content": content, "reason": chunk.get("reason")}
+        return run_isolated(parse_chunk_batch, (job,), config.CHUNK_PARSE_TIMEOUT_S)
+    except ChunkBudgetExceeded as e:
+        print(f"Parse budget exceeded ({ctype}): {e}")
+        PARSE_FAILURES.inc((ctype, e.reason))
+        return RecordBatch.from_records([raw_record(content, ctype, e.reason)])
@@ -0,0 +1,252 @@
+# src/exporter.py
+import csv, gzip, hashlib, io, json, os, zlib
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+from bson import json_util, ObjectId
+from pymongo.errors import BulkWriteError
+from src.config import config
+from src.loader import db, get_current_schema, set_source_record_count
+
+MANIFEST_SUFFIX = ".manifest.json"
+
+def export_columns(source_id: str) -> List[str]:
+    """
+    CSV column order: _id first, then fields in the order of the latest schema.
+    """
+    schema = get_current_schema(source_id) or {}
+    return ["_id"] + [f for f in (schema.get("fields") or {}).keys() if f != "_id"]
+
+def _csv_value(v: Any) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, (dict, list)):
+        return json_util.dumps(v)
+    return str(v)
+
+def iter_export(source_id: str, fmt: str = "ndjson", compress: bool = True,
+                batch_size: int = None, stats: Optional[Dict[str, Any]] = None) -> Iterator[bytes]:
+    """
+    Stream data_<source_id> as NDJSON (MongoDB extended JSON, one doc per line) or CSV.
+    Memory stays constant: the cursor is read in batch_size batches and output is
+    flushed per batch, optionally through a streaming gzip compressor.
+    If a stats dict is passed it is filled with record count, sha256 of the
+    uncompressed payload and the CSV columns once the generator is exhausted.
+    """
+    if fmt not in ("ndjson", "csv"):
+        raise ValueError(f"Unsupported export format: {fmt}")
+    batch_size = batch_size or config.EXPORT_BATCH_SIZE
+    coll = db[f"{config.DATA_COLLECTION_PREFIX}{source_id}"]
+    digest = hashlib.sha256()
+    count = 0
+    # wbits=31 -> gzip container, so the stream can be read with gzip.open
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    columns: List[str] = []
+    buf = io.StringIO()
+    writer = None
+    if fmt == "csv":
+        columns = export_columns(source_id)
+        writer = csv.writer(buf, lineterminator="\n")
+        writer.writerow(columns)
+
+    def flush() -> bytes:
+        data = buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate(0)
+        digest.update(data)
+        return compressor.compress(data) if compressor else data
+
+    in_batch = 0
+    for doc in coll.find({}, batch_size=batch_size).sort("_id", 1):
+        if writer:
+            writer.writerow([_csv_value(doc.get(c)) for c in columns])
+        else:
+            buf.write(json_util.dumps(doc))
+            buf.write("\n")
+        count += 1
+        in_batch += 1
+        if in_batch >= batch_size:
+            in_batch = 0
+            chunk = flush()
+            if chunk:
+                yield chunk
+
+    chunk = flush()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
+
+    if stats is not None:
+        stats.update({"records": count, "sha256": digest.hexdigest(), "columns": columns})
+
+def export_to_file(source_id: str, out_path: str, fmt: str = "ndjson", compress: bool = True,
+                   batch_size: int = None) -> Dict[str, Any]:
+    """
+    Write an export to out_path plus a <out_path>.manifest.json holding record count
+    and checksum, then re-read the file to verify it. Returns the manifest.
+    """
+    stats: Dict[str, Any] = {}
+    tmp_path = out_path + ".part"
+    with open(tmp_path, "wb") as f:
+        for chunk in iter_export(source_id, fmt, compress, batch_size, stats):
+            f.write(chunk)
+    os.replace(tmp_path, out_path)
+
+    schema = get_current_schema(source_id) or {}
+    manifest = {
+        "source_id": source_id,
+        "format": fmt,
+        "compressed": compress,
+        "records": stats["records"],
+        "sha256": stats["sha256"],
+        "columns": stats["columns"],
+        "schema_version": schema.get("version"),
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "path": os.path.abspath(out_path)
+    }
+    with open(out_path + MANIFEST_SUFFIX, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    check = verify_export(out_path)
+    manifest["verified"] = check["ok"]
+    if not check["ok"]:
+        raise RuntimeError(f"Export verification failed for {out_path}: {check}")
+    return manifest
+
+def _open_text(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", errors="replace", newline="")
+
+def verify_export(path: str) -> Dict[str, Any]:
+    """
+    Recompute record count and sha256 of an export and compare with its manifest.
+    """
+    with open(path + MANIFEST_SUFFIX, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    digest = hashlib.sha256()
+
+    def hashed_lines(f):
+        for line in f:
+            digest.update(line.encode("utf-8"))
+            yield line
+
+    with _open_text(path) as f:
+        if manifest.get("format") == "csv":
+            # count CSV rows, not lines: quoted values may contain newlines
+            records = sum(1 for _ in csv.reader(hashed_lines(f))) - 1
+        else:
+            records = sum(1 for _ in hashed_lines(f))
+    ok = records == manifest.get("records") and digest.hexdigest() == manifest.get("sha256")
+    return {"ok": ok, "records": records, "sha256": digest.hexdigest(),
+            "expected_records": manifest.get("records"), "expected_sha256": manifest.get("sha256")}
+
+def _insert_batched(source_id: str, docs: Iterator[Dict[str, Any]], stats: Dict[str, Any], batch_size: int = None):
+    """
+    Batched, unordered insert_many of `docs` into data_<source_id>. Documents whose
+    _id already exists are counted as duplicates rather than aborting the restore.
+    Afterwards the source's record_count is recounted, which also bumps its data
+    version so cached responses and snapshots of the source go stale.
+    """
+    batch_size = batch_size or config.IMPORT_BATCH_SIZE
+    coll = db[f"{config.DATA_COLLECTION_PREFIX}{source_id}"]
+    stats.update({"inserted": 0, "duplicates": 0})
+    batch: List[Dict[str, Any]] = []
+
+    def flush():
+        if not batch:
+            return
+        try:
+            res = coll.insert_many(batch, ordered=False)
+            stats["inserted"] += len(res.inserted_ids)
+        except BulkWriteError as e:
+            details = e.details or {}
+            stats["inserted"] += details.get("nInserted", 0)
+            stats["duplicates"] += sum(1 for w in details.get("writeErrors", []) if w.get("code") == 11000)
+        batch.clear()
+
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    set_source_record_count(source_id, coll.count_documents({}))
+    return stats
+
+def _check_manifest(path: str):
+    if os.path.exists(path + MANIFEST_SUFFIX):
+        check = verify_export(path)
+        if not check["ok"]:
+            raise ValueError(f"Refusing to import {path}: manifest mismatch {check}")
+
+def import_jsonl(path: str, source_id: str, batch_size: int = None, keep_ids: bool = True) -> Dict[str, Any]:
+    """
+    Stream an NDJSON export (or a repaired JSONL backup, plain or .gz) into
+    data_<source_id> with batched, unordered insert_many calls.
+    If the file has a manifest it is verified first and a mismatch aborts the import.
+    Lines that fail to parse are counted and skipped.
+    """
+    _check_manifest(path)
+    stats = {"read": 0, "bad_lines": 0}
+
+    def docs():
+        with _open_text(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                stats["read"] += 1
+                try:
+                    doc = json_util.loads(line)
+                except Exception:
+                    stats["bad_lines"] += 1
+                    continue
+                if not isinstance(doc, dict):
+                    doc = {"value": doc}
+                if not keep_ids:
+                    doc.pop("_id", None)
+                yield doc
+
+    return _insert_batched(source_id, docs(), stats, batch_size)
+
+def _csv_cell(v: str) -> Any:
+    # inverse of _csv_value as far as CSV allows: nested values come back from
+    # their extended JSON, everything else stays a string
+    if v[:1] in ("{", "["):
+        try:
+            return json_util.loads(v)
+        except Exception:
+            pass
+    return v
+
+def import_csv(path: str, source_id: str, batch_size: int = None, keep_ids: bool = True) -> Dict[str, Any]:
+    """
+    Stream a CSV export (plain or .gz) into data_<source_id>, verified against its
+    manifest like import_jsonl. Empty cells are left out of the document (the export
+    writes None and missing fields the same way), scalars come back as strings.
+    """
+    _check_manifest(path)
+    stats = {"read": 0, "bad_lines": 0}
+
+    def docs():
+        with _open_text(path) as f:
+            for row in csv.DictReader(f):
+                stats["read"] += 1
+                doc = {k: _csv_cell(v) for k, v in row.items() if k and v not in ("", None)}
+                _id = doc.pop("_id", None)
+                if keep_ids and _id is not None:
+                    doc["_id"] = ObjectId(_id) if ObjectId.is_valid(_id) else _id
+                yield doc
+
+    return _insert_batched(source_id, docs(), stats, batch_size)
+
+def import_file(path: str, source_id: str, batch_size: int = None, keep_ids: bool = True) -> Dict[str, Any]:
+    """import_csv or import_jsonl, by the manifest's format or else the file name."""
+    fmt = None
+    if os.path.exists(path + MANIFEST_SUFFIX):
+        with open(path + MANIFEST_SUFFIX, "r", encoding="utf-8") as f:
+            fmt = json.load(f).get("format")
+    if fmt is None:
+        fmt = "csv" if path.endswith((".csv", ".csv.gz")) else "ndjson"
+    importer = import_csv if fmt == "csv" else import_jsonl
+    return importer(path, source_id, batch_size, keep_ids)
@@ -1,8 +1,11 @@
 # src/extractor.py
 import os
 import re
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from src.config import config
+from src.budget import ChunkBudgetExceeded, run_isolated
+from src.metrics import PARSE_FAILURES
 
 def extract_text_from_file(file_path: str) -> str:
     """
@@ -46,41 +49,220 @@ def extract_text_from_file(file_path: str) -> str:
     with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
         return f.read()
 
-def detect_and_extract_chunks(text: str) -> List[Dict[str, Any]]:
+def source_id_for_file(file_path: str) -> str:
     """
-    Detect chunks in the given text using regex patterns defined in config.CHUNK_PATTERNS.
-    Returns a sorted list of chunks: each chunk is {type, content, start, end}
+    Default source id for a file: its name stem, lowercased, non-alphanumerics as '_'
+    (used by /process-file and the bulk CLI so both name sources the same way).
     """
-    chunks: List[Dict[str, Any]] = []
-    # iterate through configured patterns
-    for name, pattern in config.CHUNK_PATTERNS.items():
-        try:
-            for match in re.finditer(pattern, text, re.MULTILINE | re.DOTALL):
-                chunk = {
-                    "type": name,
-                    "content": match.group(0).strip(),
-                    "start": match.start(),
-                    "end": match.end()
-                }
-                chunks.append(chunk)
-        except re.error:
-            # skip invalid pattern (shouldn't happen) and continue
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return "".join(c if c.isalnum() else "_" for c in stem).lower() or f"file_{int(time.time())}"
+
+WS_RE = re.compile(r"\s*")
+WORD_RE = re.compile(r"[a-zA-Z0-9_]*")
+
+def json_chunk_spans(text: str) -> Iterator[Tuple[int, int]]:
+    """
+    The (start, end) spans config.CHUNK_PATTERNS["json"], r"\{.*?\}(?=\s*\{|$|\n\n)",
+    matches, found in one linear pass. A match runs from a "{" to the first "}" after
+    it that is followed by a newline, the end of the text, or optional whitespace and
+    another "{". The regex retries each "{" against the rest of the text instead, which
+    is quadratic on input like "{}a" * n.
+    """
+    n = len(text)
+    closers: List[int] = []
+    j = text.find("}")
+    while j != -1:
+        k = j + 1
+        if k == n or text[k] == "\n":
+            closers.append(j)
+        else:
+            k = WS_RE.match(text, k).end()
+            if k < n and text[k] == "{":
+                closers.append(j)
+        j = text.find("}", j + 1)
+
+    pos, c = 0, 0
+    while c < len(closers):
+        i = text.find("{", pos)
+        if i == -1:
+            return
+        while c < len(closers) and closers[c] <= i:
+            c += 1
+        if c == len(closers):
+            return
+        yield i, closers[c] + 1
+        pos = closers[c] + 1
+
+def html_chunk_spans(text: str) -> Iterator[Tuple[int, int]]:
+    """
+    The spans of config.CHUNK_PATTERNS["html"], r"<[^>]+>.*?</[^>]+>": an opening
+    tag up to the first complete closing tag after it. The closing tag found for
+    one "<" is reused for the next while it still lies after that tag, so the scan
+    is linear where the regex re-searches the rest of the text for every "<".
+    """
+    n = len(text)
+    pos = 0
+    p = -1
+    while True:
+        i = text.find("<", pos)
+        if i == -1 or i + 1 >= n:
+            return
+        if text[i + 1] == ">":
+            pos = i + 1
             continue
+        g = text.find(">", i + 2)
+        if g == -1:
+            return
+        if p <= g:
+            p = text.find("</", g + 1)
+        # "</>" is not a closing tag
+        while p != -1 and p + 2 < n and text[p + 2] == ">":
+            p = text.find("</", p + 1)
+        if p == -1 or p + 2 >= n:
+            return
+        e = text.find(">", p + 3)
+        if e == -1:
+            return
+        yield i, e + 1
+        pos = e + 1
+
+def kv_chunk_spans(text: str) -> Iterator[Tuple[int, int]]:
+    """
+    The span of config.CHUNK_PATTERNS["kv"], r"^([^:]+):\s*(.+)$". With DOTALL the
+    value runs to the end of the text, so there is at most one match: from the first
+    line that doesn't start with ":" and has a colon (on it or a later line) with at
+    least one character after it. The regex backtracks over every line instead.
+    """
+    n = len(text)
+    i, c = 0, -1
+    while i <= n:
+        if c < i:
+            c = text.find(":", i)
+            if c == -1:
+                return
+        if c > i:
+            if c + 1 < n:
+                yield i, n
+            return
+        j = text.find("\n", i)
+        if j == -1:
+            return
+        i = j + 1
+
+def yaml_chunk_spans(text: str) -> Iterator[Tuple[int, int]]:
+    """
+    The span of config.CHUNK_PATTERNS["yaml"], r"^\s*[a-zA-Z0-9_]+:\s*.+$": like kv,
+    at most one match, from the first line whose first word (after any whitespace,
+    blank lines included) is followed by a colon and at least one more character.
+    """
+    n = len(text)
+    i = 0
+    while i <= n:
+        w = WS_RE.match(text, i).end()
+        k = WORD_RE.match(text, w).end()
+        if k > w and k + 1 < n and text[k] == ":":
+            yield i, n
+            return
+        j = text.find("\n", w)
+        if j == -1:
+            return
+        i = j + 1
+
+# chunk types found by a linear scanner equivalent to their config.CHUNK_PATTERNS regex
+CHUNK_SCANNERS = {"json": json_chunk_spans, "html": html_chunk_spans,
+                  "kv": kv_chunk_spans, "yaml": yaml_chunk_spans}
+
+def pattern_spans(name: str, text: str, deadline: Optional[float] = None) -> List[Tuple[int, int]]:
+    """
+    The (start, end) spans of one config.CHUNK_PATTERNS type in text, from its
+    scanner if it has one, else from its regex. Raises ChunkBudgetExceeded once
+    time.perf_counter() passes deadline (checked between matches).
+    """
+    scanner = CHUNK_SCANNERS.get(name)
+    spans = scanner(text) if scanner else (
+        m.span() for m in re.finditer(config.CHUNK_PATTERNS[name], text, re.MULTILINE | re.DOTALL))
+    found: List[Tuple[int, int]] = []
+    for span in spans:
+        if deadline is not None and time.perf_counter() > deadline:
+            raise ChunkBudgetExceeded("timeout", f"{name} chunk detection")
+        found.append(span)
+    return found
+
+def _build_chunks(text: str, found: Dict[str, List[Tuple[int, int]]],
+                  reason: Optional[str] = None) -> List[Dict[str, Any]]:
+    chunks: List[Dict[str, Any]] = []
+    for name, spans in found.items():
+        for start, end in spans:
+            chunk = {
+                "type": name,
+                "content": text[start:end].strip(),
+                "start": start,
+                "end": end
+            }
+            chunks.append(chunk)
 
     # If no chunks found, return one raw chunk for the whole text
     if not chunks:
-        return [{"type": "raw", "content": text.strip(), "start": 0, "end": len(text)}]
+        raw = {"type": "raw", "content": text.strip(), "start": 0, "end": len(text)}
+        if reason:
+            raw["reason"] = reason
+        return [raw]
 
     # sort chunks by start index to preserve order in text
     chunks = sorted(chunks, key=lambda x: x["start"])
 
     # merge overlapping or immediately adjacent chunks of the same type
+    # (contents are joined once per merged chunk; += on each would be quadratic)
     merged: List[Dict[str, Any]] = []
+    parts: List[List[str]] = []
     for ch in chunks:
         if merged and ch["type"] == merged[-1]["type"] and ch["start"] <= merged[-1]["end"] + 1:
             # extend previous chunk
-            merged[-1]["content"] += "\n\n" + ch["content"]
+            parts[-1].append(ch["content"])
             merged[-1]["end"] = max(merged[-1]["end"], ch["end"])
         else:
             merged.append(ch)
+            parts.append([ch["content"]])
+    for ch, contents in zip(merged, parts):
+        ch["content"] = "\n\n".join(contents)
     return merged
+
+def detect_and_extract_chunks(text: str) -> List[Dict[str, Any]]:
+    """
+    Detect chunks in the given text using regex patterns defined in config.CHUNK_PATTERNS.
+    Returns a sorted list of chunks: each chunk is {type, content, start, end}
+    """
+    found: Dict[str, List[Tuple[int, int]]] = {}
+    # iterate through configured patterns
+    for name in config.CHUNK_PATTERNS:
+        try:
+            found[name] = pattern_spans(name, text)
+        except re.error:
+            # skip invalid pattern (shouldn't happen) and continue
+            continue
+    return _build_chunks(text, found)
+
+def detect_chunks_budgeted(text: str) -> List[Dict[str, Any]]:
+    """
+    detect_and_extract_chunks with a wall-time budget per pattern. Each pattern runs
+    inline for at most DETECT_INLINE_MS (plus DETECT_INLINE_MS_PER_MB per MB of text);
+    only a pattern that runs out of time is retried alone in an isolated process
+    killed after DETECT_TIMEOUT_S. If that fails too, just that pattern's matches are
+    dropped; the text becomes one raw chunk only when nothing else matched.
+    """
+    budget = (config.DETECT_INLINE_MS + config.DETECT_INLINE_MS_PER_MB * len(text) / (1024 * 1024)) / 1000.0
+    found: Dict[str, List[Tuple[int, int]]] = {}
+    reason = None
+    for name in config.CHUNK_PATTERNS:
+        try:
+            try:
+                found[name] = pattern_spans(name, text, time.perf_counter() + budget)
+            except ChunkBudgetExceeded:
+                found[name] = run_isolated(pattern_spans, (name, text), config.DETECT_TIMEOUT_S)
+        except re.error:
+            continue
+        except ChunkBudgetExceeded as e:
+            print(f"Chunk detection budget exceeded ({name}): {e}")
+            PARSE_FAILURES.inc(("detect", e.reason))
+            reason = e.reason
+    return _build_chunks(text, found, reason)
@@ -0,0 +1,277 @@
+# src/field_stats.py
+import math, random, re
+from typing import Any, Dict, List, Optional
+from src.config import config
+from src.loader import db
+from src.tokens import SpaceSaving
+
+NUMERIC_STR_RE = re.compile(r"^\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?\s*$")
+
+class KLLSketch:
+    """
+    KLL quantile sketch (Karnin, Lang, Liberty 2016), compact and mergeable.
+    Level h holds items of weight 2**h; when the sketch exceeds its capacity the
+    lowest over-full level is sorted and every other item (random offset) is
+    promoted to the next level. Rank error is roughly O(1/k) with O(k) memory.
+    """
+
+    def __init__(self, k: int = 200, seed: int = 0):
+        self.k = k
+        self.levels: List[List[float]] = [[]]
+        self.n = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self._rng = random.Random(seed)
+
+    def _capacity(self, h: int) -> int:
+        depth = len(self.levels) - h - 1
+        return max(2, int(math.ceil(self.k * (2.0 / 3.0) ** depth)))
+
+    def _size(self) -> int:
+        return sum(len(l) for l in self.levels)
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(h) for h in range(len(self.levels)))
+
+    def _compress(self):
+        while self._size() > self._max_size():
+            for h in range(len(self.levels)):
+                if len(self.levels[h]) >= self._capacity(h):
+                    if h + 1 == len(self.levels):
+                        self.levels.append([])
+                    level = sorted(self.levels[h])
+                    offset = self._rng.randint(0, 1)
+                    self.levels[h + 1].extend(level[offset::2])
+                    self.levels[h] = []
+                    break
+
+    def add(self, x: float):
+        self.n += 1
+        self.min = x if self.min is None else min(self.min, x)
+        self.max = x if self.max is None else max(self.max, x)
+        self.levels[0].append(x)
+        if len(self.levels[0]) >= self._capacity(0):
+            self._compress()
+
+    def merge(self, other: "KLLSketch"):
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for h, items in enumerate(other.levels):
+            self.levels[h].extend(items)
+        self.n += other.n
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress()
+
+    def quantiles(self, qs: List[float]) -> List[Optional[float]]:
+        weighted = sorted((x, 1 << h) for h, l in enumerate(self.levels) for x in l)
+        total = sum(w for _, w in weighted)
+        if not total:
+            return [None for _ in qs]
+        out = []
+        for q in qs:
+            if q <= 0:
+                out.append(self.min)
+                continue
+            if q >= 1:
+                out.append(self.max)
+                continue
+            target, acc = q * total, 0
+            value = weighted[-1][0]
+            for x, w in weighted:
+                acc += w
+                if acc >= target:
+                    value = x
+                    break
+            out.append(value)
+        return out
+
+    def rank(self, x: float, inclusive: bool = True) -> float:
+        """Estimated fraction of the added values <= x (< x when not inclusive)."""
+        total = below = 0
+        for h, level in enumerate(self.levels):
+            w = 1 << h
+            total += w * len(level)
+            below += w * sum(1 for v in level if v < x or (inclusive and v == x))
+        return below / total if total else 0.0
+
+    def to_state(self) -> Dict[str, Any]:
+        return {"k": self.k, "n": self.n, "min": self.min, "max": self.max, "levels": self.levels}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "KLLSketch":
+        s = cls(state.get("k", 200))
+        s.n = state.get("n", 0)
+        s.min, s.max = state.get("min"), state.get("max")
+        s.levels = [list(l) for l in state.get("levels") or [[]]] or [[]]
+        return s
+
+def _space_saving_state(ss: SpaceSaving) -> Dict[str, Any]:
+    return {"capacity": ss.capacity, "total": ss.total,
+            "items": [[i, c, e] for i, c, e in ss.top()]}
+
+def _space_saving_from_state(state: Dict[str, Any]) -> SpaceSaving:
+    ss = SpaceSaving(state.get("capacity", config.FIELD_TOPK_CAPACITY))
+    for item, count, _err in state.get("items", []):
+        ss.add(item, count)
+    return ss
+
+def _length_bucket(n: int) -> str:
+    # log2 buckets: "0", "1", "2-3", "4-7", "8-15", ...
+    if n <= 1:
+        return str(n)
+    lo = 1 << (n.bit_length() - 1)
+    return f"{lo}-{2 * lo - 1}"
+
+class FieldProfile:
+    """Streaming distribution summary for one field."""
+
+    def __init__(self):
+        self.present = 0
+        self.nulls = 0
+        self.types: Dict[str, int] = {}
+        self.numeric = KLLSketch(config.FIELD_KLL_K)
+        self.num_sum = 0.0
+        self.top = SpaceSaving(config.FIELD_TOPK_CAPACITY)
+        self.len_hist: Dict[str, int] = {}
+
+    def add(self, v: Any):
+        self.present += 1
+        tname = type(v).__name__
+        self.types[tname] = self.types.get(tname, 0) + 1
+        if v is None:
+            self.nulls += 1
+            return
+        num = None
+        if isinstance(v, (int, float)) and not isinstance(v, bool):
+            num = float(v)
+        elif isinstance(v, str) and NUMERIC_STR_RE.match(v):
+            num = float(v)
+        if num is not None and math.isfinite(num):
+            self.numeric.add(num)
+            self.num_sum += num
+        if isinstance(v, str):
+            b = _length_bucket(len(v))
+            self.len_hist[b] = self.len_hist.get(b, 0) + 1
+            self.top.add(v[:config.FIELD_TOPK_VALUE_CHARS])
+        elif isinstance(v, (int, float, bool)):
+            self.top.add(str(v))
+
+    def merge(self, other: "FieldProfile"):
+        self.present += other.present
+        self.nulls += other.nulls
+        for t, n in other.types.items():
+            self.types[t] = self.types.get(t, 0) + n
+        self.numeric.merge(other.numeric)
+        self.num_sum += other.num_sum
+        for item, count, _err in other.top.top():
+            self.top.add(item, count)
+        for b, n in other.len_hist.items():
+            self.len_hist[b] = self.len_hist.get(b, 0) + n
+
+    def to_state(self) -> Dict[str, Any]:
+        return {"present": self.present, "nulls": self.nulls, "types": self.types,
+                "numeric": self.numeric.to_state(), "num_sum": self.num_sum,
+                "top": _space_saving_state(self.top), "len_hist": self.len_hist}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "FieldProfile":
+        p = cls()
+        p.present = state.get("present", 0)
+        p.nulls = state.get("nulls", 0)
+        p.types = dict(state.get("types") or {})
+        p.numeric = KLLSketch.from_state(state.get("numeric") or {})
+        p.num_sum = state.get("num_sum", 0.0)
+        p.top = _space_saving_from_state(state.get("top") or {})
+        p.len_hist = dict(state.get("len_hist") or {})
+        return p
+
+    def summary(self, records: int) -> Dict[str, Any]:
+        qs = [0.0, 0.05, 0.25, 0.5, 0.75, 0.95, 1.0]
+        out: Dict[str, Any] = {
+            "present": self.present,
+            "presence_ratio": round(self.present / records, 4) if records else 0.0,
+            "null_ratio": round(self.nulls / self.present, 4) if self.present else 0.0,
+            "types": self.types,
+            "top_values": [{"value": v, "count": c} for v, c, _ in self.top.top(config.FIELD_TOPK_REPORT)],
+            "length_histogram": [{"bucket": b, "count": n} for b, n in
+                                 sorted(self.len_hist.items(), key=lambda x: int(x[0].split("-")[0]))],
+        }
+        if self.numeric.n:
+            out["numeric"] = {
+                "count": self.numeric.n,
+                "mean": self.num_sum / self.numeric.n,
+                "quantiles": dict(zip(["p0", "p5", "p25", "p50", "p75", "p95", "p100"], self.numeric.quantiles(qs)))
+            }
+        return out
+
+class FieldProfiler:
+    """
+    Pipeline stage: per-field profiles over top-level record fields.
+    Mergeable, so each ingest's profile is folded into the previous version's.
+    """
+
+    def __init__(self):
+        self.records = 0
+        self.fields: Dict[str, FieldProfile] = {}
+
+    def add_record(self, record: Dict[str, Any]):
+        self.records += 1
+        for k, v in record.items():
+            p = self.fields.get(k)
+            if p is None:
+                p = self.fields[k] = FieldProfile()
+            p.add(v)
+
+    def merge(self, other: "FieldProfiler"):
+        self.records += other.records
+        for k, p in other.fields.items():
+            if k in self.fields:
+                self.fields[k].merge(p)
+            else:
+                self.fields[k] = p
+
+    def to_doc(self, source_id: str, version: int) -> Dict[str, Any]:
+        # field names go in values, not keys, so arbitrary names ('.', '$') are safe
+        return {"source_id": source_id, "version": version, "records": self.records,
+                "fields": [{"field": k, **p.to_state()} for k, p in self.fields.items()]}
+
+    @classmethod
+    def from_doc(cls, doc: Dict[str, Any]) -> "FieldProfiler":
+        fp = cls()
+        fp.records = doc.get("records", 0)
+        for f in doc.get("fields") or []:
+            fp.fields[f["field"]] = FieldProfile.from_state(f)
+        return fp
+
+    def summary(self) -> List[Dict[str, Any]]:
+        rows = [{"field": k, **p.summary(self.records)} for k, p in self.fields.items()]
+        return sorted(rows, key=lambda r: -r["present"])
+
+def _profiles():
+    return db[config.FIELD_PROFILES_COLLECTION]
+
+try:
+    _profiles().create_index([("source_id", 1), ("version", -1)], unique=True, name="source_version_unique")
+except Exception as e:
+    print("Field profile index setup warning:", e)
+
+def save_field_profile(source_id: str, version: int, profiler: FieldProfiler, merge: bool = True):
+    """
+    Fold this ingest's profile into the latest stored one for the source and
+    store the result under the new schema version. merge=False stores the
+    profile as is (a profile rebuilt from every record of the source).
+    """
+    prev = _profiles().find_one({"source_id": source_id, "version": {"$lt": version}}, sort=[("version", -1)]) if merge else None
+    merged = FieldProfiler.from_doc(prev) if prev else FieldProfiler()
+    merged.merge(profiler)
+    doc = merged.to_doc(source_id, version)
+    _profiles().replace_one({"source_id": source_id, "version": version}, doc, upsert=True)
+
+def get_field_profile(source_id: str, version: int = None) -> Optional[FieldProfiler]:
+    query: Dict[str, Any] = {"source_id": source_id}
+    if version is not None:
+        query["version"] = version
+    doc = _profiles().find_one(query, sort=[("version", -1)])
+    return FieldProfiler.from_doc(doc) if doc else None
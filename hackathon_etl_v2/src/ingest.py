@@ -0,0 +1,196 @@
+# src/ingest.py
+import contextlib, glob, io, json, os, sys, time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from src.config import config
+from src.extractor import source_id_for_file
+
+# Bulk local ingestion: many files straight into run_pipeline, no HTTP hop.
+#
+# Files are grouped by source id. At most one file per source is in flight
+# (schema versions of a source stay in file order) while different sources run
+# in parallel on a spawn-based process pool. Finished files are appended to a
+# state file (JSONL keyed by path, size and mtime) so an interrupted backfill
+# resumes with the files that are left.
+
+def _is_supported(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in config.SUPPORTED_FILE_TYPES
+
+def _read_manifest(path: str) -> List[Tuple[str, Optional[str]]]:
+    """
+    Manifest lines are either JSON ({"path": ..., "source_id": ...}) or plain
+    "path" / "path<TAB>source_id". Relative paths are relative to the manifest.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    out: List[Tuple[str, Optional[str]]] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                entry = json.loads(line)
+                p, sid = entry["path"], entry.get("source_id")
+            else:
+                p, _, sid = line.partition("\t")
+                sid = sid.strip() or None
+            out.append((os.path.join(base, p) if not os.path.isabs(p) else p, sid))
+    return out
+
+def collect_inputs(inputs: Iterable[str], manifests: Iterable[str] = (), recursive: bool = False,
+                   source_id: Optional[str] = None) -> List[Tuple[str, str]]:
+    """
+    Expand files, directories and glob patterns (plus manifest files) into
+    (absolute path, source_id) pairs, de-duplicated and in a stable order.
+    Unsupported extensions are skipped.
+    """
+    found: List[Tuple[str, Optional[str]]] = []
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, "**", "*") if recursive else os.path.join(item, "*")
+            paths = sorted(glob.glob(pattern, recursive=recursive))
+        elif any(ch in item for ch in "*?["):
+            paths = sorted(glob.glob(item, recursive=True))
+        else:
+            paths = [item]
+        found += [(p, None) for p in paths]
+    for m in manifests:
+        found += _read_manifest(m)
+
+    seen: Set[str] = set()
+    out: List[Tuple[str, str]] = []
+    for p, sid in found:
+        ap = os.path.abspath(p)
+        if ap in seen or not os.path.isfile(ap) or not _is_supported(ap):
+            continue
+        seen.add(ap)
+        out.append((ap, source_id or sid or source_id_for_file(ap)))
+    return out
+
+def _state_key(path: str) -> str:
+    st = os.stat(path)
+    return f"{path}|{st.st_size}|{int(st.st_mtime)}"
+
+def load_state(state_path: str) -> Set[str]:
+    done: Set[str] = set()
+    if state_path and os.path.exists(state_path):
+        with open(state_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    done.add(json.loads(line)["key"])
+                except (ValueError, KeyError):
+                    continue  # a torn last line from an interrupted run
+    return done
+
+def ingest_file(path: str, source_id: str, quiet: bool = True, profile: bool = False,
+                typed: bool = False) -> Dict[str, Any]:
+    """Worker entry point: run the pipeline for one file, optionally silencing its prints."""
+    from src.pipeline import run_pipeline
+    sink = io.StringIO() if quiet else None
+    with contextlib.redirect_stdout(sink) if quiet else contextlib.nullcontext():
+        summary = run_pipeline(path, source_id, profile=profile, typed=typed)
+    summary["bytes"] = os.path.getsize(path)
+    return summary
+
+class Progress:
+    """Single-line progress display on stderr."""
+
+    def __init__(self, total: int, enabled: bool = True):
+        self.total = total
+        self.enabled = enabled and total > 0
+        self.t0 = time.perf_counter()
+        self.done = self.failed = self.records = self.bytes = 0
+        self._last = 0.0
+
+    def update(self, summary: Optional[Dict[str, Any]] = None, failed: bool = False, force: bool = False):
+        if failed:
+            self.failed += 1
+        elif summary:
+            self.done += 1
+            self.records += summary.get("records", 0)
+            self.bytes += summary.get("bytes", 0)
+        now = time.perf_counter()
+        if not self.enabled or (not force and now - self._last < 0.2):
+            return
+        self._last = now
+        elapsed = max(now - self.t0, 1e-9)
+        finished = self.done + self.failed
+        eta = (self.total - finished) * elapsed / finished if finished else 0
+        sys.stderr.write(f"\r[{finished}/{self.total}] {100.0 * finished / self.total:5.1f}%  "
+                         f"{self.records} rec  {self.records / elapsed:,.0f} rec/s  "
+                         f"{self.bytes / elapsed / 1e6:.2f} MB/s  failed {self.failed}  ETA {eta:,.0f}s ")
+        sys.stderr.flush()
+
+    def close(self):
+        if self.enabled:
+            self.update(force=True)
+            sys.stderr.write("\n")
+
+def run_bulk(files: List[Tuple[str, str]], workers: int = None, state_path: Optional[str] = None,
+             quiet: bool = True, progress: bool = True, profile: bool = False, typed: bool = False) -> Dict[str, Any]:
+    """
+    Ingest (path, source_id) pairs. Returns a summary with throughput and failures.
+    """
+    workers = workers or config.INGEST_WORKERS
+    done_keys = load_state(state_path)
+    queues: Dict[str, List[str]] = {}
+    skipped = 0
+    for path, sid in files:
+        if _state_key(path) in done_keys:
+            skipped += 1
+            continue
+        queues.setdefault(sid, []).append(path)
+    total = sum(len(q) for q in queues.values())
+
+    bar = Progress(total, progress)
+    failures: List[Dict[str, str]] = []
+    state = open(state_path, "a", encoding="utf-8") if state_path else None
+    import multiprocessing
+    ctx = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            in_flight: Dict[Any, Tuple[str, str]] = {}
+            ready = list(queues)  # sources with no file in flight
+
+            def submit_ready():
+                while ready and len(in_flight) < workers:
+                    sid = ready.pop(0)
+                    path = queues[sid].pop(0)
+                    in_flight[pool.submit(ingest_file, path, sid, quiet, profile, typed)] = (path, sid)
+
+            submit_ready()
+            while in_flight:
+                finished, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    path, sid = in_flight.pop(fut)
+                    try:
+                        summary = fut.result()
+                        bar.update(summary)
+                        if state:
+                            state.write(json.dumps({"key": _state_key(path), "path": path, "source_id": sid,
+                                                    "records": summary["records"]}) + "\n")
+                            state.flush()
+                    except Exception as e:
+                        bar.update(failed=True)
+                        failures.append({"path": path, "source_id": sid, "error": str(e)})
+                    if queues[sid]:
+                        ready.append(sid)
+                submit_ready()
+    finally:
+        bar.close()
+        if state:
+            state.close()
+
+    elapsed = max(time.perf_counter() - bar.t0, 1e-9)
+    return {
+        "files": bar.done,
+        "failed": len(failures),
+        "skipped": skipped,
+        "sources": len(queues),
+        "records": bar.records,
+        "bytes": bar.bytes,
+        "seconds": round(elapsed, 2),
+        "records_per_s": round(bar.records / elapsed, 1),
+        "mb_per_s": round(bar.bytes / elapsed / 1e6, 2),
+        "failures": failures,
+    }
@@ -0,0 +1,86 @@
+# src/keyfix.py
+import json, re
+from typing import Any, Dict, Optional, Tuple
+from src.config import config
+
+# Heuristics for field names that are broken JSON fragments, e.g.
+#   {'{"id": 4, "name"': ' "Dave"}'}  ->  {"id": 4, "name": "Dave"}
+# Pure functions (no database access) shared by the MongoDB repair engine
+# (src/repair.py) and the offline JSONL salvage tool (src/salvage.py).
+
+KEY_RE = re.compile(config.REPAIR_KEY_REGEX)
+
+def looks_like_broken_json_key(k: Any) -> bool:
+    """
+    Keys that start with { or ", contain ':' or contain a quoted fragment.
+    Same rule as config.REPAIR_KEY_REGEX, which the server evaluates.
+    """
+    return isinstance(k, str) and k != "_id" and KEY_RE.search(k) is not None
+
+def _loads_dict(s: str) -> Optional[Dict[str, Any]]:
+    try:
+        d = json.loads(s)
+    except ValueError:
+        return None
+    return d if isinstance(d, dict) else None
+
+def repair_key(bad_key: str, bad_val: Any) -> Optional[Dict[str, Any]]:
+    """
+    Try to rebuild the fields a malformed key came from. First the key on its own
+    (wrapped in braces if needed), then key and value stitched together with
+    quote fixes, brace balancing and trailing-comma removal. None if nothing parses.
+    """
+    txt = bad_key.strip()
+    d = _loads_dict(("" if txt.startswith("{") else "{") + txt + ("" if txt.endswith("}") else "}"))
+    if d is not None:
+        return d
+
+    val = bad_val if isinstance(bad_val, str) else ""
+    if txt.endswith('"') or txt.endswith("'"):
+        # the value may continue the quoted key, or the split may have eaten the colon
+        # between a key ending in a quoted name and its value ({'{"id": 4, "name"': ' "Dave"}'})
+        joins = ["", ": "]
+    else:
+        joins = [" " if val else ""]
+    for join in joins:
+        d = _stitch((bad_key + join + val).strip())
+        if d is not None:
+            return d
+    return None
+
+def _stitch(s: str) -> Optional[Dict[str, Any]]:
+    if "'" in s and '"' not in s:
+        s = s.replace("'", '"')
+    start, end = s.find("{"), s.rfind("}")
+    if start != -1 and end > start:
+        s = s[start:end + 1]
+    if s.count("{") > s.count("}"):
+        s += "}" * (s.count("{") - s.count("}"))
+    d = _loads_dict(s)
+    if d is not None:
+        return d
+    s = re.sub(r",\s*}", "}", s)
+    s = re.sub(r",\s*]", "]", s)
+    return _loads_dict(s)
+
+def repair_document(doc: Dict[str, Any], drop_unparseable: bool = False) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Returns (fixed document or None if unchanged, report entry).
+    Recovered fields never overwrite existing non-empty values.
+    """
+    fixed = dict(doc)
+    entry: Dict[str, Any] = {"_id": doc.get("_id"), "set": {}, "unset": [], "unparseable": []}
+    for k in [k for k in doc if looks_like_broken_json_key(k)]:
+        parsed = repair_key(k, doc[k])
+        if parsed is None:
+            entry["unparseable"].append(k)
+            if not drop_unparseable:
+                continue
+        else:
+            for pk, pv in parsed.items():
+                if fixed.get(pk) in (None, "", []):
+                    fixed[pk] = pv
+                    entry["set"][pk] = pv
+        del fixed[k]
+        entry["unset"].append(k)
+    return (fixed if entry["unset"] else None), entry
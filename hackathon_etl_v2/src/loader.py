@@ -1,100 +1,314 @@
 # src/loader.py
 import pymongo
-from pymongo.errors import PyMongoError
-from typing import List, Dict, Any
+from pymongo.errors import PyMongoError, DuplicateKeyError
+from pymongo import UpdateOne
+from typing import List, Dict, Any, Tuple
 from src.config import config
-from datetime import datetime, date
-from decimal import Decimal
+from src.sanitize import sanitize_doc
+from src.metrics import timed_mongo
+from datetime import datetime
 
-# Create client with a short server selection timeout for faster failure detection
-try:
-    client = pymongo.MongoClient(config.MONGO_URI, serverSelectionTimeoutMS=5000)
+def _make_client():
+    if config.MONGO_URI.startswith("mongomock://"):
+        # in-memory stand-in for benchmarks and offline runs (pip install mongomock)
+        import mongomock
+        return mongomock.MongoClient()
+    # Create client with a short server selection timeout for faster failure detection
+    c = pymongo.MongoClient(config.MONGO_URI, serverSelectionTimeoutMS=5000)
     # Early ping to give a clear error if auth/connection fails
-    client.admin.command('ping')
+    c.admin.command('ping')
+    return c
+
+try:
+    client = _make_client()
 except PyMongoError as e:
     print("Mongo connection error:", e)
     raise
 
 db = client[config.DATABASE_NAME]
 
-def sanitize_value(v: Any) -> Any:
+def ensure_indexes():
     """
-    Convert non-BSON-serializable python objects to BSON/JSON-friendly types.
-    - datetime / date -> ISO string
-    - set -> list
-    - Decimal -> str
-    - bytes -> decoded str
-    - dict/list -> recursively sanitize
+    Create the indexes the pipeline relies on for correctness.
+    - schema_registry: unique (source_id, version) so concurrent ingests of one
+      source cannot both claim the same version number
+    - schema_evolution_log: unique (source_id, to_version) so each transition is logged once
+    - source_stats: unique source_id (one materialized stats doc per source)
+    - pipeline_runs: started_at for the recent-runs window behind /runs, unique run_id
+    The schema_registry index is what keeps schema versions from being claimed
+    twice, so failing to build it (legacy duplicate versions) refuses to start,
+    naming the duplicates; the other failures are reported but not fatal.
     """
-    # basic types that are already safe
-    if v is None or isinstance(v, (str, int, float, bool)):
-        return v
+    registry = db[config.SCHEMA_REGISTRY_COLLECTION]
+    try:
+        registry.create_index([("source_id", 1), ("version", 1)], unique=True, name="source_version_unique")
+    except DuplicateKeyError:
+        dupes = registry.aggregate([
+            {"$group": {"_id": {"source_id": "$source_id", "version": "$version"}, "n": {"$sum": 1}}},
+            {"$match": {"n": {"$gt": 1}}}])
+        listed = ", ".join(f"{d['_id'].get('source_id')} v{d['_id'].get('version')} (x{d['n']})" for d in dupes)
+        raise RuntimeError(f"{config.SCHEMA_REGISTRY_COLLECTION} has duplicate schema versions: {listed}; "
+                           f"remove the extra documents so the unique (source_id, version) index can be built")
+    try:
+        db[config.SCHEMA_EVOLUTION_LOG_COLLECTION].create_index(
+            [("source_id", 1), ("to_version", 1)], unique=True, name="source_to_version_unique")
+        db[config.SOURCE_STATS_COLLECTION].create_index("source_id", unique=True, name="source_id_unique")
+        db[config.PIPELINE_RUNS_COLLECTION].create_index([("started_at", -1)], name="started_at_desc")
+        db[config.PIPELINE_RUNS_COLLECTION].create_index("run_id", unique=True, name="run_id_unique")
+    except PyMongoError as e:
+        print("Index setup warning:", e)
 
-    # dates and datetimes -> ISO format strings
-    if isinstance(v, (datetime, date)):
-        # ensure datetime has timezone if needed; we keep plain isoformat
-        return v.isoformat()
+ensure_indexes()
 
-    # sets -> list
-    if isinstance(v, set):
-        return [sanitize_value(x) for x in sorted(list(v), key=lambda x: str(x))]
+def ensure_run_indexes(source_id: str, collection: str = None):
+    """
+    (_run_id, _batch) on chunks and the source's data collection, for run resume/rollback.
+    collection overrides the data collection (reprocessing indexes its staging copy).
+    """
+    try:
+        db[config.CHUNKS_COLLECTION].create_index([("_run_id", 1), ("_batch", 1)], sparse=True, name="run_batch")
+        db[collection or f"{config.DATA_COLLECTION_PREFIX}{source_id}"].create_index(
+            [("_run_id", 1), ("_batch", 1)], sparse=True, name="run_batch")
+    except PyMongoError as e:
+        print("Index setup warning:", e)
 
-    # Decimal -> string (preserve precision)
-    if isinstance(v, Decimal):
-        return str(v)
+def typed_index_fields(source_id: str) -> List[str]:
+    """Fields of the source's data collection that carry a typed_<field> index."""
+    info = db[f"{config.DATA_COLLECTION_PREFIX}{source_id}"].index_information()
+    return [spec["key"][0][0] for name, spec in info.items() if name.startswith("typed_")]
 
-    # bytes -> decode best-effort
-    if isinstance(v, (bytes, bytearray)):
+def ensure_typed_indexes(source_id: str, fields: List[str], collection: str = None) -> List[str]:
+    """
+    Ascending indexes on the fields a typed ingest cast to numbers/dates, so range
+    filters and sorts on them can use an index. At most TYPED_INDEX_MAX fields.
+    collection overrides the data collection, as for ensure_run_indexes.
+    """
+    created = []
+    coll = db[collection or f"{config.DATA_COLLECTION_PREFIX}{source_id}"]
+    for field in fields[:config.TYPED_INDEX_MAX]:
         try:
-            return v.decode("utf-8")
-        except Exception:
-            return v.decode("utf-8", errors="replace")
-
-    # dict -> sanitize recursively
-    if isinstance(v, dict):
-        return {str(k): sanitize_value(val) for k, val in v.items()}
-
-    # list/tuple -> sanitize elements
-    if isinstance(v, (list, tuple)):
-        return [sanitize_value(x) for x in v]
+            coll.create_index([(field, 1)], name=f"typed_{field}")
+            created.append(field)
+        except PyMongoError as e:
+            print(f"Index setup warning ({field}):", e)
+    return created
 
-    # fallback: try str()
-    try:
-        return str(v)
-    except Exception:
-        return repr(v)
-
-def sanitize_doc(doc: Any) -> Any:
+@timed_mongo("save_chunks")
+def save_chunks(source_id: str, chunks: List[Dict[str, Any]], blob_id: str = None) -> List[Any]:
     """
-    Recursively sanitize a document/document-like object (dict/list/scalar).
+    Store detected chunks; returns their inserted _ids in chunk order.
+    With a blob_id the chunk text is not copied: chunks store (blob_id, start, end, type)
+    and the text is loaded lazily from the blob store.
     """
-    return sanitize_value(doc)
-
-def save_chunks(source_id: str, chunks: List[Dict[str, Any]]):
     coll = db[config.CHUNKS_COLLECTION]
-    docs = [{"source_id": source_id, **c} for c in chunks]
+    if blob_id:
+        docs = [{"source_id": source_id, "blob_id": blob_id,
+                 **{k: v for k, v in c.items() if k != "content"}} for c in chunks]
+    else:
+        docs = [{"source_id": source_id, **c} for c in chunks]
     docs = [sanitize_doc(d) for d in docs]
     if docs:
-        coll.insert_many(docs)
+        return coll.insert_many(docs).inserted_ids
+    return []
 
-def save_data(source_id: str, records: List[Dict[str, Any]]):
+@timed_mongo("save_data")
+def save_data(source_id: str, records: List[Dict[str, Any]], sanitized: bool = False):
     coll_name = f"{config.DATA_COLLECTION_PREFIX}{source_id}"
     coll = db[coll_name]
-    # sanitize each record before insert
-    docs = [sanitize_doc(r) for r in records] if records else []
+    # sanitize each record before insert (unless the caller already did)
+    docs = list(records) if sanitized else [sanitize_doc(r) for r in records]
     if docs:
         coll.insert_many(docs)
 
+@timed_mongo("get_current_schema")
 def get_current_schema(source_id: str) -> Dict[str, Any]:
     coll = db[config.SCHEMA_REGISTRY_COLLECTION]
     return coll.find_one({"source_id": source_id}, sort=[("version", -1)])
 
+@timed_mongo("save_schema")
 def save_schema(schema: Dict[str, Any]):
     coll = db[config.SCHEMA_REGISTRY_COLLECTION]
     doc = sanitize_doc(schema)
     coll.insert_one(doc)
 
+def try_save_schema(schema: Dict[str, Any]) -> bool:
+    """
+    Insert a schema version unless another writer already claimed (source_id, version).
+    Returns True if this call won the version, False on a version conflict.
+    """
+    try:
+        save_schema(schema)
+        return True
+    except DuplicateKeyError:
+        return False
+
+@timed_mongo("save_evolution_log")
 def save_evolution_log(log: Dict[str, Any]):
     coll = db[config.SCHEMA_EVOLUTION_LOG_COLLECTION]
     doc = sanitize_doc(log)
-    coll.insert_one(doc)
+    # upsert keyed on the transition so a retried writer cannot log it twice
+    coll.update_one(
+        {"source_id": doc.get("source_id"), "to_version": doc.get("to_version")},
+        {"$setOnInsert": doc},
+        upsert=True
+    )
+
+
+@timed_mongo("update_source_stats")
+def update_source_stats(source_id: str, chunks: List[Dict[str, Any]], record_count: int, schema_version: int):
+    """
+    Atomically fold one ingest into the materialized per-source stats document.
+    Counters use $inc so concurrent ingests of the same source never lose updates;
+    latest_version uses $max so an older writer finishing late cannot roll it back.
+    Also bumps the source's data_version (and the global one) used to key response caches.
+    """
+    inc: Dict[str, int] = {"record_count": record_count, "chunk_count": len(chunks), "data_version": 1}
+    for c in chunks:
+        key = f"chunk_types.{c.get('type', 'raw')}"
+        inc[key] = inc.get(key, 0) + 1
+    db[config.SOURCE_STATS_COLLECTION].update_one(
+        {"source_id": source_id},
+        {
+            "$inc": inc,
+            "$max": {"latest_version": schema_version},
+            "$set": {"last_ingest": datetime.utcnow().isoformat() + "Z"}
+        },
+        upsert=True
+    )
+    bump_global_data_version()
+
+@timed_mongo("bump_global_data_version")
+def bump_global_data_version():
+    db[config.META_COLLECTION].update_one({"_id": "data_version"}, {"$inc": {"value": 1}}, upsert=True)
+
+@timed_mongo("get_data_version")
+def get_data_version(source_id: str = None) -> int:
+    """
+    Current data version of a source (or of the whole database when source_id is None).
+    Changes whenever an ingest or delete touches that data; 0 if never ingested.
+    """
+    if source_id is None:
+        doc = db[config.META_COLLECTION].find_one({"_id": "data_version"})
+        return int(doc.get("value", 0)) if doc else 0
+    doc = db[config.SOURCE_STATS_COLLECTION].find_one({"source_id": source_id}, {"data_version": 1})
+    return int(doc.get("data_version", 0)) if doc else 0
+
+@timed_mongo("get_source_stats")
+def get_source_stats(source_id: str = None) -> List[Dict[str, Any]]:
+    """
+    Return materialized stats for one source (or all sources), sorted by source_id.
+    """
+    query = {"source_id": source_id} if source_id else {}
+    return list(db[config.SOURCE_STATS_COLLECTION].find(query, {"_id": 0}).sort("source_id", 1))
+
+@timed_mongo("rebuild_source_stats")
+def rebuild_source_stats(source_ids: List[str] = None) -> int:
+    """
+    Backfill source_stats from existing chunks, data_* collections and schema_registry.
+    Rebuilds every known source when source_ids is None. Returns number of sources written.
+    """
+    schema_coll = db[config.SCHEMA_REGISTRY_COLLECTION]
+    if source_ids is None:
+        source_ids = sorted(set(schema_coll.distinct("source_id")) | set(db[config.CHUNKS_COLLECTION].distinct("source_id")))
+    if not source_ids:
+        return 0
+
+    # one grouped pass over chunks for all requested sources
+    chunk_types: Dict[str, Dict[str, int]] = {sid: {} for sid in source_ids}
+    for row in db[config.CHUNKS_COLLECTION].aggregate([
+        {"$match": {"source_id": {"$in": source_ids}}},
+        {"$group": {"_id": {"source_id": "$source_id", "type": "$type"}, "count": {"$sum": 1}}}
+    ]):
+        chunk_types[row["_id"]["source_id"]][str(row["_id"].get("type") or "raw")] = row["count"]
+
+    latest: Dict[str, Dict[str, Any]] = {}
+    for row in schema_coll.aggregate([
+        {"$match": {"source_id": {"$in": source_ids}}},
+        {"$group": {"_id": "$source_id", "version": {"$max": "$version"}, "generated_at": {"$max": "$generated_at"}}}
+    ]):
+        latest[row["_id"]] = row
+
+    existing = set(db.list_collection_names())
+    stats_coll = db[config.SOURCE_STATS_COLLECTION]
+    for sid in source_ids:
+        data_coll = f"{config.DATA_COLLECTION_PREFIX}{sid}"
+        types = chunk_types.get(sid, {})
+        prev = stats_coll.find_one({"source_id": sid}, {"data_version": 1}) or {}
+        stats_coll.replace_one({"source_id": sid}, {
+            "source_id": sid,
+            "data_version": int(prev.get("data_version", 0)) + 1,
+            "record_count": int(db[data_coll].estimated_document_count()) if data_coll in existing else 0,
+            "chunk_count": sum(types.values()),
+            "chunk_types": types,
+            "latest_version": latest.get(sid, {}).get("version"),
+            "last_ingest": latest.get(sid, {}).get("generated_at")
+        }, upsert=True)
+    bump_global_data_version()
+    return len(source_ids)
+
+_stats_backfilled = False
+
+def ensure_source_stats() -> int:
+    """
+    Backfill source_stats, once per process, for sources stored before stats were
+    materialized (a data_<source_id> collection or schema without a stats document),
+    so /sources doesn't silently leave them out. Returns number of sources rebuilt.
+    """
+    global _stats_backfilled
+    if _stats_backfilled:
+        return 0
+    prefix = config.DATA_COLLECTION_PREFIX
+    # staging/rebuild copies (data_<source_id>__reprocess) are not sources
+    stored = {name[len(prefix):] for name in db.list_collection_names()
+              if name.startswith(prefix) and "__" not in name}
+    stored |= set(db[config.SCHEMA_REGISTRY_COLLECTION].distinct("source_id"))
+    missing = sorted(stored - set(db[config.SOURCE_STATS_COLLECTION].distinct("source_id")))
+    rebuilt = rebuild_source_stats(missing) if missing else 0
+    _stats_backfilled = True
+    return rebuilt
+
+@timed_mongo("set_source_record_count")
+def set_source_record_count(source_id: str, record_count: int, chunk_types: Dict[str, int] = None):
+    """Overwrite counters after a bulk rewrite of a source (e.g. reprocessing) and bump its data version."""
+    fields: Dict[str, Any] = {"record_count": record_count}
+    if chunk_types is not None:
+        fields["chunk_types"] = chunk_types
+        fields["chunk_count"] = sum(chunk_types.values())
+    db[config.SOURCE_STATS_COLLECTION].update_one(
+        {"source_id": source_id}, {"$set": fields, "$inc": {"data_version": 1}}, upsert=True)
+    bump_global_data_version()
+
+@timed_mongo("reset_source_record_count")
+def reset_source_record_count(source_id: str):
+    db[config.SOURCE_STATS_COLLECTION].update_one(
+        {"source_id": source_id}, {"$set": {"record_count": 0}, "$inc": {"data_version": 1}})
+    bump_global_data_version()
+
+@timed_mongo("bump_source_data_version")
+def bump_source_data_version(source_id: str):
+    """Invalidate cached responses and snapshots of a source whose records were rewritten in place."""
+    db[config.SOURCE_STATS_COLLECTION].update_one({"source_id": source_id}, {"$inc": {"data_version": 1}})
+    bump_global_data_version()
+
+@timed_mongo("save_token_counts")
+def save_token_counts(source_id: str, counts: List[Tuple[str, int]], replace: bool = False):
+    """
+    Merge per-ingest token counts into visual_tokens_<source_id> with one
+    unordered bulk of $inc upserts (token is the _id, so no rescan is needed).
+    replace=True swaps in exactly these counts instead (a recount over every
+    record of the source), built aside and renamed over the old collection.
+    """
+    name = f"{config.TOKEN_COLLECTION_PREFIX}{source_id}"
+    if replace:
+        db[name + "__rebuild"].drop()
+        if not counts:
+            db[name].drop()
+            return
+    elif not counts:
+        return
+    coll = db[name + "__rebuild" if replace else name]
+    ops = [UpdateOne({"_id": tok}, {"$inc": {"count": n}, "$set": {"token": tok}}, upsert=True) for tok, n in counts]
+    coll.bulk_write(ops, ordered=False)
+    coll.create_index([("count", -1)], name="count_desc")
+    if replace:
+        coll.rename(name, dropTarget=True)
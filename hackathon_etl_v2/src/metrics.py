@@ -0,0 +1,186 @@
+# src/metrics.py
+import bisect, threading, time
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+from src.config import config
+
+# In-process metrics rendered in the Prometheus text format (GET /metrics).
+#
+# Hot paths stay lock-free: every thread writes to its own shard (a dict kept in
+# a threading.local), and the lock is only taken when a thread creates its shard
+# and when /metrics sums the shards. Shard values are never mutated in place: a
+# histogram observation stores a new cell (buckets + sum), so a scrape copying a
+# shard sees each cell either before or after an observation, never half-way. Gauges are callbacks evaluated at scrape
+# time, so cache sizes and queue depths cost nothing between scrapes.
+# Values are per process: work done in isolated parse workers or in ingest
+# worker processes (main.py) is not visible here.
+
+_enabled = config.METRICS_ENABLED
+_registry: List["_Metric"] = []
+_gauges: List[Tuple[str, str, Callable[[], Dict[Tuple[str, ...], float]], Tuple[str, ...]]] = []
+
+def set_enabled(flag: bool):
+    """Turn recording on/off (the overhead benchmark compares both)."""
+    global _enabled
+    _enabled = flag
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.d
+        except AttributeError:
+            d = self._local.d = {}
+            with self._lock:
+                self._shards.append(d)
+            return d
+
+    def _snapshot(self) -> List[dict]:
+        with self._lock:
+            # copy each shard: the owning thread may add keys while we iterate
+            return [dict(d) for d in self._shards]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1):
+        if not _enabled:
+            return
+        d = self._shard()
+        d[labels] = d.get(labels, 0) + amount
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        out: Dict[Tuple[str, ...], float] = {}
+        for d in self._snapshot():
+            for k, v in d.items():
+                out[k] = out.get(k, 0) + v
+        return out
+
+    def render(self) -> Iterable[str]:
+        for k, v in sorted(self.values().items()):
+            yield f"{self.name}{_labels(self.labelnames, k)} {v}"
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = None):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets or config.METRICS_LATENCY_BUCKETS)
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        if not _enabled:
+            return
+        d = self._shard()
+        # per-bucket counts (last slot is +Inf), then sum; copied, then swapped in
+        # with one dict store, so render() never sees the buckets and sum disagree
+        cell = d.get(labels)
+        cell = cell.copy() if cell is not None else [0] * (len(self.buckets) + 1) + [0.0]
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+        d[labels] = cell
+
+    def render(self) -> Iterable[str]:
+        merged: Dict[Tuple[str, ...], List[float]] = {}
+        for d in self._snapshot():
+            for k, cell in d.items():
+                acc = merged.setdefault(k, [0] * len(cell))
+                for i, v in enumerate(cell):
+                    acc[i] += v
+        for k, cell in sorted(merged.items()):
+            running = 0
+            for bound, n in zip(self.buckets + (float("inf"),), cell[:-1]):
+                running += n
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, k, le)} {running}"
+            yield f"{self.name}_sum{_labels(self.labelnames, k)} {cell[-1]}"
+            yield f"{self.name}_count{_labels(self.labelnames, k)} {running}"
+
+def gauge(name: str, help: str, fn: Callable[[], Dict[Tuple[str, ...], float]], labelnames: Sequence[str] = ()):
+    """Register a gauge computed at scrape time; fn returns {label values: value}."""
+    _gauges.append((name, help, fn, tuple(labelnames)))
+
+def render() -> str:
+    lines: List[str] = []
+    for m in _registry:
+        lines.append(f"# HELP {m.name} {m.help}")
+        lines.append(f"# TYPE {m.name} {m.kind}")
+        lines.extend(m.render())
+    for name, help, fn, labelnames in _gauges:
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} gauge")
+        try:
+            values = fn()
+        except Exception as e:
+            lines.append(f"# {name} unavailable: {_escape(e)}")
+            continue
+        for k, v in sorted(values.items()):
+            lines.append(f"{name}{_labels(labelnames, k)} {v}")
+    return "\n".join(lines) + "\n"
+
+# --- metrics recorded by the pipeline, loader and API ---
+
+HTTP_LATENCY = Histogram("etl_http_request_duration_seconds", "HTTP request latency by route", ("method", "route"))
+HTTP_REQUESTS = Counter("etl_http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+INGEST_STARTED = Counter("etl_ingest_started_total", "Pipeline runs started")
+INGEST_FILES = Counter("etl_ingest_files_total", "Pipeline runs by outcome", ("status",))
+INGEST_BYTES = Counter("etl_ingest_bytes_total", "Bytes of input files ingested")
+INGEST_CHUNKS = Counter("etl_ingest_chunks_total", "Chunks ingested by type", ("type",))
+INGEST_RECORDS = Counter("etl_ingest_records_total", "Records ingested by chunk type", ("type",))
+INGEST_SECONDS = Histogram("etl_ingest_duration_seconds", "Pipeline run duration", (),
+                           (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120))
+PARSE_FAILURES = Counter("etl_parse_failures_total", "Chunks whose parse failed, by chunk type and reason",
+                         ("type", "reason"))
+MONGO_LATENCY = Histogram("etl_mongo_operation_duration_seconds", "Loader Mongo operation latency", ("op",))
+MONGO_ERRORS = Counter("etl_mongo_operation_errors_total", "Loader Mongo operations that raised", ("op",))
+
+# queue depth: runs started but not finished (uploads and /process-file background runs)
+gauge("etl_ingest_in_progress", "Pipeline runs started and not yet finished",
+      lambda: {(): sum(INGEST_STARTED.values().values()) - sum(INGEST_FILES.values().values())})
+
+def record_run(doc: Dict) -> None:
+    """Fold a finished pipeline_runs document (src/tracing.py) into the ingest counters."""
+    if not _enabled:
+        return
+    INGEST_FILES.inc((doc["status"],))
+    INGEST_SECONDS.observe((), doc["seconds"])
+    if doc["status"] != "ok":
+        return
+    INGEST_BYTES.inc((), doc.get("bytes_in", 0))
+    for ctype, ct in doc.get("chunk_types", {}).items():
+        INGEST_CHUNKS.inc((ctype,), ct["count"])
+        INGEST_RECORDS.inc((ctype,), ct["records"])
+
+def timed_mongo(op: str):
+    """Decorator for loader functions: latency histogram and error count per operation."""
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                MONGO_ERRORS.inc((op,))
+                raise
+            finally:
+                MONGO_LATENCY.observe((op,), time.perf_counter() - t0)
+        return wrapper
+    return deco
@@ -1,138 +1,356 @@
 # src/pipeline.py
-from src.extractor import extract_text_from_file, detect_and_extract_chunks
-from src.loader import save_chunks, get_current_schema, save_schema, save_evolution_log, save_data
+from src.extractor import extract_text_from_file, detect_chunks_budgeted
+from src.loader import save_chunks, get_current_schema, try_save_schema, save_evolution_log, save_data, update_source_stats, save_token_counts, ensure_run_indexes, ensure_typed_indexes, db
+from src.config import config
 from src.schema import SchemaInferer, SchemaEvolver
-import json, csv, io, yaml
-from typing import List, Dict, Any
+from src.tokens import TokenIndexer
+from src.search import index_chunks
+from src.field_stats import FieldProfiler, save_field_profile
+from src.blobstore import put_text
+from src.chunk_parser import parse_chunk_budgeted
+from src.batch import RecordBatch
+from src.casting import NATIVE_TYPES, cast_batch, plan_casts
+from src.tracing import RunTrace, get_run
+from src.runs import RunStateError, claim_run, discard_batches
+from src.metrics import INGEST_STARTED, record_run
+from src.snapshot import SnapshotError, build_snapshot
+from typing import List, Dict, Any, Mapping, Optional, Tuple
 from datetime import datetime
-from bs4 import BeautifulSoup
+import os, random, time
 
-def parse_chunk(chunk: Dict[str, Any]) -> List[Dict[str, Any]]:
+def records_for_chunk(chunk: Dict[str, Any]) -> RecordBatch:
     """
-    Parse a detected chunk into a list of record dicts.
-    Handles json, csv, kv, yaml (multiple docs), html (simple table).
-    If parsing yields no structured records, return a single raw-text record
-    so the content is preserved.
+    Budgeted parse of a chunk into a columnar RecordBatch (simple non-dict records
+    are normalized to {"value": ...}).
     """
-    content, ctype = chunk["content"], chunk["type"]
-    records: List[Dict[str, Any]] = []
+    return parse_chunk_budgeted(chunk)
 
-    try:
-        if ctype == "json":
-            data = json.loads(content)
-            records = [data] if isinstance(data, dict) else (data or [])
-        elif ctype == "csv":
-            reader = csv.DictReader(io.StringIO(content))
-            records = list(reader)
-        elif ctype == "kv":
-            rec = {}
-            for line in content.strip().splitlines():
-                if ":" in line:
-                    k, v = line.split(":", 1)
-                    rec[k.strip()] = v.strip()
-            records = [rec] if rec else []
-        elif ctype == "yaml":
-            # Support multiple YAML documents separated by '---'
-            docs = list(yaml.safe_load_all(content))
-            for d in docs:
-                if d is None:
-                    continue
-                if isinstance(d, dict):
-                    records.append(d)
-                elif isinstance(d, list):
-                    for item in d:
-                        if isinstance(item, dict):
-                            records.append(item)
-                        else:
-                            records.append({"value": item})
-                else:
-                    records.append({"value": d})
-        elif ctype == "html":
-            soup = BeautifulSoup(content, "html.parser")
-            rows = soup.find_all("tr")
-            if rows:
-                # find headers if present
-                headers = []
-                first = rows[0]
-                ths = first.find_all("th")
-                if ths:
-                    headers = [th.get_text().strip() for th in ths]
-                    data_rows = rows[1:]
-                else:
-                    # no header row; infer columns
-                    first_tds = first.find_all(["td", "th"])
-                    col_count = len(first_tds)
-                    headers = [f"col_{i}" for i in range(col_count)]
-                    data_rows = rows
-                for row in data_rows:
-                    cells = [td.get_text().strip() for td in row.find_all(["td", "th"])]
-                    if len(cells) < len(headers):
-                        cells += [""] * (len(headers) - len(cells))
-                    records.append(dict(zip(headers, cells)))
-    except yaml.YAMLError as e:
-        # YAML parsing often fails for arbitrary text fragments; keep a concise warning
-        print(f"Parse warning (yaml): {e}")
-    except json.JSONDecodeError as e:
-        print(f"Parse warning (json): {e}")
-    except Exception as e:
-        # general parse warning (keep short)
-        print(f"Parse warning ({ctype}): {e}")
+def is_raw_result(records: RecordBatch) -> bool:
+    return records.is_raw()
 
-    # If no structured records were found, preserve the raw chunk as a single record
-    if not records:
-        snippet = content.strip()
-        # Keep snippet reasonably sized
-        if len(snippet) > 1000:
-            snippet = snippet[:1000] + "..."
-        records = [{"_raw": snippet, "_chunk_type": ctype}]
+def initial_schema(source_id: str, schema_guess: Dict[str, Any]) -> Dict[str, Any]:
+    schema = {
+        "schema_id": "schema_v1",
+        "source_id": source_id,
+        "version": 1,
+        "generated_at": datetime.utcnow().isoformat() + "Z",
+        "compatible_dbs": ["mongodb", "postgresql"],
+        "fields": schema_guess["fields"],
+        "primary_key_candidates": schema_guess.get("primary_key_candidates", []),
+        "migration_notes": None
+    }
+    if schema_guess.get("typed"):
+        schema["typed"] = True
+    return schema
 
-    return records
+def merge_schema_fields(current: Optional[Dict[str, Any]], guess: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The guess with the fields of `current` it doesn't have added. Fields both have
+    keep the guess's info, nullable if either side is.
+    """
+    if not current:
+        return guess
+    fields = dict(current.get("fields") or {})
+    for name, info in (guess.get("fields") or {}).items():
+        old = fields.get(name)
+        if old is not None and old.get("nullable") and not info.get("nullable"):
+            info = dict(info, nullable=True)
+        fields[name] = info
+    return dict(guess, fields=fields)
 
-def run_pipeline(file_path: str, source_id: str):
+def commit_schema(source_id: str, schema_guess: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Register the next schema version for a source using optimistic concurrency.
+    Reads the current version, evolves against it and inserts; the unique
+    (source_id, version) index rejects the insert if another worker got there
+    first, in which case we re-read the winner's schema and evolve again.
+    On a retry the winner's fields are merged into ours, so a lost race never
+    publishes a version that drops fields the concurrent writer just added.
+    The evolution log entry is only written by the writer that won the version.
+    """
+    guess = schema_guess
+    for attempt in range(config.SCHEMA_COMMIT_MAX_RETRIES):
+        current = get_current_schema(source_id)
+        if attempt:
+            guess = merge_schema_fields(current, guess)
+        if current:
+            new_schema, diff = SchemaEvolver.evolve(current, guess, source_id)
+        else:
+            new_schema, diff = initial_schema(source_id, guess), None
+
+        if not try_save_schema(new_schema):
+            # lost the race for this version; back off (jittered, so racing writers
+            # spread out) and retry against the winner
+            time.sleep(random.uniform(0, min(config.SCHEMA_COMMIT_BACKOFF_MAX,
+                                             config.SCHEMA_COMMIT_BACKOFF * 2 ** attempt)))
+            continue
+
+        if current:
+            save_evolution_log({
+                "source_id": source_id,
+                "from_version": current.get("version"),
+                "to_version": new_schema["version"],
+                "diff": diff,
+                "timestamp": new_schema["generated_at"]
+            })
+        return new_schema
+
+    raise RuntimeError(f"Could not commit schema for {source_id} after {config.SCHEMA_COMMIT_MAX_RETRIES} attempts")
+
+def run_pipeline(file_path: str, source_id: str, profile: bool = False, typed: bool = False) -> Dict[str, Any]:
     """
     Full pipeline run: extract text, detect chunks, parse chunks, infer schema,
-    save chunks/records and schema/evolution logs.
+    save chunks/records and schema/evolution logs. Returns a small run summary.
+    Chunks are committed in batches of config.RUN_BATCH_CHUNKS with a checkpoint
+    in pipeline_runs after each batch, so a failed run can be continued with
+    resume_pipeline (or rolled back with src.runs.rollback_run). Stage timings
+    are stored on the same run document; profile=True also captures a cProfile
+    dump of the run. typed=True stores numbers and dates as native BSON values
+    (see cast_records).
     """
     print(f"Pipeline: {file_path} to {source_id}")
-    text = extract_text_from_file(file_path)
-    chunks = detect_and_extract_chunks(text)
-    save_chunks(source_id, chunks)
-
-    all_records: List[Dict[str, Any]] = []
-    for chunk in chunks:
-        parsed = parse_chunk(chunk)
-        # normalize simple non-dict records and ensure dict shape
-        for rec in parsed:
-            if isinstance(rec, dict):
-                all_records.append(rec)
-            else:
-                all_records.append({"value": rec})
-
-    schema_guess = SchemaInferer.infer(all_records)
-    current = get_current_schema(source_id)
-
-    if current:
-        new_schema, diff = SchemaEvolver.evolve(current, schema_guess, source_id)
-        log = {
-            "source_id": source_id,
-            "from_version": current.get("version"),
-            "to_version": new_schema["version"],
-            "diff": diff,
-            "timestamp": new_schema["generated_at"]
-        }
-        save_evolution_log(log)
+    return _run(RunTrace(source_id, file_path, profile), None, typed)
+
+def resume_pipeline(run_id: str, profile: bool = False) -> Dict[str, Any]:
+    """
+    Continue a failed or interrupted run from its last committed batch. Writes of
+    the batch that was in flight are discarded first. The input file must still
+    be at the recorded path with the same size and mtime. A run still marked
+    running is only resumed once its owner is provably gone (src/runs.py claim_run).
+    """
+    run = get_run(run_id, with_state=True)
+    if run is None:
+        raise RunStateError(f"No such run: {run_id}")
+    if run["status"] not in ("running", "error"):
+        raise RunStateError(f"Run {run_id} is {run['status']}; only running/error runs can be resumed")
+    path = run["file_path"]
+    if not os.path.exists(path):
+        raise RunStateError(f"Input file of run {run_id} is gone: {path}")
+    st = os.stat(path)
+    if (st.st_size, int(st.st_mtime)) != (run.get("file_size"), run.get("file_mtime")):
+        raise RunStateError(f"Input file of run {run_id} changed since the run started: {path}")
+    claim_run(run)
+    # no checkpoint yet: the run died before its first batch committed and restarts from chunk 0
+    ckpt = run.get("checkpoint")
+    after = ckpt["batch"] if ckpt else 0
+    discarded = discard_batches(run["source_id"], run_id, after)
+    print(f"Resuming {run_id} ({path} to {run['source_id']}) after batch {after}; "
+          f"discarded {discarded['chunks']} chunks / {discarded['records']} records of the unfinished batch")
+    return _run(RunTrace(run["source_id"], path, profile, run_id=run_id), ckpt, run.get("typed", False))
+
+def _run(trace: RunTrace, ckpt: Optional[Dict[str, Any]], typed: bool = False) -> Dict[str, Any]:
+    INGEST_STARTED.inc()
+    try:
+        summary = _run_stages(trace.file_path, trace.source_id, trace, ckpt, typed)
+    except Exception as e:
+        record_run(trace.finish("error", f"{type(e).__name__}: {e}"))
+        raise
+    doc = trace.finish(schema_version=summary["schema_version"])
+    record_run(doc)
+    summary["run_id"] = trace.run_id
+    summary["seconds"] = doc["seconds"]
+    if trace.resumed:
+        summary["resumed_from_batch"] = ckpt["batch"] if ckpt else 0
+    if doc.get("profile_path"):
+        summary["profile_path"] = doc["profile_path"]
+    return summary
+
+def _sample_add(sample: RecordBatch, seen: int, rec: Mapping, rng: random.Random):
+    # reservoir sample (Algorithm R) of the records schema inference sees
+    if len(sample) < config.RUN_SCHEMA_SAMPLE:
+        sample.append(rec)
+    else:
+        j = rng.randrange(seen)
+        if j < config.RUN_SCHEMA_SAMPLE:
+            sample.set_row(j, rec)
+
+def _resume_sample(source_id: str, run_id: str) -> RecordBatch:
+    """Refill the schema sample from the records a resumed run already committed."""
+    coll = db[f"{config.DATA_COLLECTION_PREFIX}{source_id}"]
+    docs = coll.aggregate([{"$match": {"_run_id": run_id}}, {"$sample": {"size": config.RUN_SCHEMA_SAMPLE}}])
+    return RecordBatch.from_records([{k: v for k, v in d.items() if k not in RUN_TAGS} for d in docs])
+
+def cast_records(records: RecordBatch, casts: Dict[Any, Optional[str]], known: Dict[str, Any]) -> Dict[Any, int]:
+    """
+    Typed ingest: cast a chunk's columns in place (src/casting.py). A column's target
+    is decided the first time the run sees it, from the stored schema or from
+    inference over that chunk, and then kept for the rest of the run, so one field
+    isn't stored as numbers in one chunk and strings in the next. Returns the
+    per-column cast failures.
+    """
+    new = [name for name in records.names if name not in casts]
+    if new:
+        guess = SchemaInferer.infer(records, detect_strings=True)["fields"]
+        casts.update(plan_casts(new, guess, known))
+    return cast_batch(records, casts)
+
+def _write_batches(source_id: str, parsed: List[Tuple[RecordBatch, Dict[str, Any]]], trace: RunTrace,
+                   native: Tuple[type, ...] = ()):
+    """
+    Storage boundary: sanitize column-wise, then build BSON dicts (with the run tags
+    appended) RUN_INSERT_ROWS at a time, so only one slice exists as dicts at once.
+    """
+    docs: List[Dict[str, Any]] = []
+    for records, tags in parsed:
+        with trace.span("sanitize"):
+            records = records.sanitized(native)
+        for lo in range(0, len(records), config.RUN_INSERT_ROWS):
+            with trace.span("sanitize"):
+                docs.extend(records.iter_dicts(tags, lo, lo + config.RUN_INSERT_ROWS))
+            if len(docs) >= config.RUN_INSERT_ROWS:
+                with trace.span("mongo_write"):
+                    save_data(source_id, docs, sanitized=True)
+                docs = []
+    if docs:
+        with trace.span("mongo_write"):
+            save_data(source_id, docs, sanitized=True)
+
+RUN_TAGS = ("_id", "_chunk_id", "_run_id", "_batch")
+
+def _state(tokens: TokenIndexer, profiler: FieldProfiler, casts: Dict[Any, Optional[str]], source_id: str) -> Dict[str, Any]:
+    # what a resume needs beyond the committed records; casts as pairs (names may be None)
+    return {"tokens": tokens.to_state(), "profile": profiler.to_doc(source_id, 0), "casts": [[k, t] for k, t in casts.items()]}
+
+def _run_stages(file_path: str, source_id: str, trace: RunTrace, ckpt: Optional[Dict[str, Any]],
+                typed: bool = False) -> Dict[str, Any]:
+    run_id = trace.run_id
+    with trace.span("extract"):
+        text = extract_text_from_file(file_path)
+    st = os.stat(file_path)
+    trace.counters["bytes_in"] = st.st_size
+    with trace.span("detect"):
+        chunks = detect_chunks_budgeted(text)
+    for c in chunks:
+        c["parser_version"] = config.PARSER_VERSIONS.get(c["type"], 1)
+    trace.counters["chunks"] = len(chunks)
+    with trace.span("store_chunks"):
+        blob_id = put_text(text)
+    if ckpt is None:
+        ckpt = {"batch": 0, "chunk_cursor": 0, "records": 0, "finalized": []}
+        trace.start(file_size=st.st_size, file_mtime=int(st.st_mtime), chunks_total=len(chunks),
+                    batch_chunks=config.RUN_BATCH_CHUNKS, typed=typed)
+        ensure_run_indexes(source_id)
+        tokens = TokenIndexer(config.TOKEN_SKETCH_CAPACITY)
+        profiler = FieldProfiler()
+        sample = RecordBatch()
+        casts: Dict[Any, Optional[str]] = {}
+    else:
+        trace.start()
+        tokens = TokenIndexer.from_state(ckpt["state"]["tokens"])
+        profiler = FieldProfiler.from_doc(ckpt["state"]["profile"])
+        casts = dict(ckpt["state"].get("casts", []))
+        with trace.span("resume_sample"):
+            sample = _resume_sample(source_id, run_id)
+    rng = random.Random(ckpt["records"])
+    batch_no, n_records = ckpt["batch"], ckpt["records"]
+    cast_failures = ckpt.get("cast_failures", 0)
+    known = ((get_current_schema(source_id) or {}).get("fields") or {}) if typed else {}
+
+    parse_s = stats_s = cast_s = 0.0
+    for lo in range(ckpt["chunk_cursor"], len(chunks), config.RUN_BATCH_CHUNKS):
+        batch = chunks[lo:lo + config.RUN_BATCH_CHUNKS]
+        batch_no += 1
+        for c in batch:
+            c["_run_id"], c["_batch"] = run_id, batch_no
+        with trace.span("store_chunks"):
+            chunk_ids = save_chunks(source_id, batch, blob_id)
+        with trace.span("search_index"):
+            # index exactly the text a stored chunk lazily resolves to, so offsets line up
+            index_chunks(source_id, chunk_ids, [text[c["start"]:c["end"]].strip() for c in batch])
+
+        parsed_batches: List[Tuple[RecordBatch, Dict[str, Any]]] = []
+        for chunk, chunk_id in zip(batch, chunk_ids):
+            trace.heartbeat()
+            t0 = time.perf_counter()
+            parsed = records_for_chunk(chunk)
+            t1 = time.perf_counter()
+            if typed:
+                cast_failures += sum(cast_records(parsed, casts, known).values())
+            tc = time.perf_counter()
+            if is_raw_result(parsed):
+                # unstructured chunk: count terms over the full chunk text, not the truncated snippet
+                tokens.add_text(chunk["content"])
+            for row in parsed:
+                n_records += 1
+                _sample_add(sample, n_records, row, rng)
+                tokens.add_record(row)
+                profiler.add_record(row)
+            t2 = time.perf_counter()
+            # every record is tagged with its chunk and run when written: lets raw records
+            # resolve their full text, lets reprocessing swap records per chunk and lets a
+            # failed run discard its unfinished batch
+            parsed_batches.append((parsed, {"_chunk_id": str(chunk_id), "_run_id": run_id, "_batch": batch_no}))
+            trace.add_chunk(chunk["type"], t1 - t0, len(parsed))
+            parse_s += t1 - t0
+            cast_s += tc - t1
+            stats_s += t2 - tc
+        _write_batches(source_id, parsed_batches, trace, NATIVE_TYPES if typed else ())
+        del parsed_batches
+        with trace.span("checkpoint"):
+            ckpt = {"batch": batch_no, "chunk_cursor": lo + len(batch), "text_offset": batch[-1]["end"],
+                    "records": n_records, "cast_failures": cast_failures, "finalized": [],
+                    "state": _state(tokens, profiler, casts, source_id)}
+            trace.checkpoint(ckpt)
+    trace.stages["parse"] = trace.stages.get("parse", 0.0) + parse_s
+    trace.stages["field_stats"] = trace.stages.get("field_stats", 0.0) + stats_s
+    if typed:
+        trace.stages["cast"] = trace.stages.get("cast", 0.0) + cast_s
+
+    # finalize: each publishing step is recorded so a resume never repeats one
+    done = ckpt["finalized"]
+    ckpt["state"] = _state(tokens, profiler, casts, source_id)
+    def step(name: str):
+        done.append(name)
+        trace.checkpoint(ckpt)
+
+    if "schema" in done:
+        new_schema = {"version": ckpt["schema_version"]}
     else:
-        new_schema = {
-            "schema_id": "schema_v1",
-            "source_id": source_id,
-            "version": 1,
-            "generated_at": datetime.utcnow().isoformat() + "Z",
-            "compatible_dbs": ["mongodb", "postgresql"],
-            "fields": schema_guess["fields"],
-            "primary_key_candidates": schema_guess.get("primary_key_candidates", []),
-            "migration_notes": None
-        }
-
-    save_schema(new_schema)
-    save_data(source_id, all_records)
-    print(f"Saved {len(all_records)} records, schema v{new_schema['version']}")
+        with trace.span("infer"):
+            # field names and types from every record (the profiler saw them all),
+            # examples and date detection from the sample
+            schema_guess = SchemaInferer.widen(SchemaInferer.infer(sample), profiler.fields)
+            if typed:
+                schema_guess["typed"] = True
+        with trace.span("schema_commit"):
+            new_schema = commit_schema(source_id, schema_guess)
+        ckpt["schema_version"] = new_schema["version"]
+        step("schema")
+    with trace.span("mongo_write"):
+        if "tokens" not in done:
+            save_token_counts(source_id, tokens.top(config.TOKEN_TOP_K))
+            step("tokens")
+        if "profile" not in done:
+            save_field_profile(source_id, new_schema["version"], profiler)
+            step("profile")
+        if "stats" not in done:
+            update_source_stats(source_id, chunks, n_records, new_schema["version"])
+            step("stats")
+        if typed and "indexes" not in done:
+            present = {name: p.present for name, p in profiler.fields.items()}
+            cast = sorted((name for name, target in casts.items() if target), key=lambda n: -present.get(n, 0))
+            ensure_typed_indexes(source_id, cast)
+            step("indexes")
+    if config.SNAPSHOT_ON_INGEST:
+        # a cache over the data just written: failing to build it doesn't fail the run
+        with trace.span("snapshot"):
+            try:
+                build_snapshot(source_id)
+            except (SnapshotError, OSError) as e:
+                print("Snapshot warning:", e)
+    trace.counters["records_out"] = n_records
+    print(f"Saved {n_records} records, schema v{new_schema['version']}")
+    summary = {
+        "file": file_path,
+        "source_id": source_id,
+        "chars": len(text),
+        "chunks": len(chunks),
+        "records": n_records,
+        "batches": batch_no,
+        "schema_version": new_schema["version"]
+    }
+    if typed:
+        trace.counters["cast_failures"] = cast_failures
+        summary["typed_fields"] = {name: target for name, target in casts.items() if target}
+        summary["cast_failures"] = cast_failures
+    return summary
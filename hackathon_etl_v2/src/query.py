@@ -0,0 +1,262 @@
+# src/query.py
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from src.config import config
+from src.loader import db, get_current_schema
+from src.casting import DATE_RE, to_datetime
+from src.field_stats import FieldProfiler, get_field_profile
+
+# Small structured query DSL over data_<source_id>, compiled to an aggregation pipeline.
+#
+#   {
+#     "where":      [{"field": "price", "op": "between", "value": [5, 20]},
+#                    {"field": "currency", "op": "eq", "value": "USD"}],
+#     "select":     ["id", "title", "price"],
+#     "group_by":   ["currency"],
+#     "aggregates": [{"op": "count", "as": "n"}, {"op": "avg", "field": "price", "as": "avg_price"}],
+#     "order_by":   [{"field": "n", "desc": true}],
+#     "top_k":      10
+#   }
+#
+# Everything is pushed down to the server: filters become a $match, select becomes
+# a $project, group_by/aggregates become a $group, order_by/top_k become $sort/$limit.
+
+COMPARE_OPS = {"eq": "$eq", "ne": "$ne", "gt": "$gt", "gte": "$gte", "lt": "$lt", "lte": "$lte"}
+SET_OPS = {"in": "$in", "nin": "$nin"}
+AGG_OPS = {"count", "sum", "avg", "min", "max"}
+
+# Predicates are ordered, and the index hint chosen, by the share of documents they
+# are estimated to keep. Estimates come from the source's ingest-time field profile
+# (src/field_stats.py: presence, nulls, top values, numeric quantile sketch); this
+# rough per-operator table covers what the profile can't answer (no profile yet,
+# comparisons on non-numeric values).
+OP_SELECTIVITY = {"eq": 0.05, "in": 0.15, "prefix": 0.2, "between": 0.3, "gt": 0.4, "gte": 0.4,
+                  "lt": 0.4, "lte": 0.4, "contains": 0.5, "exists": 0.8, "ne": 0.95, "nin": 0.95}
+
+FIELD_RE = re.compile(r"^[^$][^\x00]*$")
+
+def _check_field(name: Any) -> str:
+    if not isinstance(name, str) or not name or not FIELD_RE.match(name):
+        raise ValueError(f"Invalid field name: {name!r}")
+    return name
+
+def cast_literal(value: Any, suggested_type: Optional[str], typed: bool = False) -> Any:
+    """
+    Cast a query literal to the type the schema says the field is stored as,
+    so "9.99" compares numerically against a decimal field. typed=True (sources
+    ingested with typed storage) turns date literals into datetimes. Values that
+    don't cast are passed through unchanged.
+    """
+    if value is None or suggested_type is None:
+        return value
+    try:
+        if typed and suggested_type in ("date", "datetime"):
+            if isinstance(value, str) and DATE_RE.fullmatch(value):
+                return to_datetime(value)
+            return value
+        if suggested_type == "integer" and not isinstance(value, bool):
+            return int(value) if float(value).is_integer() else float(value)
+        if suggested_type == "decimal" and not isinstance(value, bool):
+            return float(value)
+        if suggested_type == "string":
+            return str(value)
+        if suggested_type == "date":
+            # dates are stored as ISO strings; normalize datetimes to the same form
+            return value.isoformat() if isinstance(value, datetime) else str(value)
+    except (TypeError, ValueError):
+        return value
+    return value
+
+def _as_number(v: Any) -> Optional[float]:
+    if isinstance(v, bool):
+        return None
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+def _profile_selectivity(pred: Dict[str, Any], profiler: FieldProfiler) -> Optional[float]:
+    """Estimated share of documents a predicate keeps, from the field profile; None if it can't tell."""
+    records = profiler.records
+    if not records:
+        return None
+    op, value = pred["op"], pred.get("value")
+    fp = profiler.fields.get(pred["field"])
+    if fp is None:
+        # no ingested record has the field
+        return 1.0 if op in ("ne", "nin") or (op == "exists" and value is False) else 0.0
+    present = fp.present / records
+    missing_or_null = 1.0 - present + fp.nulls / records
+
+    def eq(v: Any) -> float:
+        if v is None:
+            return missing_or_null
+        key = (str(v) if not isinstance(v, str) else v)[:config.FIELD_TOPK_VALUE_CHARS]
+        counts = fp.top.counts
+        if key in counts:
+            return counts[key] / records
+        if len(counts) < fp.top.capacity:
+            return 0.0  # every distinct value is tracked: this one never occurred
+        # untracked values are rarer than the least frequent tracked one
+        return min(counts.values()) / records
+
+    if op == "eq":
+        return eq(value)
+    if op == "ne":
+        return 1.0 - eq(value)
+    if op in ("in", "nin") and isinstance(value, list):
+        hit = min(1.0, sum(eq(v) for v in value))
+        return hit if op == "in" else 1.0 - hit
+    if op == "exists":
+        return present if value is not False else 1.0 - present
+    sketch = fp.numeric
+    if op in ("gt", "gte", "lt", "lte", "between") and sketch.n:
+        numeric = sketch.n / records
+        if op == "between":
+            lo, hi = (_as_number(v) for v in value) if isinstance(value, list) and len(value) == 2 else (None, None)
+            if lo is None or hi is None:
+                return None
+            return numeric * max(0.0, sketch.rank(hi) - sketch.rank(lo, inclusive=False))
+        x = _as_number(value)
+        if x is None:
+            return None
+        if op in ("lt", "lte"):
+            return numeric * sketch.rank(x, inclusive=op == "lte")
+        return numeric * (1.0 - sketch.rank(x, inclusive=op == "gt"))
+    if op in ("prefix", "contains") and fp.top.counts:
+        needle = str(value)
+        match = (lambda s: s.startswith(needle)) if op == "prefix" else (lambda s: needle.lower() in s.lower())
+        tracked = sum(fp.top.counts.values())
+        hits = sum(c for s, c in fp.top.counts.items() if match(s))
+        return (fp.present - fp.nulls) / records * hits / tracked
+    return None
+
+def _field_selectivity(pred: Dict[str, Any], field_info: Dict[str, Any],
+                       profiler: Optional[FieldProfiler] = None) -> float:
+    if profiler is not None:
+        est = _profile_selectivity(pred, profiler)
+        if est is not None:
+            return est
+    base = OP_SELECTIVITY.get(pred["op"], 0.5)
+    info = field_info.get(pred["field"]) or {}
+    # fields that are often null/missing filter out more documents
+    if info.get("nullable") and pred["op"] not in ("exists", "ne", "nin"):
+        base *= 0.8
+    if pred["field"] not in field_info:
+        # unknown to the schema: most documents won't have it
+        base *= 0.5
+    return base
+
+def compile_predicate(pred: Dict[str, Any], field_info: Dict[str, Any], typed: bool = False) -> Dict[str, Any]:
+    field = _check_field(pred.get("field"))
+    op = pred.get("op", "eq")
+    stype = (field_info.get(field) or {}).get("suggested_type")
+    value = pred.get("value")
+
+    if op in COMPARE_OPS:
+        return {field: {COMPARE_OPS[op]: cast_literal(value, stype, typed)}}
+    if op in SET_OPS:
+        if not isinstance(value, list):
+            raise ValueError(f"'{op}' expects a list value for {field}")
+        return {field: {SET_OPS[op]: [cast_literal(v, stype, typed) for v in value]}}
+    if op == "between":
+        if not isinstance(value, list) or len(value) != 2:
+            raise ValueError(f"'between' expects [low, high] for {field}")
+        return {field: {"$gte": cast_literal(value[0], stype, typed), "$lte": cast_literal(value[1], stype, typed)}}
+    if op == "exists":
+        return {field: {"$exists": bool(value if value is not None else True)}}
+    if op == "contains":
+        return {field: {"$regex": re.escape(str(value)), "$options": "i"}}
+    if op == "prefix":
+        # anchored, case-sensitive prefix regexes can use an index
+        return {field: {"$regex": "^" + re.escape(str(value))}}
+    raise ValueError(f"Unsupported operator: {op}")
+
+def indexed_fields(coll) -> Dict[str, str]:
+    """Map leading index key -> index name."""
+    out = {}
+    for name, info in coll.index_information().items():
+        keys = info.get("key") or []
+        if keys and keys[0][0] not in out:
+            out[keys[0][0]] = name
+    return out
+
+def compile_query(source_id: str, spec: Dict[str, Any], indexed: Optional[Dict[str, str]] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Compile a query spec into (aggregation pipeline, index hint or None).
+    """
+    schema = get_current_schema(source_id) or {}
+    field_info = schema.get("fields") or {}
+    indexed = indexed or {}
+
+    where = spec.get("where") or []
+    if not isinstance(where, list):
+        raise ValueError("'where' must be a list of predicates")
+    for p in where:
+        if not isinstance(p, dict):
+            raise ValueError("each predicate must be an object with field/op/value")
+        _check_field(p.get("field"))
+        p.setdefault("op", "eq")
+
+    # most selective predicates first; indexed fields win ties
+    profiler = get_field_profile(source_id) if where else None
+    estimate = {id(p): _field_selectivity(p, field_info, profiler) for p in where}
+    ordered = sorted(where, key=lambda p: (estimate[id(p)], p.get("field") not in indexed))
+    pipeline: List[Dict[str, Any]] = []
+    hint = None
+    if ordered:
+        clauses = [compile_predicate(p, field_info, bool(schema.get("typed"))) for p in ordered]
+        pipeline.append({"$match": clauses[0] if len(clauses) == 1 else {"$and": clauses}})
+        # hint the most selective usable index, unless it keeps so much that a scan is cheaper
+        for p in ordered:
+            if p["field"] in indexed and p["op"] not in ("ne", "nin", "contains", "exists"):
+                if estimate[id(p)] <= config.QUERY_HINT_MAX_SELECTIVITY:
+                    hint = indexed[p["field"]]
+                break
+
+    group_by = spec.get("group_by") or []
+    aggregates = spec.get("aggregates") or []
+    select = spec.get("select") or []
+    if group_by or aggregates:
+        group_id = {_check_field(g).replace(".", "_"): f"${g}" for g in group_by} if group_by else None
+        group: Dict[str, Any] = {"_id": group_id}
+        for a in aggregates or [{"op": "count", "as": "count"}]:
+            op = a.get("op")
+            if op not in AGG_OPS:
+                raise ValueError(f"Unsupported aggregate: {op}")
+            alias = _check_field(a.get("as") or (op if op == "count" else f"{op}_{a.get('field')}")).replace(".", "_")
+            group[alias] = {"$sum": 1} if op == "count" else {f"${op}": f"${_check_field(a.get('field'))}"}
+        pipeline.append({"$group": group})
+        # flatten the group key back into top-level fields
+        project: Dict[str, Any] = {"_id": 0}
+        for k in (group_id or {}):
+            project[k] = f"$_id.{k}"
+        for k in group:
+            if k != "_id":
+                project[k] = 1
+        pipeline.append({"$project": project})
+    elif select:
+        pipeline.append({"$project": {_check_field(f): 1 for f in select}})
+
+    order_by = spec.get("order_by") or []
+    if order_by:
+        pipeline.append({"$sort": {_check_field(o.get("field")): -1 if o.get("desc") else 1 for o in order_by}})
+
+    top_k = spec.get("top_k")
+    limit = min(int(top_k), config.QUERY_MAX_ROWS) if top_k else config.QUERY_MAX_ROWS
+    pipeline.append({"$limit": limit})
+    return pipeline, hint
+
+def run_query(source_id: str, spec: Dict[str, Any], batch_size: int = None) -> Iterator[Dict[str, Any]]:
+    """
+    Execute a query spec server-side and yield result documents as the cursor
+    streams them back in batch_size batches.
+    """
+    coll = db[f"{config.DATA_COLLECTION_PREFIX}{source_id}"]
+    pipeline, hint = compile_query(source_id, spec, indexed_fields(coll))
+    kwargs: Dict[str, Any] = {"batchSize": batch_size or config.QUERY_BATCH_SIZE, "allowDiskUse": True}
+    if hint:
+        kwargs["hint"] = hint
+    for doc in coll.aggregate(pipeline, **kwargs):
+        yield doc
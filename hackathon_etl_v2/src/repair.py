@@ -0,0 +1,111 @@
+# src/repair.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, IO, Iterator, List, Optional
+from bson import json_util
+from pymongo import ReplaceOne
+from src.config import config
+from src.loader import db, bump_source_data_version
+from src.keyfix import repair_document
+
+# Bulk repair of documents whose field names are broken JSON fragments, e.g.
+#   {'{"id": 4, "name"': ' "Dave"}'}  ->  {"id": 4, "name": "Dave"}
+#
+# Suspicious keys are found on the server ($objectToArray + $regexMatch), so only
+# affected documents leave MongoDB. Fixes are written with unordered bulk_write
+# batches, and the _id space can be split into $bucketAuto ranges that are
+# scanned in parallel. Every finding is streamed to an NDJSON report.
+
+def suspicious_filter() -> Dict[str, Any]:
+    """Server-side match for documents with at least one suspicious key."""
+    return {"$expr": {"$anyElementTrue": [{"$map": {
+        "input": {"$objectToArray": "$$ROOT"},
+        "as": "kv",
+        "in": {"$regexMatch": {"input": "$$kv.k", "regex": config.REPAIR_KEY_REGEX}}
+    }}]}}
+
+def id_ranges(coll_name: str, n: int) -> List[Dict[str, Any]]:
+    """
+    Split the _id space into about n contiguous ranges of similar size.
+    $bucketAuto bucket maxima are exclusive except for the last bucket.
+    """
+    if n <= 1:
+        return [{}]
+    buckets = list(db[coll_name].aggregate([
+        {"$project": {"_id": 1}},
+        {"$bucketAuto": {"groupBy": "$_id", "buckets": n}}
+    ], allowDiskUse=True))
+    ranges = []
+    for i, b in enumerate(buckets):
+        upper = "$lte" if i == len(buckets) - 1 else "$lt"
+        ranges.append({"_id": {"$gte": b["_id"]["min"], upper: b["_id"]["max"]}})
+    return ranges or [{}]
+
+class _ReportWriter:
+    """Thread-safe NDJSON writer so findings are streamed as they are found."""
+
+    def __init__(self, out: Optional[IO[str]]):
+        self.out = out
+        self.lock = threading.Lock()
+
+    def write(self, obj: Dict[str, Any]):
+        if self.out is None:
+            return
+        with self.lock:
+            self.out.write(json_util.dumps(obj) + "\n")
+            self.out.flush()
+
+def _repair_range(coll_name: str, id_filter: Dict[str, Any], dry_run: bool, drop_unparseable: bool,
+                  report: _ReportWriter) -> Dict[str, int]:
+    coll = db[coll_name]
+    stats = {"matched": 0, "repaired": 0, "unparseable_keys": 0, "write_errors": 0}
+    ops: List[ReplaceOne] = []
+
+    def flush():
+        if ops and not dry_run:
+            res = coll.bulk_write(ops, ordered=False)
+            stats["write_errors"] += len(ops) - res.matched_count
+        ops.clear()
+
+    query = {**id_filter, **suspicious_filter()}
+    for doc in coll.find(query, batch_size=config.REPAIR_BATCH_SIZE):
+        stats["matched"] += 1
+        fixed, entry = repair_document(doc, drop_unparseable)
+        stats["unparseable_keys"] += len(entry["unparseable"])
+        report.write(entry)
+        if fixed is None:
+            continue
+        stats["repaired"] += 1
+        # whole-document replace: broken keys may contain '.' or '$', which $unset can't address
+        ops.append(ReplaceOne({"_id": doc["_id"]}, fixed))
+        if len(ops) >= config.REPAIR_BATCH_SIZE:
+            flush()
+    flush()
+    return stats
+
+def repair_collection(coll_name: str, workers: int = None, dry_run: bool = False,
+                      drop_unparseable: bool = False, report_out: Optional[IO[str]] = None) -> Dict[str, Any]:
+    """
+    Repair malformed keys in one collection. Returns summary counts; per-document
+    findings go to report_out as NDJSON (the last line is the summary).
+    """
+    workers = workers or config.REPAIR_WORKERS
+    report = _ReportWriter(report_out)
+    ranges = id_ranges(coll_name, workers)
+    totals = {"collection": coll_name, "dry_run": dry_run, "ranges": len(ranges),
+              "matched": 0, "repaired": 0, "unparseable_keys": 0, "write_errors": 0}
+    with ThreadPoolExecutor(max_workers=max(1, len(ranges))) as pool:
+        futures = [pool.submit(_repair_range, coll_name, r, dry_run, drop_unparseable, report) for r in ranges]
+        for f in futures:
+            for k, v in f.result().items():
+                totals[k] += v
+    if totals["repaired"] and not dry_run and coll_name.startswith(config.DATA_COLLECTION_PREFIX):
+        # rewritten records: cached responses and snapshots of the source are stale
+        bump_source_data_version(coll_name[len(config.DATA_COLLECTION_PREFIX):])
+    report.write({"summary": totals})
+    return totals
+
+def iter_data_collections() -> Iterator[str]:
+    for name in sorted(db.list_collection_names()):
+        if name.startswith(config.DATA_COLLECTION_PREFIX) and not name.endswith("__reprocess"):
+            yield name
@@ -0,0 +1,310 @@
+# src/reprocess.py
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from src.config import config
+from src.extractor import detect_chunks_budgeted
+from bson import ObjectId
+from src.loader import (db, sanitize_doc, set_source_record_count, get_current_schema, ensure_run_indexes,
+                        ensure_typed_indexes, typed_index_fields, save_token_counts)
+from src.blobstore import read_text, chunk_text
+from src.batch import RecordBatch
+from src.casting import NATIVE_TYPES
+from src.field_stats import FieldProfiler, save_field_profile
+from src.pipeline import records_for_chunk, commit_schema, cast_records
+from src.runs import RunStateError, owner_is_dead
+from src.schema import SchemaInferer
+from src.search import index_chunks, remove_chunks
+from src.tokens import TokenIndexer
+
+# Incremental reprocessing of stored sources after parser or chunk-detection changes.
+#
+# For each upload blob of a source the text is re-run through chunk detection and
+# compared with the stored chunks by (start, end, type):
+#   - unchanged: same span/type and parser_version == config.PARSER_VERSIONS[type]
+#   - reparse:   same span/type but an older parser_version
+#   - added:     newly detected chunks
+#   - removed:   stored chunks no longer detected
+# Records of unchanged chunks are copied server-side into a staging collection,
+# re-derived records are inserted next to them, and the staging collection is
+# atomically renamed over data_<source_id>. The plan is frozen into the checkpoint
+# (chunk ids and spans) and progress is recorded per batch, so an interrupted run
+# resumes over exactly the work it planned, whatever it had already written.
+#
+# Reprocessing refuses to start or to swap while a pipeline run of the source is
+# live. Records of runs that started and ended in between are copied into the
+# staging collection just before the swap, so they survive it.
+
+def _chunks():
+    return db[config.CHUNKS_COLLECTION]
+
+def _checkpoints():
+    return db[config.REPROCESS_CHECKPOINTS_COLLECTION]
+
+def _staging_name(source_id: str) -> str:
+    return f"{config.DATA_COLLECTION_PREFIX}{source_id}__reprocess"
+
+def _refuse_live_runs(source_id: str):
+    for run in db[config.PIPELINE_RUNS_COLLECTION].find({"source_id": source_id, "status": "running"}):
+        if not owner_is_dead(run):
+            raise RunStateError(f"Run {run['run_id']} is ingesting into {source_id}; "
+                                f"reprocess the source once it has finished")
+
+def _copy_new_runs(source_id: str, staging: str, since: str):
+    """Copy the records of runs started after `since` into the staging collection."""
+    run_ids = [r["run_id"] for r in db[config.PIPELINE_RUNS_COLLECTION].find(
+        {"source_id": source_id, "started_at": {"$gte": since}}, {"run_id": 1})]
+    if not run_ids:
+        return
+    db[staging].delete_many({"_run_id": {"$in": run_ids}})
+    batch: List[Dict[str, Any]] = []
+    for rec in db[f"{config.DATA_COLLECTION_PREFIX}{source_id}"].find({"_run_id": {"$in": run_ids}}):
+        batch.append(rec)
+        if len(batch) >= 1000:
+            db[staging].insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        db[staging].insert_many(batch, ordered=False)
+
+def _rebuild_profile_and_tokens(source_id: str, version: int):
+    """
+    Field profile and visual tokens from every record of the source. Both are
+    otherwise folded in per ingest, which would count re-derived records twice.
+    """
+    tokens = TokenIndexer(config.TOKEN_SKETCH_CAPACITY)
+    profiler = FieldProfiler()
+    raw_chunk_ids: List[Any] = []
+    for rec in db[f"{config.DATA_COLLECTION_PREFIX}{source_id}"].find({}, {"_id": 0, "_run_id": 0, "_batch": 0}):
+        chunk_id = rec.pop("_chunk_id", None)
+        profiler.add_record(rec)
+        tokens.add_record(rec)
+        if "_raw" in rec and chunk_id:
+            raw_chunk_ids.append(ObjectId(chunk_id) if ObjectId.is_valid(chunk_id) else chunk_id)
+    # as at ingest, terms of unstructured chunks are counted over their full text
+    for i in range(0, len(raw_chunk_ids), 500):
+        for c in _chunks().find({"_id": {"$in": raw_chunk_ids[i:i + 500]}}):
+            tokens.add_text(chunk_text(c))
+    save_token_counts(source_id, tokens.top(config.TOKEN_TOP_K), replace=True)
+    save_field_profile(source_id, version, profiler, merge=False)
+
+def plan_source(source_id: str) -> Dict[str, Any]:
+    """
+    Work out which chunks of a source need re-parsing. Returns
+    {"unchanged": [ids], "reparse": [chunk docs], "added": [chunk dicts], "removed": [ids], "full": bool}.
+    full=True means some stored records are not attributable to a chunk (ingested before
+    records carried _chunk_id), so every record has to be regenerated.
+    """
+    by_blob: Dict[Optional[str], List[Dict[str, Any]]] = defaultdict(list)
+    for c in _chunks().find({"source_id": source_id}).sort("_id", 1):
+        by_blob[c.get("blob_id")].append(c)
+
+    plan: Dict[str, Any] = {"unchanged": [], "reparse": [], "added": [], "removed": [], "full": False}
+    data_coll = db[f"{config.DATA_COLLECTION_PREFIX}{source_id}"]
+    plan["full"] = data_coll.find_one({"_chunk_id": {"$exists": False}}, {"_id": 1}) is not None
+
+    for blob_id, stored in by_blob.items():
+        if blob_id is None:
+            # legacy chunks with inline content: can't re-detect, only re-parse
+            for c in stored:
+                if plan["full"] or c.get("parser_version") != config.PARSER_VERSIONS.get(c["type"], 1):
+                    plan["reparse"].append(c)
+                else:
+                    plan["unchanged"].append(c["_id"])
+            continue
+
+        text = read_text(blob_id)
+        fresh = {(c["start"], c["end"], c["type"]): c for c in detect_chunks_budgeted(text)}
+        seen = set()
+        for c in stored:
+            key = (c.get("start"), c.get("end"), c.get("type"))
+            if key not in fresh:
+                plan["removed"].append(c["_id"])
+                continue
+            seen.add(key)
+            if plan["full"] or c.get("parser_version") != config.PARSER_VERSIONS.get(c["type"], 1):
+                c["content"] = fresh[key]["content"]
+                plan["reparse"].append(c)
+            else:
+                plan["unchanged"].append(c["_id"])
+        for key, c in fresh.items():
+            if key not in seen:
+                plan["added"].append({**c, "blob_id": blob_id, "source_id": source_id})
+    return plan
+
+def _summary(plan: Dict[str, Any]) -> Dict[str, int]:
+    return {k: (len(v) if isinstance(v, list) else v) for k, v in plan.items()}
+
+def _frozen_plan(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """The parts of a plan a resumed run needs, small enough for the checkpoint document."""
+    return {"reparse": [c["_id"] for c in plan["reparse"]],
+            "added": [[c["blob_id"], c["start"], c["end"], c["type"]] for c in plan["added"]],
+            "removed": list(plan["removed"]), "full": plan["full"]}
+
+def _thaw_plan(source_id: str, frozen: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Rebuild the work lists of a checkpointed plan, in their original order so the
+    done_* counters still index them. Chunk content is re-read from the blobs;
+    a chunk that has since disappeared leaves a None placeholder.
+    """
+    fresh_by_blob: Dict[str, Dict[Any, Dict[str, Any]]] = {}
+
+    def fresh(blob_id: str, key: Any) -> Optional[Dict[str, Any]]:
+        if blob_id not in fresh_by_blob:
+            fresh_by_blob[blob_id] = {(c["start"], c["end"], c["type"]): c
+                                      for c in detect_chunks_budgeted(read_text(blob_id))}
+        return fresh_by_blob[blob_id].get(key)
+
+    docs = {c["_id"]: c for c in _chunks().find({"_id": {"$in": frozen["reparse"]}})}
+    reparse: List[Optional[Dict[str, Any]]] = []
+    for cid in frozen["reparse"]:
+        c = docs.get(cid)
+        if c is not None and c.get("blob_id") is not None:
+            f = fresh(c["blob_id"], (c.get("start"), c.get("end"), c.get("type")))
+            c = {**c, "content": f["content"]} if f else None
+        reparse.append(c)
+    added: List[Optional[Dict[str, Any]]] = []
+    for blob_id, start, end, ctype in frozen["added"]:
+        f = fresh(blob_id, (start, end, ctype))
+        added.append({**f, "blob_id": blob_id, "source_id": source_id} if f else None)
+    return {"unchanged": [], "reparse": reparse, "added": added,
+            "removed": frozen["removed"], "full": frozen["full"]}
+
+def reprocess_source(source_id: str, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Re-derive the records of one source from its stored raw text, touching only
+    chunks whose parser version or detected type/span changed.
+    """
+    data_name = f"{config.DATA_COLLECTION_PREFIX}{source_id}"
+    staging = _staging_name(source_id)
+    ckpt = _checkpoints().find_one({"source_id": source_id})
+    resuming = bool(ckpt and ckpt.get("plan") and staging in db.list_collection_names())
+    if resuming and not dry_run:
+        # re-planning would miss chunks the interrupted run already marked as re-parsed
+        plan = _thaw_plan(source_id, ckpt["plan"])
+    else:
+        plan = plan_source(source_id)
+    result = {"source_id": source_id, "plan": _summary(plan)}
+    if dry_run or not (plan["reparse"] or plan["added"] or plan["removed"]):
+        result["status"] = "dry_run" if dry_run else "up_to_date"
+        return result
+    _refuse_live_runs(source_id)
+
+    if not resuming:
+        # phase 1: copy records of unchanged chunks server-side ($out never leaves the server)
+        db[staging].drop()
+        if not plan["full"]:
+            stale = [str(c["_id"]) for c in plan["reparse"]] + [str(i) for i in plan["removed"]]
+            db[data_name].aggregate([
+                {"$match": {"_chunk_id": {"$nin": stale}}},
+                {"$out": staging}
+            ], allowDiskUse=True)
+        ckpt = {"source_id": source_id, "phase": "parsing", "done_reparse": 0, "done_added": 0,
+                "plan": _frozen_plan(plan), "started_at": datetime.utcnow().isoformat() + "Z"}
+        _checkpoints().replace_one({"source_id": source_id}, ckpt, upsert=True)
+
+    # a source ingested with typed storage stays typed (see pipeline.cast_records)
+    current = get_current_schema(source_id) or {}
+    typed = bool(current.get("typed"))
+    casts: Dict[Any, Optional[str]] = {}
+    new_records: List[Dict[str, Any]] = []
+    # chunks derived since the last flush, as (chunk id, type)
+    pending: List[Any] = []
+    # only a bounded sample of re-derived records feeds schema inference
+    sample = RecordBatch()
+
+    def flush(kind: str, done: int):
+        if pending:
+            # a batch that was inserted before a crash but not checkpointed is replaced, not duplicated
+            db[staging].delete_many({"_chunk_id": {"$in": [str(cid) for cid, _ in pending]}})
+        if new_records:
+            db[staging].insert_many(new_records, ordered=False)
+            new_records.clear()
+        _checkpoints().update_one({"source_id": source_id}, {"$set": {f"done_{kind}": done}})
+        # chunks count as re-parsed only once their records are safely staged
+        by_version: Dict[int, List[Any]] = defaultdict(list)
+        for cid, ctype in pending:
+            by_version[config.PARSER_VERSIONS.get(ctype, 1)].append(cid)
+        for version, ids in by_version.items():
+            _chunks().update_many({"_id": {"$in": ids}}, {"$set": {"parser_version": version}})
+        pending.clear()
+
+    def derive(chunk: Dict[str, Any], chunk_id: Any):
+        records = records_for_chunk(chunk)
+        if typed:
+            cast_records(records, casts, current.get("fields") or {})
+        if len(sample) < config.REPROCESS_SCHEMA_SAMPLE:
+            sample.extend(RecordBatch.from_records(records.head(config.REPROCESS_SCHEMA_SAMPLE - len(sample))))
+        new_records.extend(records.sanitized(NATIVE_TYPES if typed else ()).iter_dicts({"_chunk_id": str(chunk_id)}))
+        pending.append((chunk_id, chunk["type"]))
+
+    # phase 2a: re-parse existing chunks, in plan order so the checkpoint is a simple counter
+    reparse = plan["reparse"]
+    for i in range(ckpt.get("done_reparse", 0), len(reparse)):
+        c = reparse[i]
+        if c is not None:
+            derive(c, c["_id"])
+        if (i + 1) % config.REPROCESS_BATCH_CHUNKS == 0:
+            flush("reparse", i + 1)
+    flush("reparse", len(reparse))
+
+    # phase 2b: newly detected chunks are stored (without content) and parsed
+    added = plan["added"]
+    for i in range(ckpt.get("done_added", 0), len(added)):
+        c = added[i]
+        if c is not None:
+            # parser_version is set by flush() once the chunk's records are staged
+            doc = {k: v for k, v in c.items() if k != "content"}
+            # upsert on the span so a resumed run doesn't store the chunk twice
+            res = _chunks().find_one_and_update(
+                {"source_id": source_id, "blob_id": c["blob_id"], "start": c["start"], "end": c["end"], "type": c["type"]},
+                {"$setOnInsert": sanitize_doc(doc)}, upsert=True, return_document=True)
+            index_chunks(source_id, [res["_id"]], [c["content"]])
+            derive(c, res["_id"])
+        if (i + 1) % config.REPROCESS_BATCH_CHUNKS == 0:
+            flush("added", i + 1)
+    flush("added", len(added))
+
+    # phase 3: drop removed chunks, then atomically swap the staging collection in.
+    # The staging copy gets the indexes the swap would otherwise drop (run resume,
+    # typed fields) and the records of runs that ran while it was built.
+    if plan["removed"]:
+        remove_chunks(plan["removed"])
+        _chunks().delete_many({"_id": {"$in": plan["removed"]}})
+    _refuse_live_runs(source_id)
+    _copy_new_runs(source_id, staging, ckpt["started_at"])
+    ensure_run_indexes(source_id, staging)
+    typed_fields = typed_index_fields(source_id)
+    typed_fields += [name for name, target in casts.items() if target and name not in typed_fields]
+    if typed_fields:
+        ensure_typed_indexes(source_id, typed_fields, staging)
+    db[staging].rename(data_name, dropTarget=True)
+    _checkpoints().delete_one({"source_id": source_id})
+
+    # re-derived fields are evolved into a new schema version like any other ingest
+    schema_guess = SchemaInferer.infer(sample)
+    if typed:
+        schema_guess["typed"] = True
+    new_schema = commit_schema(source_id, schema_guess)
+    _rebuild_profile_and_tokens(source_id, new_schema["version"])
+
+    chunk_types: Dict[str, int] = {}
+    for row in _chunks().aggregate([{"$match": {"source_id": source_id}}, {"$group": {"_id": "$type", "n": {"$sum": 1}}}]):
+        chunk_types[str(row["_id"] or "raw")] = row["n"]
+    record_count = db[data_name].estimated_document_count()
+    set_source_record_count(source_id, record_count, chunk_types)
+
+    result.update({"status": "ok", "records": record_count, "schema_version": new_schema["version"]})
+    return result
+
+def reprocess_sources(source_ids: List[str], workers: int = 1, dry_run: bool = False) -> List[Dict[str, Any]]:
+    """
+    Reprocess several sources, in parallel across sources (one source per worker process).
+    """
+    if workers <= 1 or len(source_ids) <= 1:
+        return [reprocess_source(sid, dry_run) for sid in source_ids]
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    # spawn: each worker opens its own Mongo client instead of inheriting a forked one
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        return list(pool.map(reprocess_source, source_ids, [dry_run] * len(source_ids)))
@@ -0,0 +1,98 @@
+# src/runs.py
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from src.config import config
+from src.loader import db, bump_source_data_version
+from src.search import remove_chunks
+from src.tracing import get_run, run_owner
+
+# Partial-write cleanup for checkpointed pipeline runs. Every chunk and record a
+# run writes carries _run_id and _batch; a batch counts as committed once the
+# run's checkpoint names it. Anything tagged with a later batch is debris from
+# a failure mid-batch and is discarded before a resume; a rollback discards all
+# of a run's batches. A run still marked "running" is only taken over (claim_run)
+# once its owner is provably gone, so a live run is never resumed twice or
+# rolled back under its own feet.
+
+class RunStateError(Exception):
+    """The run can't be resumed or rolled back in its current state."""
+
+def _runs():
+    return db[config.PIPELINE_RUNS_COLLECTION]
+
+def list_runs(status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+    query = {"status": status} if status else {"status": {"$in": ["running", "error"]}}
+    return list(_runs().find(query, {"_id": 0, "profile_top": 0, "checkpoint.state": 0})
+                .sort("started_at", -1).limit(limit))
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def owner_is_dead(run: Dict[str, Any]) -> bool:
+    """
+    True when a "running" run's process is provably gone: its lease expired (no
+    heartbeat for RUN_LEASE_SECONDS), or it ran on this host under a pid that no
+    longer exists (POSIX only: os.kill(pid, 0) would kill the process on Windows).
+    """
+    last = run.get("heartbeat_at") or run.get("checkpoint_at") or run.get("started_at")
+    if not last or (datetime.utcnow() - datetime.fromisoformat(last.rstrip("Z"))).total_seconds() > config.RUN_LEASE_SECONDS:
+        return True
+    host, _, pid = (run.get("owner") or "").rpartition(":")
+    if os.name == "posix" and host == run_owner().rpartition(":")[0] and pid.isdigit():
+        return not _pid_alive(int(pid))
+    return False
+
+def claim_run(run: Dict[str, Any]):
+    """
+    Take over an unfinished run for this process. A "running" run is refused while
+    its owner may be alive; the takeover is conditional on the run document being
+    unchanged, so of two processes claiming the same run only one wins.
+    """
+    if run["status"] == "running" and not owner_is_dead(run):
+        raise RunStateError(f"Run {run['run_id']} is still running (owner {run.get('owner') or 'unknown'}, "
+                            f"last heartbeat {run.get('heartbeat_at') or run.get('checkpoint_at')}); "
+                            f"wait for it to finish or for its lease to lapse ({config.RUN_LEASE_SECONDS}s)")
+    now = datetime.utcnow().isoformat() + "Z"
+    claimed = _runs().update_one(
+        {"run_id": run["run_id"], "status": run["status"], "owner": run.get("owner"), "heartbeat_at": run.get("heartbeat_at")},
+        {"$set": {"owner": run_owner(), "heartbeat_at": now}})
+    if not claimed.matched_count:
+        raise RunStateError(f"Run {run['run_id']} was taken over by another process")
+
+def discard_batches(source_id: str, run_id: str, after_batch: int = 0) -> Dict[str, int]:
+    """Delete a run's chunks, records and search postings from batches after `after_batch`."""
+    match = {"_run_id": run_id, "_batch": {"$gt": after_batch}}
+    records = db[f"{config.DATA_COLLECTION_PREFIX}{source_id}"].delete_many(match).deleted_count
+    chunks = db[config.CHUNKS_COLLECTION]
+    chunk_ids = [c["_id"] for c in chunks.find({"source_id": source_id, **match}, {"_id": 1})]
+    remove_chunks(chunk_ids)
+    chunks.delete_many({"_id": {"$in": chunk_ids}})
+    if records or chunk_ids:
+        bump_source_data_version(source_id)
+    return {"chunks": len(chunk_ids), "records": records}
+
+def rollback_run(run_id: str) -> Dict[str, int]:
+    """
+    Remove everything an unfinished run wrote. Finished runs are refused: their
+    schema version and source stats are already published.
+    """
+    run = get_run(run_id)
+    if run is None:
+        raise RunStateError(f"No such run: {run_id}")
+    if run["status"] == "ok":
+        raise RunStateError(f"Run {run_id} finished; it can't be rolled back")
+    ckpt = run.get("checkpoint") or {}
+    if ckpt.get("finalized"):
+        raise RunStateError(f"Run {run_id} already published {', '.join(ckpt['finalized'])}; resume it instead")
+    claim_run(run)
+    removed = discard_batches(run["source_id"], run_id, 0)
+    _runs().update_one({"run_id": run_id}, {"$set": {"status": "rolled_back", "rolled_back": removed},
+                                            "$unset": {"checkpoint": ""}})
+    return removed
@@ -0,0 +1,197 @@
+# src/salvage.py
+import json, mmap, os, shutil
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from src.config import config
+from src.keyfix import repair_document
+
+# Offline repair of (possibly broken) JSONL backups.
+#
+# The input is memory-mapped and cut into shards at newline boundaries; each
+# shard is repaired by a worker process into its own output/report part file
+# and the parts are concatenated in shard order, so output line order matches
+# the input. Only lines that needed work are written to the report, with their
+# byte offset in the input.
+#
+# Embedded JSON in broken lines is located by a single left-to-right bracket
+# scan (see json_spans) instead of a backtracking regex.
+
+OPENERS = {"{": "}", "[": "]"}
+CLOSERS = {"}", "]"}
+
+def json_spans(s: str, strings: bool = True) -> List[Tuple[int, int, int]]:
+    """
+    Balanced {...} / [...] spans in s as (start, end, depth), in one linear pass.
+    With strings=True brackets inside JSON string literals are ignored; a stray
+    closer discards the spans that are still open.
+    """
+    spans: List[Tuple[int, int, int]] = []
+    stack: List[Tuple[str, int]] = []
+    in_str = escaped = False
+    for i, ch in enumerate(s):
+        if in_str:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_str = False
+            continue
+        if ch == '"' and strings:
+            in_str = True
+        elif ch in OPENERS:
+            stack.append((OPENERS[ch], i))
+        elif ch in CLOSERS:
+            if stack and stack[-1][0] == ch:
+                _, start = stack.pop()
+                spans.append((start, i + 1, len(stack)))
+            else:
+                stack.clear()
+    return spans
+
+def extract_json_values(s: str) -> List[Any]:
+    """
+    Parse embedded JSON values, outermost first: children of a span are only
+    tried when the span itself doesn't parse, and only down to
+    config.SALVAGE_MAX_DEPTH levels of nesting.
+    """
+    found: List[Any] = []
+    for strings in (True, False):
+        spans = sorted(json_spans(s, strings), key=lambda x: (x[0], -x[1]))
+        covered_until = -1
+        for start, end, depth in spans:
+            if start < covered_until or depth > config.SALVAGE_MAX_DEPTH:
+                continue
+            try:
+                found.append(json.loads(s[start:end]))
+                covered_until = end
+            except ValueError:
+                continue
+        if found:
+            break
+    return found
+
+def repair_line(line: str) -> Tuple[Optional[Dict[str, Any]], str, Optional[Dict[str, Any]]]:
+    """
+    Returns (document or None for empty lines, tag, report details or None).
+    Tags: ok, keys_fixed, salvaged_merged, salvaged_list, heuristic_braces, raw_only, empty.
+    """
+    line = line.strip()
+    if not line:
+        return None, "empty", None
+    try:
+        doc = json.loads(line)
+    except ValueError:
+        doc = None
+    if doc is not None:
+        if not isinstance(doc, dict):
+            return {"value": doc}, "ok", None
+        fixed, entry = repair_document(doc)
+        if fixed is None:
+            return doc, "ok", None
+        return fixed, "keys_fixed", {"unset": entry["unset"], "set": list(entry["set"])}
+
+    values = extract_json_values(line)
+    if values:
+        obj: Dict[str, Any] = {}
+        other = []
+        for v in values:
+            if isinstance(v, dict):
+                obj.update(v)
+            else:
+                other.append(v)
+        if obj:
+            res: Dict[str, Any] = {"salvaged_json": {"merged_object": obj}}
+            if other:
+                res["salvaged_json"]["other"] = other
+            res["_raw_line"] = line
+            return res, "salvaged_merged", None
+        return {"salvaged_json": values, "_raw_line": line}, "salvaged_list", None
+
+    # last resort: everything from the first '{' to the last '}'
+    start, end = line.find("{"), line.rfind("}")
+    if start != -1 and end > start:
+        try:
+            return {"salvaged_json": [json.loads(line[start:end + 1])], "_raw_line": line}, "heuristic_braces", None
+        except ValueError:
+            pass
+    return {"_raw_line": line}, "raw_only", None
+
+def shard_bounds(path: str, n: int) -> List[Tuple[int, int]]:
+    """Split a file into about n byte ranges that start and end on line boundaries."""
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    n = max(1, min(n, size // config.SALVAGE_MIN_SHARD_BYTES or 1))
+    bounds, start = [], 0
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for i in range(1, n + 1):
+            if start >= size:
+                break
+            target = size if i == n else max(start, size * i // n)
+            nl = mm.find(b"\n", target) if target < size else -1
+            end = size if nl == -1 else nl + 1
+            bounds.append((start, end))
+            start = end
+    return bounds
+
+def _iter_lines(mm: mmap.mmap, start: int, end: int) -> Iterator[Tuple[int, bytes]]:
+    pos = start
+    while pos < end:
+        nl = mm.find(b"\n", pos, end)
+        stop = end if nl == -1 else nl + 1
+        yield pos, mm[pos:stop]
+        pos = stop
+
+def repair_shard(in_path: str, start: int, end: int, out_part: str, report_part: str) -> Dict[str, int]:
+    """Worker: repair one byte range into its own output and report part files."""
+    stats: Dict[str, int] = {"total": 0}
+    with open(in_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+            open(out_part, "w", encoding="utf-8") as out, open(report_part, "w", encoding="utf-8") as rep:
+        for offset, raw in _iter_lines(mm, start, end):
+            stats["total"] += 1
+            line = raw.decode("utf-8", errors="replace")
+            try:
+                doc, tag, details = repair_line(line)
+            except Exception as e:
+                doc, tag, details = {"_raw_line": line.strip(), "repair_error": str(e)}, "raw_only", {"error": str(e)}
+            stats[tag] = stats.get(tag, 0) + 1
+            if doc is None:
+                continue
+            out.write(json.dumps(doc, ensure_ascii=False) + "\n")
+            if tag != "ok":
+                rep.write(json.dumps({"offset": offset, "tag": tag, **(details or {})}, ensure_ascii=False) + "\n")
+    return stats
+
+def _concat(parts: List[str], dest: str):
+    with open(dest, "wb") as out:
+        for p in parts:
+            with open(p, "rb") as f:
+                shutil.copyfileobj(f, out, 1 << 20)
+            os.remove(p)
+
+def repair_file(in_path: str, out_path: str, report_path: str, workers: int = None) -> Dict[str, Any]:
+    """
+    Repair a JSONL backup in parallel. Output preserves input line order;
+    the report (NDJSON, one line per repaired/salvaged line) ends with a summary line.
+    """
+    workers = workers or config.SALVAGE_WORKERS
+    bounds = shard_bounds(in_path, workers * config.SALVAGE_SHARDS_PER_WORKER)
+    out_parts = [f"{out_path}.part{i:05d}" for i in range(len(bounds))]
+    rep_parts = [f"{report_path}.part{i:05d}" for i in range(len(bounds))]
+
+    totals: Dict[str, Any] = {"input_bytes": os.path.getsize(in_path), "shards": len(bounds), "total": 0}
+    import multiprocessing
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        futures = [pool.submit(repair_shard, in_path, s, e, op, rp)
+                   for (s, e), op, rp in zip(bounds, out_parts, rep_parts)]
+        for f in futures:
+            for k, v in f.result().items():
+                totals[k] = totals.get(k, 0) + v
+
+    _concat(out_parts, out_path)
+    _concat(rep_parts, report_path)
+    with open(report_path, "a", encoding="utf-8") as rep:
+        rep.write(json.dumps({"summary": totals}) + "\n")
+    return totals
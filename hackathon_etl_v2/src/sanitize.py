@@ -0,0 +1,60 @@
+# src/sanitize.py
+from typing import Any
+from datetime import datetime, date
+from decimal import Decimal
+
+# BSON/JSON-friendly conversion of parsed values. No database imports, so parsing
+# and benchmarking code can use it without a Mongo connection (loader re-exports it).
+
+def sanitize_value(v: Any) -> Any:
+    """
+    Convert non-BSON-serializable python objects to BSON/JSON-friendly types.
+    - datetime / date -> ISO string
+    - set -> list
+    - Decimal -> str
+    - bytes -> decoded str
+    - dict/list -> recursively sanitize
+    """
+    # basic types that are already safe
+    if v is None or isinstance(v, (str, int, float, bool)):
+        return v
+
+    # dates and datetimes -> ISO format strings
+    if isinstance(v, (datetime, date)):
+        # ensure datetime has timezone if needed; we keep plain isoformat
+        return v.isoformat()
+
+    # sets -> list
+    if isinstance(v, set):
+        return [sanitize_value(x) for x in sorted(list(v), key=lambda x: str(x))]
+
+    # Decimal -> string (preserve precision)
+    if isinstance(v, Decimal):
+        return str(v)
+
+    # bytes -> decode best-effort
+    if isinstance(v, (bytes, bytearray)):
+        try:
+            return v.decode("utf-8")
+        except Exception:
+            return v.decode("utf-8", errors="replace")
+
+    # dict -> sanitize recursively
+    if isinstance(v, dict):
+        return {str(k): sanitize_value(val) for k, val in v.items()}
+
+    # list/tuple -> sanitize elements
+    if isinstance(v, (list, tuple)):
+        return [sanitize_value(x) for x in v]
+
+    # fallback: try str()
+    try:
+        return str(v)
+    except Exception:
+        return repr(v)
+
+def sanitize_doc(doc: Any) -> Any:
+    """
+    Recursively sanitize a document/document-like object (dict/list/scalar).
+    """
+    return sanitize_value(doc)
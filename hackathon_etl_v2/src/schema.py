@@ -1,19 +1,60 @@
 # src/schema.py
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Union
+from array import array
+from itertools import islice
 import re
 from datetime import datetime
+from src.batch import MISSING, RecordBatch
+from src.casting import detect_string_type
 
 class SchemaInferer:
     @staticmethod
-    def infer(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def infer(records: Union[List[Dict[str, Any]], RecordBatch], detect_strings: bool = False) -> Dict[str, Any]:
         """
-        Infer a simple schema from a list of dict records.
+        Infer a simple schema from a list of dict records or a RecordBatch
+        (read column-wise: one pass per column instead of one dict walk per record).
+        detect_strings=True suggests integer/decimal/date for string fields whose
+        every value casts (typed ingest, src/casting.py); by default a string
+        field stays "string" since that is how it is stored.
         Returns a dict with 'fields' and 'primary_key_candidates'.
         Important: the returned 'fields' will contain JSON/BSON-serializable types only.
         """
         if not records:
             return {"fields": {}, "primary_key_candidates": []}
 
+        if detect_strings and not isinstance(records, RecordBatch):
+            records = RecordBatch.from_records(records)
+        if isinstance(records, RecordBatch):
+            field_info = SchemaInferer._collect_columns(records, detect_strings)
+        else:
+            field_info = SchemaInferer._collect_records(records)
+        return SchemaInferer._finalize(field_info)
+
+    @staticmethod
+    def widen(schema_guess: Dict[str, Any], profiles: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Add to a guess inferred from a sample the fields, types and nulls the sample
+        missed. profiles maps field name -> an object with .types ({type name: count})
+        and .nulls, as kept for every record by src.field_stats.FieldProfiler.
+        """
+        fields = schema_guess["fields"]
+        missed: Dict[str, Dict[str, Any]] = {}
+        for name, p in profiles.items():
+            info = fields.get(name)
+            types = {t for t, n in p.types.items() if n}
+            if info is None:
+                missed[name] = {"types": types, "nulls": p.nulls, "examples": []}
+            elif not types <= set(info["types"]) or p.nulls > info.get("nulls", 0):
+                missed[name] = {"types": types | set(info["types"]), "nulls": max(p.nulls, info.get("nulls", 0)),
+                                "examples": info.get("examples", [])}
+        if missed:
+            fields.update(SchemaInferer._finalize(missed)["fields"])
+            schema_guess["primary_key_candidates"] = [
+                k for k in schema_guess.get("primary_key_candidates", []) if not fields[k]["nullable"]]
+        return schema_guess
+
+    @staticmethod
+    def _collect_records(records: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
         field_info: Dict[str, Dict[str, Any]] = {}
         for rec in records:
             if not isinstance(rec, dict):
@@ -27,7 +68,28 @@ class SchemaInferer:
                     field_info[k]["nulls"] += 1
                 if len(field_info[k]["examples"]) < 3:
                     field_info[k]["examples"].append(v)
+        return field_info
 
+    @staticmethod
+    def _collect_columns(batch: RecordBatch, detect_strings: bool = False) -> Dict[str, Dict[str, Any]]:
+        field_info: Dict[str, Dict[str, Any]] = {}
+        for name, col in zip(batch.names, batch.columns):
+            if isinstance(col, array):
+                types = {"int" if col.typecode == "q" else "float"} if len(col) else set()
+                nulls = 0
+            else:
+                types = {t.__name__ for t in set(map(type, col)) if t is not type(MISSING)}
+                nulls = col.count(None)
+            if not types:
+                continue  # every value MISSING (e.g. replaced rows of a sample)
+            field_info[name] = {"types": types, "nulls": nulls, "examples": list(islice(batch.present(name), 3))}
+            if detect_strings and "str" in types and types <= {"str", "NoneType"}:
+                # every value decides, not just the first example
+                field_info[name]["string_type"] = detect_string_type(col) or "string"
+        return field_info
+
+    @staticmethod
+    def _finalize(field_info: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
         # convert sets to lists and add suggested_type / nullable
         for k, info in list(field_info.items()):
             types_set = info.get("types", set())
@@ -35,9 +97,12 @@ class SchemaInferer:
             info["types"] = types_list  # lists are BSON-serializable
 
             # determine suggested_type
-            if "int" in types_list and "float" not in types_list:
+            string_type = info.pop("string_type", None)
+            if string_type:
+                info["suggested_type"] = string_type
+            elif "int" in types_list and "float" not in types_list and "Decimal128" not in types_list:
                 info["suggested_type"] = "integer"
-            elif "float" in types_list or ("int" in types_list and "float" in types_list):
+            elif "float" in types_list or "Decimal128" in types_list:
                 info["suggested_type"] = "decimal"
             elif "str" in types_list:
                 sample = str(info["examples"][0]) if info["examples"] else ""
@@ -45,6 +110,9 @@ class SchemaInferer:
                     info["suggested_type"] = "date"
                 else:
                     info["suggested_type"] = "string"
+            elif "datetime" in types_list:
+                # native BSON dates (typed ingest)
+                info["suggested_type"] = "datetime"
             else:
                 # fallback
                 info["suggested_type"] = types_list[0] if types_list else "string"
@@ -99,4 +167,6 @@ class SchemaEvolver:
             "primary_key_candidates": new_guess.get("primary_key_candidates", []),
             "migration_notes": "; ".join(migration_notes) if migration_notes else None
         }
+        if new_guess.get("typed"):
+            evolved["typed"] = True
         return evolved, diff
@@ -0,0 +1,331 @@
+# src/search.py
+import heapq, math
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional
+from bson import ObjectId
+from pymongo import UpdateOne
+from src.config import config
+from src.loader import db
+from src.tokens import tokenize, tokenize_with_offsets
+from src.blobstore import chunk_text
+
+# Inverted index over chunk text.
+#
+# search_postings: posting-list blocks, one document per (term, source, block)
+#   {term, source_id, n, max_impact, first, last,
+#    chunks: [delta-encoded chunk ids], tf: [...], impact: [...], offsets: [[delta-encoded char offsets], ...]}
+#   A block holds up to SEARCH_BLOCK_POSTINGS postings of one term from one
+#   index_chunks call, in chunk id order. Chunk ids are ObjectIds read as 96-bit
+#   integers and stored as differences from `first` (the first is 0); ids from one
+#   insert are consecutive, so the deltas are small, and a gap too wide for an int64
+#   starts a new block. Blocks are indexed on (term, max_impact desc) and
+#   (term, source_id, max_impact desc): a query reads a term's blocks best-first and
+#   stops once no remaining block can improve its top SEARCH_CANDIDATES_PER_TERM
+#   postings ("impact-ordered" lists, without one document per posting).
+# search_terms: document frequency per term, for idf at query time.
+# etl_meta {_id: "search_chunks"}: number of indexed chunks (N for idf).
+#
+# An index written in the older one-document-per-posting layout has to be rebuilt
+# (rebuild_search_index.py).
+
+MAX_DELTA = (1 << 63) - 1
+
+def _postings():
+    return db[config.SEARCH_POSTINGS_COLLECTION]
+
+def _terms():
+    return db[config.SEARCH_TERMS_COLLECTION]
+
+def ensure_search_indexes():
+    _postings().create_index([("term", 1), ("max_impact", -1)], name="term_max_impact")
+    _postings().create_index([("term", 1), ("source_id", 1), ("max_impact", -1)], name="term_source_max_impact")
+    _postings().create_index("source_id", name="source_id")
+    _postings().create_index([("first", 1), ("last", 1)], name="chunk_range")
+    if _postings().find_one({"chunk_id": {"$exists": True}}, {"_id": 1}):
+        print("Search index warning: postings use the old per-chunk layout; run rebuild_search_index.py")
+
+try:
+    ensure_search_indexes()
+except Exception as e:
+    print("Search index setup warning:", e)
+
+def delta_encode(offsets: List[int]) -> List[int]:
+    out, prev = [], 0
+    for o in offsets:
+        out.append(o - prev)
+        prev = o
+    return out
+
+def delta_decode(deltas: List[int]) -> List[int]:
+    out, acc = [], 0
+    for d in deltas:
+        acc += d
+        out.append(acc)
+    return out
+
+def _id_int(chunk_id: Any) -> Optional[int]:
+    return int.from_bytes(chunk_id.binary, "big") if isinstance(chunk_id, ObjectId) else None
+
+def block_chunk_ids(block: Dict[str, Any]) -> List[Any]:
+    """The chunk ids of a posting-list block, in order."""
+    base = _id_int(block["first"])
+    if base is None:
+        return [block["first"]]
+    return [ObjectId((base + d).to_bytes(12, "big")) for d in delta_decode(block["chunks"])]
+
+def build_postings(source_id: str, chunk_id: Any, text: str) -> List[Dict[str, Any]]:
+    """
+    Postings for one chunk: term frequency, a length-normalized impact score
+    and up to SEARCH_MAX_OFFSETS delta-encoded offsets per term.
+    """
+    offsets: Dict[str, List[int]] = defaultdict(list)
+    tf: Dict[str, int] = defaultdict(int)
+    length = 0
+    for tok, pos in tokenize_with_offsets(text):
+        length += 1
+        tf[tok] += 1
+        if len(offsets[tok]) < config.SEARCH_MAX_OFFSETS:
+            offsets[tok].append(pos)
+    norm = math.sqrt(length) if length else 1.0
+    return [{
+        "term": t,
+        "source_id": source_id,
+        "chunk_id": chunk_id,
+        "tf": n,
+        "impact": round((1.0 + math.log(n)) / norm, 6),
+        "offsets": delta_encode(offsets[t])
+    } for t, n in tf.items()]
+
+def build_blocks(term: str, source_id: str, postings: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    Pack one term's postings (each with chunk_id, tf, impact, offsets) into
+    posting-list blocks; postings without an ObjectId chunk id get a block each.
+    """
+    keyed = sorted(postings, key=lambda p: (_id_int(p["chunk_id"]) is None, _id_int(p["chunk_id"]) or 0))
+    block: List[Dict[str, Any]] = []
+    prev = None
+
+    def emit() -> Dict[str, Any]:
+        base = _id_int(block[0]["chunk_id"])
+        ids = [_id_int(p["chunk_id"]) for p in block]
+        return {"term": term, "source_id": source_id, "n": len(block),
+                "max_impact": max(p["impact"] for p in block),
+                "first": block[0]["chunk_id"], "last": block[-1]["chunk_id"],
+                "chunks": delta_encode([i - base for i in ids]) if base is not None else [0],
+                "tf": [p["tf"] for p in block], "impact": [p["impact"] for p in block],
+                "offsets": [p["offsets"] for p in block]}
+
+    for p in keyed:
+        cur = _id_int(p["chunk_id"])
+        if block and (cur is None or prev is None or cur - prev > MAX_DELTA
+                      or len(block) >= config.SEARCH_BLOCK_POSTINGS):
+            yield emit()
+            block = []
+        block.append(p)
+        prev = cur
+    if block:
+        yield emit()
+
+def index_chunks(source_id: str, chunk_ids: List[Any], texts: List[str]):
+    """
+    Add postings for freshly stored chunks (called by the pipeline after save_chunks).
+    Each term's postings become posting-list blocks, written in unordered batches;
+    document frequencies are merged with $inc.
+    """
+    by_term: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for cid, text in zip(chunk_ids, texts):
+        for p in build_postings(source_id, cid, text or ""):
+            by_term[p["term"]].append(p)
+    batch: List[Dict[str, Any]] = []
+    for term, postings in by_term.items():
+        for block in build_blocks(term, source_id, postings):
+            batch.append(block)
+            if len(batch) >= config.SEARCH_WRITE_BATCH:
+                _postings().insert_many(batch, ordered=False)
+                batch = []
+    if batch:
+        _postings().insert_many(batch, ordered=False)
+    if by_term:
+        _terms().bulk_write([UpdateOne({"_id": t}, {"$inc": {"df": len(ps)}}, upsert=True)
+                             for t, ps in by_term.items()], ordered=False)
+    db[config.META_COLLECTION].update_one({"_id": "search_chunks"}, {"$inc": {"value": len(chunk_ids)}}, upsert=True)
+
+def _top_postings(query: Dict[str, Any], k: int) -> List[Dict[str, Any]]:
+    """
+    The k highest-impact postings matching query, reading blocks best-first and
+    stopping at the first block whose max_impact can't beat the current k-th.
+    """
+    heap: List[Any] = []
+    seq = 0
+    projection = {"_id": 0, "term": 0}
+    for b in _postings().find(query, projection).sort("max_impact", -1):
+        if len(heap) >= k and heap[0][0] >= b["max_impact"]:
+            break
+        for i, cid in enumerate(block_chunk_ids(b)):
+            item = (b["impact"][i], seq, {"chunk_id": cid, "source_id": b["source_id"],
+                                          "impact": b["impact"][i], "offsets": b["offsets"][i]})
+            seq += 1
+            if len(heap) < k:
+                heapq.heappush(heap, item)
+            elif item[0] > heap[0][0]:
+                heapq.heapreplace(heap, item)
+    return [p for _, _, p in sorted(heap, key=lambda x: (-x[0], x[1]))]
+
+def search(q: str, source_id: Optional[str] = None, page: int = 0, limit: int = 20) -> Dict[str, Any]:
+    """
+    Ranked search: sum over query terms of impact * idf, over the top
+    SEARCH_CANDIDATES_PER_TERM postings per term (read block by block via the
+    impact-ordered index).
+    """
+    terms = list(dict.fromkeys(tokenize(q)))
+    if not terms:
+        return {"q": q, "terms": [], "total_candidates": 0, "results": []}
+
+    meta = db[config.META_COLLECTION].find_one({"_id": "search_chunks"}) or {}
+    n_chunks = max(int(meta.get("value", 0)), 1)
+    dfs = {d["_id"]: d.get("df", 0) for d in _terms().find({"_id": {"$in": terms}})}
+
+    scores: Dict[Any, float] = defaultdict(float)
+    hits: Dict[Any, Dict[str, Any]] = {}
+    matched_terms: Dict[Any, int] = defaultdict(int)
+    for t in terms:
+        df = dfs.get(t, 0)
+        if not df:
+            continue
+        idf = math.log(1.0 + n_chunks / df)
+        query = {"term": t}
+        if source_id:
+            query["source_id"] = source_id
+        for p in _top_postings(query, config.SEARCH_CANDIDATES_PER_TERM):
+            cid = p["chunk_id"]
+            scores[cid] += p["impact"] * idf
+            matched_terms[cid] += 1
+            h = hits.setdefault(cid, {"source_id": p["source_id"], "chunk_id": cid, "offsets": {}})
+            h["offsets"][t] = delta_decode(p.get("offsets") or [])
+
+    # chunks matching more of the query terms rank first, then by score
+    ranked = sorted(scores, key=lambda c: (-matched_terms[c], -scores[c]))
+    page_ids = ranked[page * limit:(page + 1) * limit]
+    chunks = {c["_id"]: c for c in db[config.CHUNKS_COLLECTION].find({"_id": {"$in": page_ids}})}
+
+    results = []
+    for cid in page_ids:
+        h = hits[cid]
+        chunk = chunks.get(cid) or {}
+        text = chunk_text(chunk)
+        first = min((o[0] for o in h["offsets"].values() if o), default=0)
+        start = max(0, first - config.SEARCH_SNIPPET_CHARS // 2)
+        results.append({
+            "source_id": h["source_id"],
+            "chunk_id": str(cid),
+            "type": chunk.get("type"),
+            "score": round(scores[cid], 6),
+            "matched_terms": matched_terms[cid],
+            "offsets": h["offsets"],
+            "snippet": text[start:start + config.SEARCH_SNIPPET_CHARS]
+        })
+    return {"q": q, "terms": terms, "total_candidates": len(ranked), "page": page, "limit": limit, "results": results}
+
+def _drop_postings(blocks: Iterator[Dict[str, Any]], keep) -> Dict[str, int]:
+    """
+    Remove the postings whose chunk id fails keep(cid) from the given blocks,
+    rewriting or deleting each affected block. Returns the removed postings per term.
+    """
+    df: Dict[str, int] = defaultdict(int)
+    for b in blocks:
+        ids = block_chunk_ids(b)
+        kept = [i for i, cid in enumerate(ids) if keep(cid)]
+        if len(kept) == len(ids):
+            continue
+        df[b["term"]] += len(ids) - len(kept)
+        if not kept:
+            _postings().delete_one({"_id": b["_id"]})
+            continue
+        rest = list(build_blocks(b["term"], b["source_id"], [
+            {"chunk_id": ids[i], "tf": b["tf"][i], "impact": b["impact"][i], "offsets": b["offsets"][i]} for i in kept]))
+        _postings().replace_one({"_id": b["_id"]}, rest[0])
+        if rest[1:]:
+            _postings().insert_many(rest[1:], ordered=False)
+    return df
+
+def _apply_removal(df: Dict[str, int], n_chunks: int):
+    if df:
+        _terms().bulk_write([UpdateOne({"_id": t}, {"$inc": {"df": -n}}) for t, n in df.items()], ordered=False)
+        _terms().delete_many({"df": {"$lte": 0}})
+    db[config.META_COLLECTION].update_one({"_id": "search_chunks"}, {"$inc": {"value": -n_chunks}}, upsert=True)
+
+def remove_chunks(chunk_ids: List[Any]):
+    """
+    Drop postings of specific chunks and decrement the affected document frequencies.
+    Only blocks whose chunk id range overlaps the removed ids are read.
+    """
+    if not chunk_ids:
+        return
+    drop = set(chunk_ids)
+    ints = [i for i in map(_id_int, chunk_ids) if i is not None]
+    ranges: List[Dict[str, Any]] = [{"first": {"$in": [c for c in chunk_ids if _id_int(c) is None]}}]
+    if ints:
+        lo, hi = (ObjectId(x.to_bytes(12, "big")) for x in (min(ints), max(ints)))
+        ranges.append({"first": {"$lte": hi}, "last": {"$gte": lo}})
+    _apply_removal(_drop_postings(_postings().find({"$or": ranges}), lambda cid: cid not in drop), len(chunk_ids))
+
+def clear_index(source_id: Optional[str] = None):
+    """
+    Remove postings (for one source, or everything) and fix up document frequencies.
+    """
+    if source_id is None:
+        _postings().drop()
+        _terms().drop()
+        db[config.META_COLLECTION].delete_one({"_id": "search_chunks"})
+        return
+    df: Dict[str, int] = defaultdict(int)
+    chunks: set = set()
+    for b in _postings().find({"source_id": source_id}, {"term": 1, "n": 1, "first": 1, "chunks": 1}):
+        df[b["term"]] += b["n"]
+        chunks.update(block_chunk_ids(b))
+    _postings().delete_many({"source_id": source_id})
+    _apply_removal(df, len(chunks))
+
+def rebuild_index(source_id: Optional[str] = None) -> int:
+    """
+    Rebuild postings from the chunks collection. Returns number of chunks indexed.
+    """
+    clear_index(source_id)
+    ensure_search_indexes()
+    query = {"source_id": source_id} if source_id else {}
+    total = 0
+    ids: List[Any] = []
+    texts: List[str] = []
+    current_sid = None
+    # chunk id order within a source keeps the ids of a posting-list block close
+    for chunk in db[config.CHUNKS_COLLECTION].find(query).sort([("source_id", 1), ("_id", 1)]):
+        if current_sid is not None and chunk["source_id"] != current_sid:
+            index_chunks(current_sid, ids, texts)
+            total += len(ids)
+            ids, texts = [], []
+        current_sid = chunk["source_id"]
+        ids.append(chunk["_id"])
+        texts.append(chunk_text(chunk))
+        if len(ids) >= config.SEARCH_WRITE_BATCH:
+            index_chunks(current_sid, ids, texts)
+            total += len(ids)
+            ids, texts = [], []
+    if ids:
+        index_chunks(current_sid, ids, texts)
+        total += len(ids)
+    return total
+
+def index_size_report() -> Dict[str, Any]:
+    """Document counts plus data/index sizes (bytes) of the search collections."""
+    out = {}
+    for name in (config.SEARCH_POSTINGS_COLLECTION, config.SEARCH_TERMS_COLLECTION):
+        try:
+            st = db.command("collStats", name)
+            out[name] = {"count": st.get("count", 0), "size": st.get("size", 0),
+                         "storage_size": st.get("storageSize", 0), "index_sizes": st.get("indexSizes", {}),
+                         "total_index_size": st.get("totalIndexSize", 0)}
+        except Exception:
+            out[name] = {"count": 0, "size": 0, "storage_size": 0, "index_sizes": {}, "total_index_size": 0}
+    meta = db[config.META_COLLECTION].find_one({"_id": "search_chunks"}) or {}
+    out["indexed_chunks"] = int(meta.get("value", 0))
+    return out
@@ -0,0 +1,658 @@
+# src/snapshot.py
+import hashlib, json, operator, os, re, shutil, threading, time
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from bson import json_util
+from bson.decimal128 import Decimal128
+from src.config import config
+from src.loader import db, get_current_schema, get_data_version
+from src.query import cast_literal, compile_query
+
+try:
+    import numpy as np
+except ImportError:  # optional: snapshots are a cache, /query falls back to Mongo without them
+    np = None
+
+# Per-source columnar snapshots for analytics. A snapshot is a directory of .npy
+# column files plus meta.json, written once per (source, data_version) and read
+# back memory-mapped: loading copies nothing, and a group-by or a field summary is
+# a few numpy passes over contiguous arrays instead of a cursor scan that builds a
+# dict per document. Ingest, reprocessing and deletes bump the source's
+# data_version, so an older snapshot is never served again; it is removed when
+# the next one is built.
+#
+# Column kinds (top-level fields; a field holding documents or arrays is skipped):
+#   int, float  int64 / float64 values with "present" and "valid" masks
+#               (present & ~valid is an explicit null)
+#   datetime    epoch milliseconds as int64, same masks
+#   category    int32 codes into the field's distinct values (cats.json, written
+#               with json_util so ints, floats, bools and dates keep their type);
+#               MISSING_CODE / NULL_CODE for absent and null values
+# A field starts with the kind of its first value and becomes a category if a
+# later value doesn't fit (ints widen to float first).
+
+SKIP_FIELDS = ("_id", "_chunk_id", "_run_id", "_batch")
+MISSING_CODE, NULL_CODE = -1, -2
+_EPOCH = datetime(1970, 1, 1)
+_MS = timedelta(milliseconds=1)
+_INT64 = (-(1 << 63), (1 << 63) - 1)
+_CMP = {"gt": operator.gt, "gte": operator.ge, "lt": operator.lt, "lte": operator.le}
+
+class SnapshotError(Exception):
+    """A snapshot can't be built or read (numpy missing, source changed mid-build, ...)."""
+
+class SnapshotUnsupported(SnapshotError):
+    """The query uses something the snapshot engine doesn't evaluate; run it on Mongo."""
+
+def available() -> bool:
+    return np is not None
+
+def _require_numpy():
+    if np is None:
+        raise SnapshotError("numpy is required for columnar snapshots (pip install numpy)")
+
+def _bracket(v: Any) -> int:
+    # BSON comparison order of the value types a snapshot holds
+    if v is None:
+        return 0
+    if isinstance(v, bool):
+        return 3
+    if isinstance(v, (int, float)):
+        return 1
+    if isinstance(v, str):
+        return 2
+    return 4
+
+def _sort_key(v: Any) -> Tuple[int, Any]:
+    return (_bracket(v), 0 if v is None else v)
+
+def _to_ms(v: datetime) -> int:
+    if v.tzinfo is not None:
+        v = v.astimezone(timezone.utc).replace(tzinfo=None)
+    return (v - _EPOCH) // _MS
+
+def _from_ms(ms: int) -> datetime:
+    return _EPOCH + timedelta(milliseconds=int(ms))
+
+def _kind_of(v: Any) -> str:
+    if isinstance(v, bool) or isinstance(v, str):
+        return "category"
+    if isinstance(v, int):
+        return "int" if _INT64[0] <= v <= _INT64[1] else "float"
+    if isinstance(v, float):
+        return "float"
+    if isinstance(v, datetime):
+        return "datetime"
+    return "skip"
+
+# --- building ---------------------------------------------------------------
+
+class _ColumnBuilder:
+    """One field accumulated over the scan, in flat arrays rather than a list of objects."""
+    __slots__ = ("kind", "state", "values", "codes", "index", "cats", "fast", "push")
+
+    def __init__(self, rows: int):
+        self.kind: Optional[str] = None  # decided by the first non-null value
+        self.state = bytearray(rows)     # per row: 0 missing, 1 null (or skipped value), 2 value
+        self.values: Optional[array] = None
+        self.codes: Optional[array] = None
+        self.index: Dict[Tuple[bool, Any], int] = {}
+        self.cats: List[Any] = []
+        # the value type stored without conversion checks, and how it is stored
+        self.fast: Optional[type] = None
+        self.push = None
+
+    def _code(self, v: Any) -> int:
+        # bools are their own BSON type: True must not share a code with 1
+        key = (v.__class__ is bool, v)
+        c = self.index.get(key)
+        if c is None:
+            c = self.index[key] = len(self.cats)
+            self.cats.append(v)
+        return c
+
+    def _push_code(self, v: Any):
+        self.codes.append(self._code(v))
+
+    def _push_int(self, v: int):
+        try:
+            self.values.append(v)
+        except OverflowError:  # beyond int64: undo and take the path that widens to float
+            self.state.pop()
+            self.fast = None
+            self.add(v)
+
+    def _push_ms(self, v: datetime):
+        self.values.append(_to_ms(v))
+
+    def _settle(self, v: Any):
+        # after kind changes: storing `v`'s type again needs no checks
+        kind = self.kind
+        if kind == "category":
+            self.fast, self.push = v.__class__, self._push_code
+        elif kind == "datetime":
+            self.fast, self.push = v.__class__, self._push_ms
+        elif kind == "float":
+            self.fast, self.push = float, self.values.append
+        elif kind == "int":
+            self.fast, self.push = int, self._push_int
+        else:
+            self.fast, self.push = None, None
+
+    def _empty_codes(self) -> array:
+        return array("i", (NULL_CODE if st else MISSING_CODE for st in self.state))
+
+    def _start(self, kind: str):
+        rows = len(self.state)
+        self.kind = kind
+        if kind == "int" or kind == "datetime":
+            self.values = array("q", bytes(8 * rows))
+        elif kind == "float":
+            self.values = array("d", bytes(8 * rows))
+        elif kind == "category":
+            self.codes = self._empty_codes()
+
+    def _to_category(self):
+        if self.kind == "datetime":
+            decode = _from_ms
+        else:
+            decode = int if self.kind == "int" else float
+        codes = self._empty_codes()
+        for i, st in enumerate(self.state):
+            if st == 2:
+                codes[i] = self._code(decode(self.values[i]))
+        self.kind, self.values, self.codes = "category", None, codes
+
+    def _accept(self, kind: str):
+        if self.kind is None:
+            self._start(kind)
+        elif self.kind == kind or self.kind == "skip":
+            return
+        elif kind == "skip":
+            # a nested value makes the whole field skipped, whatever it held so far
+            self.kind, self.values, self.codes = "skip", None, None
+            self.cats, self.index = [], {}
+        elif self.kind == "category":
+            return
+        elif self.kind == "float" and kind == "int":
+            return
+        elif self.kind == "int" and kind == "float":
+            self.kind, self.values = "float", array("d", self.values)
+        else:
+            self._to_category()
+
+    def add(self, v: Any):
+        if v.__class__ is self.fast:
+            self.state.append(2)
+            self.push(v)
+            return
+        if isinstance(v, Decimal128):
+            v = float(v.to_decimal())
+        if v is None:
+            self.state.append(1)
+            if self.values is not None:
+                self.values.append(0)
+            elif self.codes is not None:
+                self.codes.append(NULL_CODE)
+            return
+        kind = self.kind
+        self._accept(_kind_of(v))
+        if self.kind != kind:
+            self._settle(v)
+        kind = self.kind
+        if kind == "skip":
+            self.state.append(1)
+            return
+        self.state.append(2)
+        if kind == "category":
+            self.codes.append(self._code(v))
+        elif kind == "datetime":
+            self.values.append(_to_ms(v))
+        elif kind == "float":
+            self.values.append(float(v))
+        else:
+            self.values.append(v)
+
+    def add_missing(self):
+        self.state.append(0)
+        if self.values is not None:
+            self.values.append(0)
+        elif self.codes is not None:
+            self.codes.append(MISSING_CODE)
+
+def _source_dir(source_id: str) -> str:
+    # readable and collision-free whatever characters the source id has
+    slug = re.sub(r"[^A-Za-z0-9_.-]", "_", source_id)[:64]
+    return os.path.join(config.SNAPSHOT_DIR, f"{slug}-{hashlib.sha1(source_id.encode('utf-8')).hexdigest()[:8]}")
+
+def write_columns(path: str, docs: Iterable[Dict[str, Any]], meta: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Columnize `docs` (one pass) into .npy files plus meta.json in directory `path`.
+    `meta` is extended with rows, columns and the skipped (nested) fields.
+    """
+    _require_numpy()
+    cols: Dict[str, _ColumnBuilder] = {}
+    rows = 0
+    for doc in docs:
+        for k, v in doc.items():
+            b = cols.get(k)
+            if b is None:
+                b = cols[k] = _ColumnBuilder(rows)
+            b.add(v)
+        rows += 1
+        if len(doc) != len(cols):
+            for b in cols.values():
+                if len(b.state) < rows:
+                    b.add_missing()
+    os.makedirs(path, exist_ok=True)
+    meta_cols, skipped = [], []
+    for j, (name, b) in enumerate(cols.items()):
+        if b.kind == "skip":
+            skipped.append(name)
+            continue
+        if b.kind is None:
+            b._start("category")  # only nulls so far
+        stem = os.path.join(path, f"c{j}")
+        state = np.frombuffer(b.state, dtype=np.uint8)
+        np.save(f"{stem}.present.npy", state > 0)
+        if b.kind == "category":
+            np.save(f"{stem}.codes.npy", np.frombuffer(b.codes, dtype=np.intc).astype(np.int32, copy=False))
+            with open(f"{stem}.cats.json", "w", encoding="utf-8") as f:
+                f.write(json_util.dumps(b.cats))
+        else:
+            np.save(f"{stem}.valid.npy", state == 2)
+            np.save(f"{stem}.values.npy", np.frombuffer(b.values, dtype=np.float64 if b.kind == "float" else np.int64))
+        meta_cols.append({"name": name, "kind": b.kind, "file": f"c{j}"})
+    meta.update({"rows": rows, "columns": meta_cols, "skipped": skipped,
+                 "built_at": datetime.utcnow().isoformat() + "Z"})
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return meta
+
+def build_snapshot(source_id: str) -> Dict[str, Any]:
+    """
+    Scan data_<source_id> once and write its columns for the current data_version.
+    Returns the snapshot's meta document (plus build seconds and size).
+    """
+    _require_numpy()
+    t0 = time.perf_counter()
+    version = get_data_version(source_id)
+    root = _source_dir(source_id)
+    final = os.path.join(root, f"v{version}")
+    tmp = f"{final}.tmp{os.getpid()}-{threading.get_ident()}"
+    coll = db[f"{config.DATA_COLLECTION_PREFIX}{source_id}"]
+    try:
+        docs = coll.find({}, {f: 0 for f in SKIP_FIELDS}, batch_size=config.SNAPSHOT_SCAN_BATCH)
+        meta = write_columns(tmp, docs, {"source_id": source_id, "data_version": version})
+        if get_data_version(source_id) != version:
+            raise SnapshotError(f"{source_id} changed while its snapshot was built; try again")
+        os.rename(tmp, final)
+    except OSError:
+        # a concurrent build of the same version got there first; theirs is identical
+        if not os.path.isdir(final):
+            raise
+        with open(os.path.join(final, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    for entry in os.listdir(root):
+        if entry != f"v{version}" and ".tmp" not in entry:
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+    meta["seconds"] = round(time.perf_counter() - t0, 4)
+    meta["bytes"] = sum(os.path.getsize(os.path.join(final, f)) for f in os.listdir(final))
+    return meta
+
+def drop_snapshots(source_id: str):
+    shutil.rmtree(_source_dir(source_id), ignore_errors=True)
+    with _lock:
+        _loaded.pop(source_id, None)
+
+# --- reading ----------------------------------------------------------------
+
+class Column:
+    """One memory-mapped column. Masks and values are read-only numpy views of the files."""
+    __slots__ = ("name", "kind", "present", "valid", "values", "codes", "cats", "_ranks")
+
+    def __init__(self, name: str, kind: str, present, valid=None, values=None, codes=None, cats=None):
+        self.name, self.kind = name, kind
+        self.present, self.valid, self.values = present, valid, values
+        self.codes, self.cats = codes, cats
+        self._ranks = None
+
+    @classmethod
+    def absent(cls, name: str, rows: int) -> "Column":
+        """A field no record has: every predicate sees it missing."""
+        return cls(name, "category", np.zeros(rows, dtype=np.bool_),
+                   codes=np.full(rows, MISSING_CODE, dtype=np.int32), cats=[])
+
+    def decode(self, v: Any) -> Any:
+        if self.kind == "datetime":
+            return _from_ms(v)
+        return int(v) if self.kind == "int" else float(v)
+
+    def _literal(self, lit: Any) -> Optional[Any]:
+        # literal in the column's value space, or None if Mongo's type brackets never match it
+        if self.kind == "datetime":
+            return _to_ms(lit) if isinstance(lit, datetime) else None
+        if isinstance(lit, (int, float)) and not isinstance(lit, bool):
+            return lit
+        return None
+
+    def _cats_where(self, fn) -> Any:
+        good = [i for i, c in enumerate(self.cats) if fn(c)]
+        return np.isin(self.codes, good) if good else np.zeros(len(self.codes), dtype=np.bool_)
+
+    def null_mask(self):
+        # {$eq: null} matches null and missing
+        return self.codes < 0 if self.kind == "category" else ~self.valid
+
+    def eq(self, lit: Any):
+        if lit is None:
+            return self.null_mask()
+        if self.kind == "category":
+            key = (lit.__class__ is bool, lit)
+            try:
+                return self._cats_where(lambda c: (c.__class__ is bool, c) == key)
+            except TypeError:
+                return np.zeros(len(self.codes), dtype=np.bool_)
+        v = self._literal(lit)
+        if v is None:
+            return np.zeros(len(self.present), dtype=np.bool_)
+        return self.valid & (self.values == v)
+
+    def compare(self, op: str, lit: Any):
+        if lit is None:
+            # $gte/$lte null behave like $eq null; $gt/$lt null match nothing
+            return self.null_mask() if op in ("gte", "lte") else np.zeros(len(self.present), dtype=np.bool_)
+        fn = _CMP[op]
+        if self.kind == "category":
+            b = _bracket(lit)
+            return self._cats_where(lambda c: _bracket(c) == b and fn(c, lit))
+        v = self._literal(lit)
+        if v is None:
+            return np.zeros(len(self.present), dtype=np.bool_)
+        return self.valid & fn(self.values, v)
+
+    def text(self, fn):
+        if self.kind != "category":
+            return np.zeros(len(self.present), dtype=np.bool_)
+        return self._cats_where(lambda c: isinstance(c, str) and fn(c))
+
+    def ranks(self):
+        # category position in BSON sort order, for $min/$max over mixed values
+        if self._ranks is None:
+            order = sorted(range(len(self.cats)), key=lambda i: _sort_key(self.cats[i]))
+            self._ranks = np.empty(len(self.cats), dtype=np.int64)
+            self._ranks[order] = np.arange(len(order))
+        return self._ranks
+
+    def numeric(self):
+        """(float/int values, ok mask) of the numbers in this column ($sum/$avg ignore the rest)."""
+        if self.kind in ("int", "float"):
+            return self.values, self.valid
+        if self.kind == "datetime":
+            return np.zeros(len(self.present)), np.zeros(len(self.present), dtype=np.bool_)
+        nums = np.array([float(c) if _bracket(c) == 1 else np.nan for c in self.cats] + [np.nan, np.nan])
+        vals = nums[self.codes]  # codes -1/-2 index the two trailing NaNs
+        return vals, ~np.isnan(vals)
+
+class Snapshot:
+    def __init__(self, path: str, meta: Dict[str, Any]):
+        self.path = path
+        self.meta = meta
+        self.rows: int = meta["rows"]
+        self.version: int = meta["data_version"]
+        self._meta_cols = {c["name"]: c for c in meta["columns"]}
+        self._cols: Dict[str, Column] = {}
+
+    def column(self, name: str) -> Column:
+        col = self._cols.get(name)
+        if col is not None:
+            return col
+        if name in self.meta["skipped"] or "." in name:
+            raise SnapshotUnsupported(f"Field {name!r} holds nested values; not in the snapshot")
+        m = self._meta_cols.get(name)
+        if m is None:
+            col = Column.absent(name, self.rows)
+        else:
+            stem = os.path.join(self.path, m["file"])
+            load = lambda suffix: np.load(f"{stem}.{suffix}.npy", mmap_mode="r")
+            if m["kind"] == "category":
+                with open(f"{stem}.cats.json", encoding="utf-8") as f:
+                    cats = json_util.loads(f.read())
+                col = Column(name, "category", load("present"), codes=load("codes"), cats=cats)
+            else:
+                col = Column(name, m["kind"], load("present"), valid=load("valid"), values=load("values"))
+        self._cols[name] = col
+        return col
+
+    # -- filtering --
+
+    def where_mask(self, where: List[Dict[str, Any]], field_info: Dict[str, Any], typed: bool):
+        """Row mask for DSL predicates, with the same literal casting as compile_predicate."""
+        mask = np.ones(self.rows, dtype=np.bool_)
+        for pred in where:
+            field, op, value = pred["field"], pred.get("op", "eq"), pred.get("value")
+            col = self.column(field)
+            stype = (field_info.get(field) or {}).get("suggested_type")
+            cast = lambda v: cast_literal(v, stype, typed)
+            if op == "eq":
+                m = col.eq(cast(value))
+            elif op == "ne":
+                m = ~col.eq(cast(value))
+            elif op in _CMP:
+                m = col.compare(op, cast(value))
+            elif op in ("in", "nin"):
+                m = np.zeros(self.rows, dtype=np.bool_)
+                for v in value:
+                    m |= col.eq(cast(v))
+                if op == "nin":
+                    m = ~m
+            elif op == "between":
+                m = col.compare("gte", cast(value[0])) & col.compare("lte", cast(value[1]))
+            elif op == "exists":
+                m = col.present if bool(value if value is not None else True) else ~col.present
+            elif op == "contains":
+                rx = re.compile(re.escape(str(value)), re.IGNORECASE)
+                m = col.text(lambda s: rx.search(s) is not None)
+            elif op == "prefix":
+                m = col.text(lambda s: s.startswith(str(value)))
+            else:
+                raise SnapshotUnsupported(f"Operator {op!r}")
+            mask &= m
+        return mask
+
+    # -- aggregation --
+
+    def _group_keys(self, names: List[str], sel) -> Tuple[Any, int, List[List[Any]]]:
+        """Per selected row a group id, the group count and per group the key values (MISSING_CODE = absent)."""
+        n = len(sel)
+        if not names:
+            return np.zeros(n, dtype=np.int64), (1 if n else 0), [[]]
+        parts, labels = [], []
+        for name in names:
+            col = self.column(name)
+            if col.kind == "category":
+                k = np.asarray(col.codes[sel], dtype=np.int64)
+                labels.append(col.cats)
+            else:
+                valid = np.asarray(col.valid[sel])
+                uniq, inv = np.unique(np.asarray(col.values[sel])[valid], return_inverse=True)
+                k = np.where(np.asarray(col.present[sel]), NULL_CODE, MISSING_CODE).astype(np.int64)
+                k[valid] = inv
+                labels.append([col.decode(u) for u in uniq])
+            parts.append(k + 2)  # -2/-1/0.. -> 0/1/2..
+        radix = [len(l) + 2 for l in labels]
+        if float(np.prod(radix, dtype=np.float64)) < 2 ** 62:
+            combined = np.zeros(n, dtype=np.int64)
+            for k, r in zip(parts, radix):
+                combined = combined * r + k
+            space = int(np.prod(radix))
+            if space <= max(n, 1 << 20):
+                # dense key space (the usual low-cardinality group-by): count instead of sorting
+                seen = np.flatnonzero(np.bincount(combined, minlength=space))
+                lookup = np.zeros(space, dtype=np.int64)
+                lookup[seen] = np.arange(len(seen))
+                uniq, gid = seen, lookup[combined]
+            else:
+                uniq, gid = np.unique(combined, return_inverse=True)
+            keys = []
+            for c in uniq.tolist():
+                codes = []
+                for r in reversed(radix):
+                    c, k = divmod(c, r)
+                    codes.append(k - 2)
+                keys.append(codes[::-1])
+        else:
+            uniq, gid = np.unique(np.stack(parts, axis=1), axis=0, return_inverse=True)
+            keys = [[k - 2 for k in row] for row in uniq.tolist()]
+        out = []
+        for codes in keys:
+            out.append([c if c < 0 else labels[i][c] for i, c in enumerate(codes)])
+        return gid.reshape(-1), len(keys), out
+
+    @staticmethod
+    def _reduce(gid, vals, ufunc):
+        """ufunc over each group's values: (group ids that had values, results)."""
+        if not len(gid):
+            return np.array([], dtype=np.int64), vals[:0]
+        order = np.argsort(gid, kind="stable")
+        g, v = gid[order], vals[order]
+        starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+        return g[starts], ufunc.reduceat(v, starts)
+
+    def aggregate(self, mask, group_by: List[str], aggregates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """group_by + aggregates with $group semantics, output shaped like compile_query's $project."""
+        sel = np.flatnonzero(mask)
+        gid, ng, keys = self._group_keys(group_by, sel)
+        if not ng:
+            return []
+        docs: List[Dict[str, Any]] = [{} for _ in range(ng)]
+        for name, key_values in zip(group_by, zip(*keys)):
+            alias = name.replace(".", "_")
+            for doc, v in zip(docs, key_values):
+                if v is not MISSING_CODE:
+                    doc[alias] = None if v is NULL_CODE else v
+        for a in aggregates or [{"op": "count", "as": "count"}]:
+            op, field = a["op"], a.get("field")
+            alias = (a.get("as") or (op if op == "count" else f"{op}_{field}")).replace(".", "_")
+            if op == "count":
+                counts = np.bincount(gid, minlength=ng)
+                for doc, c in zip(docs, counts.tolist()):
+                    doc[alias] = c
+                continue
+            col = self.column(field)
+            result: List[Any] = [None] * ng
+            if op in ("sum", "avg"):
+                vals, ok = col.numeric()
+                vals, ok = np.asarray(vals[sel]), np.asarray(ok[sel])
+                as_int = col.kind == "int" or (col.kind == "category" and
+                                               all(isinstance(c, int) for c in col.cats if _bracket(c) == 1))
+                if as_int:
+                    g, sums = self._reduce(gid[ok], vals[ok].astype(np.int64), np.add)
+                else:
+                    sums = np.bincount(gid[ok], weights=vals[ok], minlength=ng)
+                    g = np.flatnonzero(np.bincount(gid[ok], minlength=ng))
+                    sums = sums[g]
+                if op == "sum":
+                    result = [0] * ng
+                    for i, s in zip(g.tolist(), sums.tolist()):
+                        result[i] = s
+                else:
+                    n_ok = np.bincount(gid[ok], minlength=ng)
+                    for i, s in zip(g.tolist(), sums.tolist()):
+                        result[i] = s / int(n_ok[i])
+            elif op in ("min", "max"):
+                ufunc = np.minimum if op == "min" else np.maximum
+                if col.kind == "category":
+                    codes = np.asarray(col.codes[sel])
+                    ok = codes >= 0
+                    ranks = col.ranks()
+                    by_rank = sorted(col.cats, key=_sort_key)
+                    g, r = self._reduce(gid[ok], ranks[codes[ok]], ufunc)
+                    for i, rank in zip(g.tolist(), r.tolist()):
+                        result[i] = by_rank[rank]
+                else:
+                    ok = np.asarray(col.valid[sel])
+                    g, r = self._reduce(gid[ok], np.asarray(col.values[sel])[ok], ufunc)
+                    for i, v in zip(g.tolist(), r.tolist()):
+                        result[i] = col.decode(v)
+            for doc, v in zip(docs, result):
+                doc[alias] = v
+        return docs
+
+    # -- field statistics --
+
+    def field_stats(self, names: Optional[List[str]] = None, top_k: int = 10) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for name in names or list(self._meta_cols):
+            col = self.column(name)
+            present = int(np.count_nonzero(col.present))
+            st: Dict[str, Any] = {"kind": col.kind, "present": present}
+            if col.kind == "category":
+                codes = np.asarray(col.codes)
+                st["nulls"] = int(np.count_nonzero(codes == NULL_CODE))
+                counts = np.bincount(codes[codes >= 0], minlength=len(col.cats))
+                st["distinct"] = int(np.count_nonzero(counts))
+                top = np.argsort(-counts, kind="stable")[:top_k]
+                st["top"] = [{"value": col.cats[i], "count": int(counts[i])} for i in top.tolist() if counts[i]]
+            else:
+                valid = np.asarray(col.valid)
+                vals = np.asarray(col.values)[valid]
+                st["nulls"] = present - len(vals)
+                if len(vals):
+                    st["min"], st["max"] = col.decode(vals.min()), col.decode(vals.max())
+                    qs = np.quantile(vals, [0.25, 0.5, 0.75, 0.9, 0.99])
+                    if col.kind == "datetime":
+                        st["quantiles"] = {f"p{p}": _from_ms(q) for p, q in zip((25, 50, 75, 90, 99), qs.tolist())}
+                    else:
+                        st["mean"], st["std"] = float(vals.mean()), float(vals.std())
+                        st["quantiles"] = {f"p{p}": q for p, q in zip((25, 50, 75, 90, 99), qs.tolist())}
+            out[name] = st
+        return out
+
+_loaded: Dict[str, Snapshot] = {}
+_lock = threading.Lock()
+
+def load_snapshot(source_id: str) -> Optional[Snapshot]:
+    """The snapshot of the source's current data_version, or None (stale, never built, no numpy)."""
+    if np is None:
+        return None
+    version = get_data_version(source_id)
+    with _lock:
+        snap = _loaded.get(source_id)
+    if snap is not None and snap.version == version:
+        return snap
+    path = os.path.join(_source_dir(source_id), f"v{version}")
+    try:
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return None
+    snap = Snapshot(path, meta)
+    with _lock:
+        _loaded[source_id] = snap
+    return snap
+
+def snapshot_query(source_id: str, spec: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Answer a /query group_by/aggregates spec from the current snapshot; None when
+    there is no current snapshot. Raises SnapshotUnsupported for specs only Mongo
+    evaluates (plain row queries, nested fields) and ValueError for invalid specs.
+    """
+    compile_query(source_id, spec)  # same validation (and error messages) as the Mongo path
+    group_by, aggregates = spec.get("group_by") or [], spec.get("aggregates") or []
+    if not (group_by or aggregates):
+        raise SnapshotUnsupported("only group_by/aggregates queries run on snapshots")
+    snap = load_snapshot(source_id)
+    if snap is None:
+        return None
+    schema = get_current_schema(source_id) or {}
+    mask = snap.where_mask(spec.get("where") or [], schema.get("fields") or {}, bool(schema.get("typed")))
+    docs = snap.aggregate(mask, group_by, aggregates)
+    for o in reversed(spec.get("order_by") or []):
+        f = o.get("field")
+        docs.sort(key=lambda d: (-1, 0) if f not in d else _sort_key(d[f]), reverse=bool(o.get("desc")))
+    top_k = spec.get("top_k")
+    return docs[:min(int(top_k), config.QUERY_MAX_ROWS) if top_k else config.QUERY_MAX_ROWS]
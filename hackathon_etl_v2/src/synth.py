@@ -0,0 +1,163 @@
+# src/synth.py
+import json, os, random
+from typing import Callable, Dict, Iterator, List
+
+# Deterministic synthetic corpus shaped like the etl_test_files tiers:
+#   A  kv header + prose + inline JSON; markdown with fenced JSON/HTML
+#   B  YAML front matter; mixed fragments (broken JSON, HTML table, CSV)
+#   C  OCR-like catalog text with a CSV table; scraped HTML page with reviews table
+#   D  one product evolving over versions (renamed/retyped/added fields)
+# csv_export() adds a single large CSV table (no tier; benchmarks append it).
+# Output is a stream of documents, so corpora from KB to GB are generated with
+# constant memory. The same seed always yields the same bytes.
+
+COLORS = ["red", "black", "white", "blue", "green", "silver"]
+NAMES = ["Alice", "Bob", "Carol", "Dave", "Eve", "Frank", "Grace", "Heidi"]
+WORDS = ("widget device compact everyday colors price shipping warehouse stock review "
+         "battery durable premium budget portable sensor module firmware edition").split()
+
+def _sentence(rng: random.Random, n: int = 12) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+def _date(rng: random.Random, iso: bool = True) -> str:
+    y, m, d = rng.randint(2020, 2026), rng.randint(1, 12), rng.randint(1, 28)
+    return f"{y:04d}-{m:02d}-{d:02d}" if iso else f"{d:02d}/{m:02d}/{y:04d}"
+
+def tier_a_kv_json(rng: random.Random, i: int) -> str:
+    obj = {"id": f"prod-{i}", "title": f"Widget {i}", "slug": f"widget-{i}",
+           "pricing": {"price_usd": f"{rng.uniform(1, 500):.2f}", "inventory": rng.randint(0, 5000)},
+           "release_date": _date(rng)}
+    return (f"# Simple key-value + JSON + paragraph\nsource: https://example.com/product/widget-{i}\n"
+            f"scraper: simple-scraper-v{rng.randint(1, 3)}\n\n{_sentence(rng)}\n{_sentence(rng)}\n\n"
+            f"--- INLINE JSON\n{json.dumps(obj, indent=2)}\n")
+
+def tier_a_md_codejson(rng: random.Random, i: int) -> str:
+    obj = {"id": f"prod-md-{i}", "title": f"MD Widget {i}", "price": round(rng.uniform(1, 100), 2)}
+    return (f"# Product Info\n\n{_sentence(rng)}\n\n```json\n{json.dumps(obj)}\n```\n\n"
+            f"And an HTML snippet:\n\n```html\n<div><p>Price: ${obj['price']:.2f}</p></div>\n```\n")
+
+def tier_b_frontmatter(rng: random.Random, i: int) -> str:
+    tags = "\n".join(f'  - "{t}"' for t in rng.sample(WORDS, 3))
+    return (f'---\ntitle: "Widget {i} - {rng.randint(2020, 2026)}"\npublished: {_date(rng)}\n'
+            f'authors:\n  - "{rng.choice(NAMES)}"\ntags:\n{tags}\n---\n\n# Page content\n\n'
+            f"{_sentence(rng)} <span>{rng.choice(WORDS)}</span>\n")
+
+def tier_b_mixed_fragments(rng: random.Random, i: int) -> str:
+    # broken JSON: trailing comma inside, missing comma and closing brace outside
+    broken = (f'{{ "id": "prod-b-{i}", "title": "Broken JSON", "specs": {{ "color": "{rng.choice(COLORS)}", }}'
+              f'  "notes": "missing comma"  ')
+    rows = "\n".join(f"<tr><td>{rng.choice(NAMES)}</td><td>{rng.randint(1, 5)}</td></tr>"
+                     for _ in range(rng.randint(2, 8)))
+    csv_rows = "\n".join(f"{rng.choice(NAMES)},{rng.randint(1, 5)},{_date(rng, rng.random() < 0.7)}"
+                         for _ in range(rng.randint(2, 10)))
+    return (f"{broken}\n\n<table>\n<thead><tr><th>author</th><th>rating</th></tr></thead>\n<tbody>\n{rows}\n"
+            f"</tbody></table>\n\nauthor,rating,date\n{csv_rows}\n")
+
+def tier_c_ocr(rng: random.Random, i: int) -> str:
+    stock = "\n".join(f"prod-{i}-{k},Widget {k},{rng.choice(COLORS)},{rng.randint(0, 999)}"
+                      for k in range(rng.randint(1, 12)))
+    price = f"{rng.uniform(1, 99):.2f}"
+    # European decimal comma on some pages, as OCR'd catalogs mix both
+    local = price.replace(".", ",") if rng.random() < 0.3 else price
+    return (f"Page {rng.randint(1, 9)} of {rng.randint(9, 20)}\nProduct catalog - Example Corp\n"
+            f"l0cation: Warehouse {rng.randint(1, 20)}\nWidget {i} — a versatile widget.\n"
+            f"Prices shown: {price} USD, ${price}, {local}\n"
+            f"Dates: {_date(rng, False)} and {_date(rng, False)} (ambiguous)\n--- TABLE ---\n"
+            f"ProductID,Name,Color,Stock\n{stock}\n")
+
+def tier_c_html(rng: random.Random, i: int) -> str:
+    rows = "\n".join(f"      <tr><td>{rng.choice(NAMES)}</td><td>{rng.randint(1, 5)}</td>"
+                     f"<td>{_date(rng, rng.random() < 0.5)}</td></tr>" for _ in range(rng.randint(2, 20)))
+    return (f"<!doctype html>\n<html><head><title>Example scrape {i}</title></head><body>\n"
+            f"<!-- noisy comments and js -->\n<script>var config = {{id: 'prod-{i}', price: '{rng.uniform(1, 99):.2f}'}};</script>\n"
+            f'<div class="reviews">\n  <h3>Customer Reviews</h3>\n  <table>\n'
+            f"    <thead><tr><th>author</th><th>rating</th><th>date</th></tr></thead>\n    <tbody>\n{rows}\n"
+            f"    </tbody>\n  </table>\n</div>\n<footer>Contact us at (555) {rng.randint(100, 999)}-{rng.randint(1000, 9999)}.</footer>\n"
+            f"</body></html>\n")
+
+def tier_d_variant(rng: random.Random, i: int) -> str:
+    # the schema drifts as i grows, like tierD_base_v1 .. tierD_variant_v7
+    version = (i // 50) % 7 + 1
+    price = round(rng.uniform(1, 99), 2)
+    obj: Dict = {"id": f"prod-evo-{i % 97}", "title": f"Evo Widget v{version}"}
+    if version == 1:
+        obj.update({"price_usd": str(price), "views": rng.randint(0, 10000)})
+    elif version == 2:
+        obj.update({"price": price, "currency": "USD", "views": "N/A"})
+    elif version == 3:
+        obj.update({"price": str(price), "legacy_price": f"{price:.4f}", "views": "N/A"})
+    elif version == 4:
+        obj.update({"price": price, "metadata": {"imported_from": f"scraper-v{rng.randint(1, 3)}"}})
+    elif version == 5:
+        obj.update({"price": price, "dimensions": {"w_mm": rng.randint(10, 500), "h_mm": rng.randint(10, 500)}})
+    elif version == 6:
+        obj.update({"price": None, "views": rng.randint(0, 10000)})
+    else:
+        obj.update({"price": price, "currency": "USD", "tags": rng.sample(WORDS, 2)})
+    return json.dumps(obj) + "\n"
+
+TIERS: Dict[str, List[Callable[[random.Random, int], str]]] = {
+    "A": [tier_a_kv_json, tier_a_md_codejson],
+    "B": [tier_b_frontmatter, tier_b_mixed_fragments],
+    "C": [tier_c_ocr, tier_c_html],
+    "D": [tier_d_variant],
+}
+
+def iter_documents(seed: int = 0, tiers: str = "ABCD") -> Iterator[str]:
+    """Endless stream of documents drawn uniformly from the selected tiers' shapes."""
+    rng = random.Random(seed)
+    makers = [m for t in tiers.upper() for m in TIERS[t]]
+    i = 0
+    while True:
+        yield rng.choice(makers)(rng, i)
+        i += 1
+
+def iter_files(total_bytes: int, file_bytes: int, seed: int = 0, tiers: str = "ABCD") -> Iterator[str]:
+    """
+    Split a corpus of about total_bytes (UTF-8) into file texts of about file_bytes
+    each; documents within a file are separated by blank lines.
+    """
+    docs = iter_documents(seed, tiers)
+    produced = 0
+    while produced < total_bytes:
+        parts, size = [], 0
+        while size < file_bytes and produced + size < total_bytes:
+            d = next(docs)
+            parts.append(d)
+            size += len(d.encode("utf-8")) + 1
+        produced += size
+        yield "\n".join(parts)
+
+def csv_export(total_bytes: int, seed: int = 0) -> str:
+    """
+    One large plain CSV table of about total_bytes, like a spreadsheet export: a
+    single chunk far bigger than the mixed-tier documents, with no JSON in it.
+    """
+    rng = random.Random(seed)
+    rows = ["ProductID,Name,Color,Stock,Price,Updated"]
+    size = len(rows[0]) + 1
+    while size < total_bytes:
+        row = (f"prod-{len(rows)},Widget {rng.choice(WORDS)},{rng.choice(COLORS)},{rng.randint(0, 999)},"
+               f"{rng.uniform(1, 99):.2f},{_date(rng)}")
+        rows.append(row)
+        size += len(row) + 1
+    return "\n".join(rows) + "\n"
+
+def write_corpus(out_dir: str, total_bytes: int, file_bytes: int, seed: int = 0, tiers: str = "ABCD") -> List[str]:
+    """Write the corpus as synth_00000.txt, synth_00001.txt, ... and return the paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for n, text in enumerate(iter_files(total_bytes, file_bytes, seed, tiers)):
+        path = os.path.join(out_dir, f"synth_{n:05d}.txt")
+        with open(path, "w", encoding="utf-8", newline="\n") as f:
+            f.write(text)
+        paths.append(path)
+    return paths
+
+def parse_size(s: str) -> int:
+    """'512', '64KB', '10MB', '1.5GB' -> bytes."""
+    s = s.strip().upper()
+    for suffix, mult in (("GB", 1 << 30), ("MB", 1 << 20), ("KB", 1 << 10), ("B", 1)):
+        if s.endswith(suffix):
+            return int(float(s[:-len(suffix)]) * mult)
+    return int(s)
@@ -0,0 +1,129 @@
+# src/tokens.py
+import heapq, re
+from typing import Any, Dict, Iterable, List, Tuple
+
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9_\-]{1,39}")
+# matched against the original text so offsets stay valid (lower() can change lengths)
+TOKEN_RE_ANYCASE = re.compile(TOKEN_RE.pattern, re.IGNORECASE)
+
+# very common English words that would otherwise dominate every source
+STOPWORDS = {
+    "the", "and", "for", "are", "but", "not", "you", "all", "any", "can", "her", "was", "one",
+    "our", "out", "has", "have", "had", "his", "him", "its", "into", "with", "this", "that",
+    "from", "they", "will", "would", "there", "their", "what", "when", "which", "who", "been",
+    "were", "than", "then", "them", "these", "those", "some", "such", "also", "only", "over",
+}
+
+def tokenize(text: str) -> Iterable[str]:
+    for m in TOKEN_RE.finditer(text.lower()):
+        tok = m.group(0)
+        if tok not in STOPWORDS:
+            yield tok
+
+def tokenize_with_offsets(text: str) -> Iterable[Tuple[str, int]]:
+    """Like tokenize, but yields (token, character offset) pairs."""
+    for m in TOKEN_RE_ANYCASE.finditer(text):
+        tok = m.group(0).lower()
+        if tok not in STOPWORDS:
+            yield tok, m.start()
+
+class SpaceSaving:
+    """
+    Space-Saving heavy-hitters sketch (Metwally et al.).
+    Tracks at most `capacity` items; when full, a new item replaces the current
+    minimum and inherits its count (recorded as that item's error bound).
+    Any item with true frequency > N / capacity is guaranteed to be tracked,
+    and memory is independent of vocabulary size.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        # lazy min-heap of (count, item); entries go stale when counts change
+        self._heap: List[Tuple[int, str]] = []
+        self.total = 0
+
+    def _pop_min(self) -> Tuple[str, int]:
+        while True:
+            count, item = heapq.heappop(self._heap)
+            if self.counts.get(item) == count:
+                return item, count
+
+    def _compact(self):
+        # drop stale heap entries once they clearly outnumber live ones
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(c, i) for i, c in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def add(self, item: str, n: int = 1):
+        self.total += n
+        if item in self.counts:
+            self.counts[item] += n
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = n
+            self.errors[item] = 0
+        else:
+            victim, floor = self._pop_min()
+            del self.counts[victim]
+            del self.errors[victim]
+            self.counts[item] = floor + n
+            self.errors[item] = floor
+        heapq.heappush(self._heap, (self.counts[item], item))
+        self._compact()
+
+    def top(self, k: int = None) -> List[Tuple[str, int, int]]:
+        """[(item, estimated_count, max_overestimate), ...] by descending count."""
+        items = sorted(self.counts.items(), key=lambda x: (-x[1], x[0]))
+        if k is not None:
+            items = items[:k]
+        return [(i, c, self.errors[i]) for i, c in items]
+
+class TokenIndexer:
+    """
+    Pipeline stage that streams chunk text and record string values through a
+    Space-Saving sketch. Counts are later merged into visual_tokens_<source_id>.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self.sketch = SpaceSaving(capacity)
+
+    def add_text(self, text: str):
+        for tok in tokenize(text):
+            self.sketch.add(tok)
+
+    def add_value(self, value: Any):
+        if isinstance(value, str):
+            self.add_text(value)
+        elif isinstance(value, dict):
+            for v in value.values():
+                self.add_value(v)
+        elif isinstance(value, (list, tuple)):
+            for v in value:
+                self.add_value(v)
+
+    def add_record(self, record: Dict[str, Any]):
+        for k, v in record.items():
+            # internal bookkeeping fields (_raw, _chunk_type, ...) are not record content
+            if isinstance(k, str) and k.startswith("_"):
+                continue
+            self.add_value(v)
+
+    def top(self, k: int = None) -> List[Tuple[str, int]]:
+        return [(tok, count) for tok, count, _ in self.sketch.top(k)]
+
+    def to_state(self) -> Dict[str, Any]:
+        # for run checkpoints: the sketch's items with counts and error bounds
+        return {"capacity": self.sketch.capacity, "total": self.sketch.total,
+                "items": [[i, c, e] for i, c, e in self.sketch.top()]}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "TokenIndexer":
+        ti = cls(state["capacity"])
+        ss = ti.sketch
+        for item, count, err in state["items"]:
+            ss.counts[item], ss.errors[item] = count, err
+        ss._heap = [(c, i) for i, c in ss.counts.items()]
+        heapq.heapify(ss._heap)
+        ss.total = state["total"]
+        return ti
@@ -0,0 +1,207 @@
+# src/tolerant_json.py
+import json, re, time
+from typing import Any, List, Tuple
+from src.config import config
+
+# Forgiving JSON reader used when json.loads rejects a chunk.
+#
+# Single-pass recursive descent (linear in the input) that accepts the usual
+# hand-written / truncated JSON mistakes and records each one it had to fix:
+#   trailing_comma      {"a": 1,}
+#   missing_comma       {"a": 1 "b": 2}
+#   single_quotes       {'a': 'x'}
+#   unquoted_key        {a: 1}
+#   python_literal      True / False / None
+#   unclosed_object     {"a": 1          (input ends before the closer)
+#   unclosed_array      [1, 2
+#   unterminated_string "abc
+#   multiple_values     {"a": 1} {"a": 2}  (returned as a list)
+# Input size, nesting depth and wall time are bounded (config.TOLERANT_JSON_*).
+
+class TolerantJSONError(ValueError):
+    pass
+
+NUMBER_RE = re.compile(r"-?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+BARE_KEY_RE = re.compile(r"[A-Za-z_$][\w$\-]*")
+LITERALS = {"true": (True, None), "false": (False, None), "null": (None, None),
+            "True": (True, "python_literal"), "False": (False, "python_literal"),
+            "None": (None, "python_literal")}
+ESCAPES = {'"': '"', "'": "'", "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+WS = " \t\r\n"
+
+class _Parser:
+    def __init__(self, text: str, deadline: float):
+        self.s = text
+        self.n = len(text)
+        self.i = 0
+        self.fixes: List[str] = []
+        self.deadline = deadline
+        self.steps = 0
+
+    def fix(self, what: str):
+        if what not in self.fixes:
+            self.fixes.append(what)
+
+    def tick(self):
+        # checking the clock on every value would dominate small inputs
+        self.steps += 1
+        if self.steps & 255 == 0 and time.perf_counter() > self.deadline:
+            raise TolerantJSONError("time budget exceeded")
+
+    def ws(self):
+        while self.i < self.n and self.s[self.i] in WS:
+            self.i += 1
+
+    def peek(self) -> str:
+        self.ws()
+        return self.s[self.i] if self.i < self.n else ""
+
+    def value(self, depth: int) -> Any:
+        self.tick()
+        if depth > config.TOLERANT_JSON_MAX_DEPTH:
+            raise TolerantJSONError("nesting too deep")
+        ch = self.peek()
+        if ch == "{":
+            return self.obj(depth)
+        if ch == "[":
+            return self.arr(depth)
+        if ch in "\"'":
+            return self.string()
+        m = NUMBER_RE.match(self.s, self.i)
+        if m:
+            self.i = m.end()
+            txt = m.group(0)
+            return int(txt) if txt.lstrip("-").isdigit() else float(txt)
+        m = BARE_KEY_RE.match(self.s, self.i)
+        if m and m.group(0) in LITERALS:
+            self.i = m.end()
+            val, fix = LITERALS[m.group(0)]
+            if fix:
+                self.fix(fix)
+            return val
+        raise TolerantJSONError(f"unexpected {ch!r} at {self.i}" if ch else "unexpected end of input")
+
+    def string(self) -> str:
+        quote = self.s[self.i]
+        if quote == "'":
+            self.fix("single_quotes")
+        self.i += 1
+        out = []
+        start = self.i
+        while self.i < self.n:
+            ch = self.s[self.i]
+            if ch == quote:
+                out.append(self.s[start:self.i])
+                self.i += 1
+                return "".join(out)
+            if ch == "\\" and self.i + 1 < self.n:
+                out.append(self.s[start:self.i])
+                esc = self.s[self.i + 1]
+                if esc == "u" and self.i + 6 <= self.n:
+                    try:
+                        out.append(chr(int(self.s[self.i + 2:self.i + 6], 16)))
+                        self.i += 6
+                    except ValueError:
+                        out.append(esc)
+                        self.i += 2
+                else:
+                    out.append(ESCAPES.get(esc, esc))
+                    self.i += 2
+                start = self.i
+                continue
+            self.i += 1
+        out.append(self.s[start:self.i])
+        self.fix("unterminated_string")
+        return "".join(out)
+
+    def key(self) -> str:
+        ch = self.peek()
+        if ch in "\"'":
+            return self.string()
+        m = BARE_KEY_RE.match(self.s, self.i)
+        if not m:
+            raise TolerantJSONError(f"expected key at {self.i}")
+        self.fix("unquoted_key")
+        self.i = m.end()
+        return m.group(0)
+
+    def obj(self, depth: int) -> dict:
+        self.i += 1
+        out = {}
+        while True:
+            ch = self.peek()
+            if ch == "}":
+                self.i += 1
+                return out
+            if ch == "":
+                self.fix("unclosed_object")
+                return out
+            if ch == ",":
+                # leading/doubled comma
+                self.i += 1
+                self.fix("trailing_comma")
+                continue
+            k = self.key()
+            if self.peek() != ":":
+                raise TolerantJSONError(f"expected ':' at {self.i}")
+            self.i += 1
+            if self.peek() == "":
+                self.fix("unclosed_object")
+                out[k] = None
+                return out
+            out[k] = self.value(depth + 1)
+            ch = self.peek()
+            if ch == ",":
+                self.i += 1
+                if self.peek() == "}":
+                    self.fix("trailing_comma")
+            elif ch not in ("}", ""):
+                self.fix("missing_comma")
+
+    def arr(self, depth: int) -> list:
+        self.i += 1
+        out = []
+        while True:
+            ch = self.peek()
+            if ch == "]":
+                self.i += 1
+                return out
+            if ch == "":
+                self.fix("unclosed_array")
+                return out
+            if ch == ",":
+                self.i += 1
+                self.fix("trailing_comma")
+                continue
+            out.append(self.value(depth + 1))
+            ch = self.peek()
+            if ch == ",":
+                self.i += 1
+                if self.peek() == "]":
+                    self.fix("trailing_comma")
+            elif ch not in ("]", ""):
+                self.fix("missing_comma")
+
+def loads_tolerant(text: str) -> Tuple[Any, List[str]]:
+    """
+    Parse text as JSON, repairing common mistakes. Returns (value, fixes); fixes is
+    empty when the input was valid JSON. Raises TolerantJSONError when the text
+    can't be repaired or exceeds the size/depth/time budget.
+    """
+    try:
+        return json.loads(text), []
+    except ValueError:
+        pass
+    if len(text) > config.TOLERANT_JSON_MAX_CHARS:
+        raise TolerantJSONError("input too large for repair")
+
+    p = _Parser(text, time.perf_counter() + config.TOLERANT_JSON_MAX_MS / 1000.0)
+    values = [p.value(0)]
+    while p.peek():
+        if p.peek() not in "{[":
+            raise TolerantJSONError(f"trailing data at {p.i}")
+        values.append(p.value(0))
+    if len(values) > 1:
+        p.fix("multiple_values")
+        return values, p.fixes
+    return values[0], p.fixes
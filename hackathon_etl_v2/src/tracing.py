@@ -0,0 +1,216 @@
+# src/tracing.py
+import cProfile, io, os, pstats, socket, sys, time, uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from src.config import config
+from src.loader import db
+
+try:
+    import resource  # not available on Windows
+except ImportError:
+    resource = None
+
+# Per-run instrumentation for run_pipeline. A RunTrace accumulates wall time per
+# stage (extract, detect, parse, infer, ...) and per chunk type, plus bytes in,
+# records out and peak memory, and is stored as one document per run in
+# config.PIPELINE_RUNS_COLLECTION. Spans are plain perf_counter pairs, so the
+# tracing itself stays cheap enough to be always on. With profile=True the run
+# is also captured with cProfile; the .pstats dump goes to config.PROFILE_DIR
+# and the top functions are stored on the run document.
+#
+# The same document carries the run's checkpoint (see run_pipeline): it is
+# created with status "running" when the run starts and updated after every
+# committed batch, so a failed run can be resumed or rolled back (src/runs.py).
+# A running run holds a lease: its owner (host:pid) renews heartbeat_at at every
+# checkpoint and every RUN_HEARTBEAT_SECONDS while parsing, and another process
+# may only take the run over once the lease has lapsed or the owner is gone.
+
+def run_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _rss_mb() -> Optional[float]:
+    """Current resident set size, where /proc exposes it (Linux)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+def _process_peak_rss_mb() -> Optional[float]:
+    """Peak RSS over the whole process lifetime (ru_maxrss), not just this run."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+class RunTrace:
+    def __init__(self, source_id: str, file_path: str, profile: bool = False, run_id: str = None):
+        self.resumed = run_id is not None
+        self.run_id = run_id or uuid.uuid4().hex
+        self.source_id = source_id
+        self.file_path = file_path
+        self.stages: Dict[str, float] = {}
+        self.chunk_types: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {"bytes_in": 0, "chunks": 0, "records_out": 0}
+        self.started_at = datetime.utcnow()
+        self._t0 = time.perf_counter()
+        self._beat = time.monotonic()
+        # peak of the RSS samples taken at span ends, checkpoints, heartbeats and finish;
+        # ru_maxrss can't give a per-run peak in a long-lived API or bulk process
+        self._peak_rss: Optional[float] = None
+        self.sample_rss()
+        self._profiler = cProfile.Profile() if profile else None
+        self._tracemalloc = False
+        if self._profiler:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._tracemalloc = True
+            self._profiler.enable()
+
+    @contextmanager
+    def span(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - t0
+            self.sample_rss()
+
+    def sample_rss(self):
+        rss = _rss_mb()
+        if rss is not None and (self._peak_rss is None or rss > self._peak_rss):
+            self._peak_rss = rss
+
+    def start(self, **fields):
+        """Create (or, when resuming, reopen) the run document with status "running"."""
+        now = datetime.utcnow().isoformat() + "Z"
+        update: Dict[str, Any] = {
+            "$set": {"source_id": self.source_id, "file": os.path.basename(self.file_path),
+                     "file_path": os.path.abspath(self.file_path), "status": "running", "error": None,
+                     "owner": run_owner(), "heartbeat_at": now, **fields},
+            "$setOnInsert": {"started_at": now},
+        }
+        if self.resumed:
+            update["$set"]["resumed_at"] = now
+            update["$inc"] = {"resumes": 1}
+        _runs().update_one({"run_id": self.run_id}, update, upsert=True)
+        self._beat = time.monotonic()
+
+    def checkpoint(self, state: Dict[str, Any]):
+        """Persist progress after a committed batch; state replaces the previous checkpoint."""
+        now = datetime.utcnow().isoformat() + "Z"
+        _runs().update_one({"run_id": self.run_id},
+                           {"$set": {"checkpoint": state, "checkpoint_at": now, "heartbeat_at": now}})
+        self._beat = time.monotonic()
+        self.sample_rss()
+
+    def heartbeat(self):
+        """Renew the run's lease if RUN_HEARTBEAT_SECONDS have passed; cheap enough to call per chunk."""
+        if time.monotonic() - self._beat < config.RUN_HEARTBEAT_SECONDS:
+            return
+        self._beat = time.monotonic()
+        _runs().update_one({"run_id": self.run_id}, {"$set": {"heartbeat_at": datetime.utcnow().isoformat() + "Z"}})
+        self.sample_rss()
+
+    def add_chunk(self, ctype: str, seconds: float, records: int):
+        ct = self.chunk_types.setdefault(ctype, {"count": 0, "seconds": 0.0, "records": 0})
+        ct["count"] += 1
+        ct["seconds"] += seconds
+        ct["records"] += records
+
+    def finish(self, status: str = "ok", error: str = None, **extra) -> Dict[str, Any]:
+        """Stop timing (and profiling), store the run document and return it."""
+        seconds = time.perf_counter() - self._t0
+        self.sample_rss()
+        doc: Dict[str, Any] = {
+            "run_id": self.run_id,
+            "source_id": self.source_id,
+            "file": os.path.basename(self.file_path),
+            "status": status,
+            "error": error,
+            "seconds": round(seconds, 4),
+            "stages": {k: round(v, 4) for k, v in self.stages.items()},
+            "chunk_types": {k: {**v, "seconds": round(v["seconds"], 4)} for k, v in self.chunk_types.items()},
+            **self.counters,
+            # sampled peak during this run (None without /proc); process_peak_rss_mb is
+            # the whole process's high-water mark, which earlier runs may have set
+            "peak_rss_mb": round(self._peak_rss, 1) if self._peak_rss is not None else None,
+            "process_peak_rss_mb": _process_peak_rss_mb(),
+            **extra,
+        }
+        if self._profiler:
+            self._profiler.disable()
+            doc.update(self._dump_profile())
+        if not self.resumed:
+            doc["started_at"] = self.started_at.isoformat() + "Z"
+        # a finished run's checkpoint state is no longer needed for resume
+        save_run(doc, unset=["checkpoint.state"] if status == "ok" else None)
+        return doc
+
+    def _dump_profile(self) -> Dict[str, Any]:
+        import tracemalloc
+        out: Dict[str, Any] = {}
+        if tracemalloc.is_tracing():
+            out["peak_traced_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+            if self._tracemalloc:
+                tracemalloc.stop()
+        os.makedirs(config.PROFILE_DIR, exist_ok=True)
+        path = os.path.join(config.PROFILE_DIR, f"{self.run_id}.pstats")
+        self._profiler.dump_stats(path)
+        buf = io.StringIO()
+        pstats.Stats(self._profiler, stream=buf).sort_stats("cumulative").print_stats(config.PROFILE_TOP_N)
+        out["profile_path"] = path
+        out["profile_top"] = buf.getvalue()
+        return out
+
+def _runs():
+    return db[config.PIPELINE_RUNS_COLLECTION]
+
+def save_run(doc: Dict[str, Any], unset: List[str] = None):
+    update: Dict[str, Any] = {"$set": dict(doc)}
+    if unset:
+        update["$unset"] = {k: "" for k in unset}
+    try:
+        _runs().update_one({"run_id": doc["run_id"]}, update, upsert=True)
+    except Exception as e:
+        # instrumentation must never fail an ingest
+        print("Run trace not saved:", e)
+
+def get_run(run_id: str, with_state: bool = False) -> Optional[Dict[str, Any]]:
+    # the checkpoint's sketch state is bulky; callers other than resume don't need it
+    projection = {"_id": 0} if with_state else {"_id": 0, "checkpoint.state": 0}
+    return _runs().find_one({"run_id": run_id}, projection)
+
+def slowest_runs(limit: int = 20, source_id: str = None, recent: int = None) -> List[Dict[str, Any]]:
+    """The `limit` slowest of the `recent` latest runs (optionally for one source)."""
+    query = {"source_id": source_id} if source_id else {}
+    recent = recent or config.RUNS_RECENT_WINDOW
+    docs = list(_runs().find(query, {"_id": 0, "profile_top": 0, "checkpoint": 0}).sort("started_at", -1).limit(recent))
+    docs.sort(key=lambda d: d.get("seconds", 0), reverse=True)
+    return docs[:limit]
+
+def stage_breakdown(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Total and mean seconds per stage and per chunk type, with each stage's share of run time."""
+    total = sum(r.get("seconds", 0) for r in runs) or 1e-9
+    stages: Dict[str, float] = {}
+    chunk_types: Dict[str, Dict[str, float]] = {}
+    for r in runs:
+        for k, v in r.get("stages", {}).items():
+            stages[k] = stages.get(k, 0.0) + v
+        for k, v in r.get("chunk_types", {}).items():
+            ct = chunk_types.setdefault(k, {"count": 0, "seconds": 0.0, "records": 0})
+            for f in ct:
+                ct[f] += v.get(f, 0)
+    n = max(len(runs), 1)
+    return {
+        "runs": len(runs),
+        "seconds": round(total, 4) if runs else 0,
+        "stages": {k: {"total_s": round(v, 4), "mean_s": round(v / n, 4), "share": round(v / total, 3)}
+                   for k, v in sorted(stages.items(), key=lambda kv: -kv[1])},
+        "chunk_types": {k: {**v, "seconds": round(v["seconds"], 4)}
+                        for k, v in sorted(chunk_types.items(), key=lambda kv: -kv[1]["seconds"])},
+    }
@@ -0,0 +1,63 @@
+# stress_schema_versions.py
+# Stress test for concurrent schema commits on a single source.
+# Starts N worker threads that each commit M schema versions for the same source_id,
+# then checks that versions 1..N*M exist exactly once and that the evolution log
+# has exactly one contiguous from->to entry per transition.
+#
+# Usage (from hackathon_etl_v2 with venv active and Mongo running):
+#   python stress_schema_versions.py [workers] [commits_per_worker]
+import sys, time, uuid
+from concurrent.futures import ThreadPoolExecutor
+from src.config import config
+from src.loader import db
+from src.pipeline import commit_schema
+
+def worker(source_id: str, worker_no: int, commits: int):
+    versions = []
+    for i in range(commits):
+        guess = {
+            "fields": {f"w{worker_no}_f{i}": {"types": ["str"], "nulls": 0, "examples": ["x"],
+                                              "suggested_type": "string", "nullable": False}},
+            "primary_key_candidates": []
+        }
+        versions.append(commit_schema(source_id, guess)["version"])
+    return versions
+
+def main(workers: int, commits: int):
+    source_id = f"stress_{uuid.uuid4().hex[:8]}"
+    expected = workers * commits
+    print(f"Stress: {workers} workers x {commits} commits on {source_id}")
+
+    t0 = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda n: worker(source_id, n, commits), range(workers)))
+    elapsed = time.time() - t0
+
+    claimed = sorted(v for r in results for v in r)
+    stored = sorted(d["version"] for d in db[config.SCHEMA_REGISTRY_COLLECTION].find({"source_id": source_id}, {"version": 1}))
+    logs = list(db[config.SCHEMA_EVOLUTION_LOG_COLLECTION].find({"source_id": source_id}))
+    transitions = sorted((l["from_version"], l["to_version"]) for l in logs)
+
+    failures = []
+    if claimed != list(range(1, expected + 1)):
+        failures.append(f"claimed versions not unique/contiguous: {claimed}")
+    if stored != list(range(1, expected + 1)):
+        failures.append(f"stored versions not unique/contiguous: {stored}")
+    if transitions != [(v, v + 1) for v in range(1, expected)]:
+        failures.append(f"evolution log inconsistent: {transitions}")
+
+    # cleanup
+    db[config.SCHEMA_REGISTRY_COLLECTION].delete_many({"source_id": source_id})
+    db[config.SCHEMA_EVOLUTION_LOG_COLLECTION].delete_many({"source_id": source_id})
+
+    print(f"Committed {len(claimed)} versions in {elapsed:.2f}s ({len(claimed) / max(elapsed, 1e-9):.1f}/s)")
+    if failures:
+        for f in failures:
+            print("  FAIL:", f)
+        sys.exit(1)
+    print("  OK: no versions lost or duplicated")
+
+if __name__ == "__main__":
+    n_workers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    n_commits = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    main(n_workers, n_commits)
@@ -0,0 +1,20 @@
+# tests/conftest.py
+# Tests run against the in-memory Mongo stand-in (pip install pytest mongomock),
+# from hackathon_etl_v2:  python -m pytest tests
+# Every test starts from an empty database and scratch data directories.
+import os, sys
+os.environ.setdefault("ETL_MONGO_URI", "mongomock://")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from src.config import config
+from src.loader import db, ensure_indexes
+
+@pytest.fixture(autouse=True)
+def fresh_store(tmp_path, monkeypatch):
+    for name in db.list_collection_names():
+        db.drop_collection(name)
+    ensure_indexes()
+    for attr in ("BLOB_STORE_DIR", "PROFILE_DIR", "SNAPSHOT_DIR"):
+        monkeypatch.setattr(config, attr, str(tmp_path / attr.lower()))
+    yield tmp_path
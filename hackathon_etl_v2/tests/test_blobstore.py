@@ -0,0 +1,29 @@
+# tests/test_blobstore.py
+import os, threading
+from src import blobstore
+
+def test_concurrent_writers_of_one_blob(monkeypatch):
+    text = "".join(f"line {i} of a shared upload\n" for i in range(20000))
+    monkeypatch.setattr(blobstore.config, "BLOB_BLOCK_CHARS", 4096)
+    start = threading.Barrier(8)
+    errors = []
+
+    def put():
+        start.wait()
+        try:
+            blobstore.put_text(text)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=put) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    blob_id = blobstore.blob_id_for(text)
+    blobstore._header.cache_clear()
+    blobstore._block.cache_clear()
+    assert blobstore.read_text(blob_id) == text
+    # no temp files left behind
+    assert os.listdir(os.path.dirname(blobstore.blob_path(blob_id))) == [f"{blob_id}.blob"]
@@ -0,0 +1,79 @@
+# tests/test_casting.py
+from array import array
+from datetime import datetime
+from bson.decimal128 import Decimal128
+from src import casting, pipeline
+from src.batch import RecordBatch
+from src.config import config
+from src.loader import db
+
+def test_detect_string_type():
+    detect = casting.detect_string_type
+    assert detect(["1", "-2", "+3"]) == "integer"
+    assert detect(["1", "2.5", "1e3", ".5"]) == "decimal"
+    assert detect(["2024-01-31", "2024-02-01T10:00:00Z"]) == "date"
+    # leading zeros (zip codes, ids) stay strings
+    assert detect(["007", "02134", "10001"]) is None
+    # int64 overflow makes the column decimal, not integer
+    assert detect(["1", str(1 << 63)]) == "decimal"
+    # one outlier is tolerated from four values up, not below
+    assert detect(["1", "2", "3", "n/a"]) == "integer"
+    assert detect(["1", "2", "n/a"]) is None
+    # blanks and non-strings don't count either way
+    assert detect(["", "  ", 4.5, None, "12"]) == "integer"
+    assert detect([1, 2, None]) is None
+
+def test_fast_path_packs_arrays():
+    col, failed = casting.cast_column(["1", "-2", "30"], "integer")
+    assert isinstance(col, array) and col.typecode == "q" and list(col) == [1, -2, 30] and not failed
+    col, _ = casting.cast_column(["1.5", "2"], "decimal")
+    assert isinstance(col, array) and col.typecode == "d"
+    # already typed columns are passed through untouched
+    assert casting.cast_column(col, "integer") == (col, {})
+
+def test_failures_keep_their_originals():
+    col, failed = casting.cast_column(["1", str(1 << 63), "n/a", "", "  ", 7, None], "integer")
+    assert col == [1, None, None, None, None, 7, None]
+    assert failed == {1: str(1 << 63), 2: "n/a"}
+    # a valid-looking but impossible date falls off the fast path for one value only
+    col, failed = casting.cast_column(["2024-02-29", "2024-02-30"], "date")
+    assert col == [datetime(2024, 2, 29), None] and failed == {1: "2024-02-30"}
+
+def test_dates_are_stored_as_utc():
+    col, _ = casting.cast_column(["2024-03-01T12:00:00+02:00", "2024-03-01T12:00:00Z", "2024-03-01 12:00"], "datetime")
+    assert col == [datetime(2024, 3, 1, 10), datetime(2024, 3, 1, 12), datetime(2024, 3, 1, 12)]
+    assert all(d.tzinfo is None for d in col)
+
+def test_decimal128_mode(monkeypatch):
+    monkeypatch.setattr(config, "TYPED_DECIMAL", "decimal128")
+    col, failed = casting.cast_column(["0.1", "2e-3"], "decimal")
+    assert col == [Decimal128("0.1"), Decimal128("2e-3")] and not failed
+
+def test_plan_prefers_the_stored_schema():
+    guess = {"qty": {"suggested_type": "integer"}, "code": {"suggested_type": "integer"},
+             "note": {"suggested_type": "string"}, "_raw": {"suggested_type": "integer"}}
+    known = {"qty": {"suggested_type": "decimal"}, "code": {"suggested_type": "string"}}
+    plan = casting.plan_casts(["qty", "code", "note", "_raw", None], guess, known)
+    # a non-castable stored type falls back to the guess; internal and non-string names never cast
+    assert plan == {"qty": "decimal", "code": "integer", "note": None, "_raw": None, None: None}
+
+def test_cast_batch_adds_orig_only_where_needed():
+    batch = RecordBatch.from_records([{"qty": "1", "d": "2024-01-01"}, {"qty": "x"}, {"qty": "3", "d": "soon"}])
+    failures = casting.cast_batch(batch, {"qty": "integer", "d": "date"})
+    assert failures == {"qty": 1, "d": 1}
+    rows = [r.to_dict() for r in batch]
+    assert rows[0] == {"qty": 1, "d": datetime(2024, 1, 1)}
+    assert rows[1] == {"qty": None, casting.ORIG_FIELD: {"qty": "x"}}
+    assert rows[2] == {"qty": 3, "d": None, casting.ORIG_FIELD: {"d": "soon"}}
+
+def test_cast_target_holds_for_the_whole_run(tmp_path):
+    path = tmp_path / "in.txt"
+    # the second chunk alone would not look numeric; it must not switch qty back to strings
+    path.write_text("sku,qty,when\nA,1,2024-01-01\nB,2,2024-01-02\n\n\nsku,qty,when\nC,none,later\nD,4,2024-01-04\n")
+    res = pipeline.run_pipeline(str(path), "s", typed=True)
+    assert res["records"] == 4
+    docs = {d["sku"]: d for d in db[f"{config.DATA_COLLECTION_PREFIX}s"].find()}
+    assert docs["A"]["qty"] == 1 and docs["D"]["qty"] == 4 and docs["D"]["when"] == datetime(2024, 1, 4)
+    assert docs["C"]["qty"] is None and docs["C"]["when"] is None
+    assert docs["C"][casting.ORIG_FIELD] == {"qty": "none", "when": "later"}
+    assert casting.ORIG_FIELD not in docs["A"]
@@ -0,0 +1,24 @@
+# tests/test_chunk_parser.py
+import os
+from src.chunk_parser import parse_chunk, parse_chunk_budgeted
+from src.extractor import detect_chunks_budgeted
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "etl_test_files")
+
+def _parsed(text):
+    return [(c["type"], rec) for c in detect_chunks_budgeted(text) for rec in parse_chunk_budgeted(c).iter_dicts()]
+
+def test_broken_json_fragment_is_not_split_into_garbage_keys():
+    with open(os.path.join(FIXTURES, "tierB_mixed_fragments.txt"), encoding="utf-8") as f:
+        parsed = _parsed(f.read())
+    for ctype, rec in parsed:
+        assert not any(str(k).lstrip().startswith(("{", "[")) for k in rec), (ctype, rec)
+        assert not str(rec.get("_raw", "")).lstrip().startswith("{"), (ctype, rec)
+    repaired = [rec for _, rec in parsed if rec.get("id") == "prod-b-1"]
+    assert repaired and all(rec["specs"] == {"color": "red"} for rec in repaired)
+    assert {"author": "Alice", "rating": "5"} in [rec for _, rec in parsed]
+
+def test_json_blocks_inside_kv_keep_the_kv_lines():
+    recs = parse_chunk({"type": "kv", "content": '{"id": 1, "name": "a",\n\ncolor: red\nsize: 2'})
+    assert {"id": 1, "name": "a", "_repairs": ["unclosed_object"]} in recs
+    assert {"color": "red", "size": "2"} in recs
@@ -0,0 +1,33 @@
+# tests/test_export_import.py
+from src.exporter import export_to_file, import_file
+from src.loader import db, get_data_version, get_source_stats
+from src.pipeline import commit_schema
+
+def _seed(n=25):
+    db["data_src"].insert_many([{"id": i, "name": f"n{i}", "tags": ["a", "b"]} for i in range(n)])
+    # CSV columns follow the source's schema
+    commit_schema("src", {"fields": {f: {"suggested_type": "string", "nullable": False} for f in ("id", "name", "tags")}})
+
+def test_ndjson_roundtrip_updates_stats(tmp_path):
+    _seed()
+    out = str(tmp_path / "src.ndjson.gz")
+    export_to_file("src", out, "ndjson")
+    before = get_data_version("dst"), get_data_version()
+    stats = import_file(out, "dst", batch_size=10)
+    assert stats["inserted"] == 25 and stats["duplicates"] == 0
+    assert get_source_stats("dst")[0]["record_count"] == 25
+    assert get_data_version("dst") > before[0] and get_data_version() > before[1]
+    # importing again only finds duplicates, and the count stays right
+    assert import_file(out, "dst")["duplicates"] == 25
+    assert get_source_stats("dst")[0]["record_count"] == 25
+
+def test_csv_roundtrip(tmp_path):
+    _seed(5)
+    out = str(tmp_path / "src.csv")
+    export_to_file("src", out, "csv", compress=False)
+    stats = import_file(out, "dst")
+    assert stats["inserted"] == 5
+    doc = db["data_dst"].find_one({"name": "n3"})
+    assert doc["tags"] == ["a", "b"]
+    assert doc["_id"] == db["data_src"].find_one({"name": "n3"})["_id"]
+    assert get_source_stats("dst")[0]["record_count"] == 5
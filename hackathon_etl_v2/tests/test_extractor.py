@@ -0,0 +1,53 @@
+# tests/test_extractor.py
+import random, re, time
+from src import extractor
+from src.config import config
+from src.extractor import CHUNK_SCANNERS, detect_chunks_budgeted, json_chunk_spans
+
+def _regex(name):
+    return re.compile(config.CHUNK_PATTERNS[name], re.MULTILINE | re.DOTALL)
+
+def test_json_scanner_matches_the_pattern():
+    samples = ['{"a": 1}', '{"a": 1} {"b": 2}', '{"a": {"b": 1}}\n\nx', '{"a": "}"}  {', "{}a{}\n{}",
+               '{ "id": 1,\n  "x": { "y": 2 }\n}\n\ntext', "}{", "{ }\r\n{", "a { b } c }\n"]
+    for s in samples:
+        assert list(json_chunk_spans(s)) == [m.span() for m in _regex("json").finditer(s)], s
+
+def test_scanners_match_their_patterns_on_random_text():
+    alphabets = {"json": '{} a\n', "html": "<>/a \n", "kv": "a:\n \t", "yaml": "a: \n_\t-"}
+    rng = random.Random(7)
+    for name, scanner in CHUNK_SCANNERS.items():
+        rx = _regex(name)
+        for _ in range(20000):
+            s = "".join(rng.choice(alphabets[name]) for _ in range(rng.randint(0, 12)))
+            assert list(scanner(s)) == [m.span() for m in rx.finditer(s)], (name, s)
+
+def test_pathological_json_input_is_linear():
+    text = "{}a" * 40000
+    t0 = time.perf_counter()
+    assert list(json_chunk_spans(text)) == []
+    chunks = detect_chunks_budgeted(text)
+    assert time.perf_counter() - t0 < 10
+    assert [c["type"] for c in chunks] == ["raw"]
+
+def test_large_clean_csv_keeps_its_chunks(monkeypatch):
+    def no_spawn(*a, **kw):
+        raise AssertionError("detection should not need a worker process")
+    monkeypatch.setattr(extractor, "run_isolated", no_spawn)
+    text = "id,name,price\n" + "".join(f"{i},item{i},{i}.5\n" for i in range(60000))
+    assert len(text) > 1024 * 1024
+    chunks = detect_chunks_budgeted(text)
+    assert [c["type"] for c in chunks] == ["csv"]
+    assert "reason" not in chunks[0]
+
+def test_slow_pattern_only_drops_its_own_matches(monkeypatch):
+    monkeypatch.setattr(config, "CHUNK_PATTERNS", {**config.CHUNK_PATTERNS, "slow": r"x+y"})
+    monkeypatch.setattr(config, "DETECT_INLINE_MS", 0)
+    monkeypatch.setattr(config, "DETECT_INLINE_MS_PER_MB", 0)
+    def isolated(func, args, timeout):
+        if args[0] == "slow":
+            raise extractor.ChunkBudgetExceeded("timeout")
+        return func(*args)
+    monkeypatch.setattr(extractor, "run_isolated", isolated)
+    chunks = detect_chunks_budgeted("a,b\n1,2\nxy xy\n")
+    assert [c["type"] for c in chunks] == ["csv"]
@@ -0,0 +1,43 @@
+# tests/test_field_profiles.py
+import pytest
+from src import pipeline
+from src.field_stats import FieldProfiler, get_field_profile, save_field_profile
+
+def test_profile_counts_presence_nulls_and_quantiles():
+    fp = FieldProfiler()
+    for i in range(100):
+        fp.add_record({"n": i, "s": None if i % 4 == 0 else f"v{i % 3}"})
+    fp.add_record({"other": 1})
+    rows = {r["field"]: r for r in fp.summary()}
+    assert rows["n"]["present"] == 100 and rows["n"]["presence_ratio"] == round(100 / 101, 4)
+    assert rows["s"]["null_ratio"] == 0.25
+    q = rows["n"]["numeric"]["quantiles"]
+    assert q["p0"] == 0 and q["p100"] == 99 and 40 <= q["p50"] <= 60
+    assert rows["n"]["numeric"]["mean"] == 49.5
+
+def test_profiles_fold_across_ingests():
+    a, b = FieldProfiler(), FieldProfiler()
+    a.add_record({"x": 1})
+    b.add_record({"x": 2, "y": "z"})
+    save_field_profile("s", 1, a)
+    save_field_profile("s", 2, b)
+    merged = get_field_profile("s")
+    assert merged.records == 2 and merged.fields["x"].present == 2 and "y" in merged.fields
+    assert get_field_profile("s", 1).records == 1
+    save_field_profile("s", 3, b, merge=False)
+    assert get_field_profile("s").records == 1
+
+def test_visualize_fields_endpoint(tmp_path):
+    pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+    from api.api import app
+    path = tmp_path / "in.txt"
+    path.write_text("sku,qty\nA,1\nB,2\nC,3\n")
+    pipeline.run_pipeline(str(path), "s1")
+    client = TestClient(app)
+    res = client.get("/visualize/fields", params={"source_id": "s1"})
+    assert res.status_code == 200
+    body = res.json()
+    fields = {f["field"]: f for f in body["fields"]}
+    assert body["records"] == 3 and fields["qty"]["present"] == 3
+    assert client.get("/visualize/fields", params={"source_id": "missing"}).status_code == 404
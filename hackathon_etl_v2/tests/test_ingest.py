@@ -0,0 +1,94 @@
+# tests/test_ingest.py
+import json, os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from src import ingest
+from src.config import config
+from src.loader import db
+
+class _ThreadPool(ThreadPoolExecutor):
+    """In-process stand-in for the spawn pool, so workers see the test database."""
+    def __init__(self, max_workers, mp_context=None):
+        super().__init__(max_workers)
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    return str(path)
+
+def test_collect_inputs_expands_dirs_globs_and_manifests(tmp_path):
+    a = _write(tmp_path / "in" / "Sales 2024.txt", "x")
+    b = _write(tmp_path / "in" / "sub" / "b.md", "x")
+    _write(tmp_path / "in" / "skip.csv", "x")
+    c = _write(tmp_path / "other" / "c.html", "x")
+    manifest = tmp_path / "list.txt"
+    manifest.write_text("# comment\n\nother/c.html\tweb\n" + json.dumps({"path": a, "source_id": "dup"}) + "\n")
+
+    flat = ingest.collect_inputs([str(tmp_path / "in")])
+    assert flat == [(a, "sales_2024")]
+    deep = ingest.collect_inputs([str(tmp_path / "in"), str(tmp_path / "in" / "*.txt")], [str(manifest)], recursive=True)
+    # de-duplicated by absolute path, first mention wins; unsupported extensions dropped
+    assert deep == [(a, "sales_2024"), (b, "b"), (c, "web")]
+    assert {sid for _, sid in ingest.collect_inputs([a, c], source_id="all")} == {"all"}
+
+def test_one_file_per_source_in_flight_in_file_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "ProcessPoolExecutor", _ThreadPool)
+    lock = threading.Lock()
+    active, order, peak = {}, [], {"sources": 0}
+
+    def fake_ingest(path, sid, *args):
+        with lock:
+            assert not active.get(sid), f"two files of {sid} in flight"
+            active[sid] = True
+            order.append(path)
+            peak["sources"] = max(peak["sources"], sum(active.values()))
+        time.sleep(0.02)
+        with lock:
+            active[sid] = False
+        if path.endswith("bad.txt"):
+            raise ValueError("unreadable")
+        return {"records": 2, "bytes": 10}
+
+    monkeypatch.setattr(ingest, "ingest_file", fake_ingest)
+    files = [(_write(tmp_path / f"{s}{i}.txt", "x"), s) for i in range(3) for s in ("p", "q", "r")]
+    files.append((_write(tmp_path / "bad.txt", "x"), "q"))
+    res = ingest.run_bulk(files, workers=3, progress=False)
+
+    assert (res["files"], res["failed"], res["records"], res["sources"]) == (9, 1, 18, 3)
+    assert res["failures"][0]["path"].endswith("bad.txt") and res["failures"][0]["error"] == "unreadable"
+    assert peak["sources"] > 1
+    for s in ("p", "q", "r"):
+        mine = [p for p, sid in files if sid == s]
+        assert [p for p in order if p in mine] == mine
+
+def test_state_file_resumes_with_unfinished_and_changed_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "ProcessPoolExecutor", _ThreadPool)
+    seen = []
+    monkeypatch.setattr(ingest, "ingest_file", lambda path, sid, *a: seen.append(path) or {"records": 1, "bytes": 1})
+    files = [(_write(tmp_path / f"f{i}.txt", "x"), "s") for i in range(3)]
+    state = str(tmp_path / "state.jsonl")
+    ingest.run_bulk(files[:2], workers=1, state_path=state, progress=False)
+    with open(state, "a") as f:
+        f.write('{"key": "torn')  # interrupted mid-write
+
+    _write(tmp_path / "f1.txt", "changed")
+    seen.clear()
+    res = ingest.run_bulk(files, workers=1, state_path=state, progress=False)
+    assert res["skipped"] == 1 and sorted(seen) == [files[1][0], files[2][0]]
+
+def test_bulk_ingest_end_to_end(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "ProcessPoolExecutor", _ThreadPool)
+    a = _write(tmp_path / "a.txt", "id,name\n1,x\n")
+    b = _write(tmp_path / "b.txt", "id,name,price\n2,y,3\n")
+    c = _write(tmp_path / "other.txt", "sku,qty\nA,1\nB,2\n")
+    res = ingest.run_bulk([(a, "s"), (b, "s"), (c, "t")], workers=2, progress=False)
+    assert (res["files"], res["failed"], res["records"]) == (3, 0, 4)
+    assert res["bytes"] == sum(os.path.getsize(p) for p in (a, b, c))
+    assert db[f"{config.DATA_COLLECTION_PREFIX}s"].count_documents({}) == 2
+    # schema versions of a source follow file order
+    versions = list(db[config.SCHEMA_REGISTRY_COLLECTION].find({"source_id": "s"}).sort("version", 1))
+    assert "price" not in str(versions[0]) and "price" in str(versions[-1])
+
+def test_spawned_workers_report_back(tmp_path):
+    files = [(_write(tmp_path / f"w{i}.txt", "sku,qty\nA,1\nB,2\n"), f"w{i}") for i in range(2)]
+    res = ingest.run_bulk(files, workers=2, progress=False)
+    assert (res["files"], res["failed"], res["records"]) == (2, 0, 4)
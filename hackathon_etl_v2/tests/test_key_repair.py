@@ -0,0 +1,49 @@
+# tests/test_key_repair.py
+import io, json
+from src import repair
+from src.config import config
+from src.keyfix import looks_like_broken_json_key, repair_document, repair_key
+from src.loader import db, get_data_version, update_source_stats
+
+def test_broken_key_detection():
+    assert looks_like_broken_json_key('{"id": 4, "name"')
+    assert looks_like_broken_json_key('"quoted"')
+    assert looks_like_broken_json_key("a:b")
+    assert not looks_like_broken_json_key("name")
+    assert not looks_like_broken_json_key("_id")
+
+def test_repair_key_variants():
+    assert repair_key('{"id": 4, "name"', ' "Dave"}') == {"id": 4, "name": "Dave"}
+    assert repair_key('"a": 1, "b": 2', None) == {"a": 1, "b": 2}
+    assert repair_key("{'x'", ": 'y'}") == {"x": "y"}
+    assert repair_key('{"a": 1,', "}") == {"a": 1}
+    assert repair_key('{"a": [1, 2', "oops") is None
+
+def test_recovered_fields_never_overwrite_existing_values():
+    doc = {"_id": 1, "id": 7, "name": "", '{"id": 4, "name"': ' "Dave"}', '{"bad': "x"}
+    fixed, entry = repair_document(doc)
+    assert fixed == {"_id": 1, "id": 7, "name": "Dave", '{"bad': "x"}
+    assert entry["set"] == {"name": "Dave"} and entry["unparseable"] == ['{"bad']
+    fixed, entry = repair_document(doc, drop_unparseable=True)
+    assert '{"bad' not in fixed and set(entry["unset"]) == {'{"id": 4, "name"', '{"bad'}
+    assert repair_document({"_id": 2, "ok": 1}) == (None, {"_id": 2, "set": {}, "unset": [], "unparseable": []})
+
+def test_repair_collection_rewrites_documents_and_reports(monkeypatch):
+    # mongomock lacks $anyElementTrue/$bucketAuto: scan every document in one range
+    monkeypatch.setattr(repair, "suspicious_filter", lambda: {})
+    coll = db[f"{config.DATA_COLLECTION_PREFIX}r"]
+    coll.insert_many([{"ok": 1}, {'{"id": 4, "name"': ' "Dave"}'}, {"id": 5, '{"id": 9, "x"': " 1}"}])
+    update_source_stats("r", [], 3, 1)
+    version = get_data_version("r")
+
+    out = io.StringIO()
+    dry = repair.repair_collection(coll.name, workers=1, dry_run=True, report_out=out)
+    assert dry["repaired"] == 2 and coll.count_documents({"name": "Dave"}) == 0
+    assert json.loads(out.getvalue().splitlines()[-1])["summary"]["dry_run"] is True
+    assert get_data_version("r") == version
+
+    res = repair.repair_collection(coll.name, workers=1)
+    assert res["repaired"] == 2 and res["write_errors"] == 0
+    docs = sorted((d for d in coll.find({}, {"_id": 0})), key=lambda d: sorted(d))
+    assert {"id": 4, "name": "Dave"} in docs and {"id": 5, "x": 1} in docs and {"ok": 1} in docs
+    assert get_data_version("r") == version + 1
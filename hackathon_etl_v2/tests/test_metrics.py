@@ -0,0 +1,34 @@
+# tests/test_metrics.py
+import sys, threading
+from src import blobstore, metrics
+
+def test_histogram_scrape_sees_whole_observations():
+    h = metrics.Histogram("test_consistency_seconds", "test", (), (0.5, 2.0))
+    metrics._registry.remove(h)
+    h.observe((), 1.0)
+    stop = threading.Event()
+
+    def observe():
+        while not stop.is_set():
+            h.observe((), 1.0)
+
+    t = threading.Thread(target=observe)
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads often enough to land mid-observation
+    t.start()
+    try:
+        for _ in range(2000):
+            lines = dict(line.rsplit(" ", 1) for line in h.render())
+            assert float(lines["test_consistency_seconds_sum"]) == float(lines["test_consistency_seconds_count"])
+    finally:
+        stop.set()
+        t.join()
+        sys.setswitchinterval(interval)
+
+def test_blob_cache_stats():
+    blob_id = blobstore.put_text("hello " * 100)
+    blobstore.read_range(blob_id, 0, 5)
+    blobstore.read_range(blob_id, 0, 5)
+    stats = blobstore.cache_stats()
+    assert set(stats) == {"blob_block", "blob_header"}
+    assert stats["blob_block"]["hits"] >= 1 and 0 < stats["blob_block"]["hit_rate"] <= 1
@@ -0,0 +1,42 @@
+# tests/test_query_planning.py
+from src.field_stats import FieldProfiler, save_field_profile
+from src.loader import db
+from src.pipeline import commit_schema
+from src.query import compile_query
+
+def _source(n=1000):
+    # "status" is almost always "ok"; "rare" is set on 1% of records; "amount" is 0..999
+    records = [{"id": i, "status": "ok" if i % 50 else "failed", "amount": i} for i in range(n)]
+    for r in records[::100]:
+        r["rare"] = "x"
+    db["data_q"].insert_many([dict(r) for r in records])
+    profiler = FieldProfiler()
+    for r in records:
+        profiler.add_record(r)
+    schema = commit_schema("q", {"fields": {f: {"suggested_type": t, "nullable": f == "rare"} for f, t in
+                                            (("id", "integer"), ("status", "string"), ("amount", "integer"), ("rare", "string"))}})
+    save_field_profile("q", schema["version"], profiler)
+    for f in ("status", "amount", "rare"):
+        db["data_q"].create_index(f, name=f"ix_{f}")
+    return {"status": "ix_status", "amount": "ix_amount", "rare": "ix_rare"}
+
+def _fields(pipeline):
+    match = pipeline[0]["$match"]
+    return [next(iter(c)) for c in match.get("$and", [match])]
+
+def test_orders_predicates_by_profiled_selectivity():
+    indexed = _source()
+    spec = {"where": [{"field": "status", "op": "eq", "value": "ok"},
+                      {"field": "amount", "op": "gte", "value": 990},
+                      {"field": "rare", "op": "exists", "value": True}]}
+    pipeline, hint = compile_query("q", spec, indexed)
+    # amount >= 990 keeps ~1%, rare exists 1%, status == ok 98%
+    assert _fields(pipeline)[-1] == "status"
+    assert hint == "ix_amount"
+
+def test_no_hint_for_unselective_predicate():
+    indexed = _source()
+    pipeline, hint = compile_query("q", {"where": [{"field": "status", "op": "eq", "value": "ok"}]}, indexed)
+    assert hint is None
+    _, hint = compile_query("q", {"where": [{"field": "status", "op": "eq", "value": "failed"}]}, indexed)
+    assert hint == "ix_status"
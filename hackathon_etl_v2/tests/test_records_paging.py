@@ -0,0 +1,48 @@
+# tests/test_records_paging.py
+import pytest
+from src.config import config
+from src.loader import db
+
+fastapi = pytest.importorskip("fastapi")
+from fastapi.testclient import TestClient
+from api.api import app
+
+@pytest.fixture
+def client():
+    db[f"{config.DATA_COLLECTION_PREFIX}pages"].insert_many([{"n": i, "title": f"t{i}"} for i in range(25)])
+    return TestClient(app)
+
+def _walk(client, limit, **params):
+    pages, cursor = [], ""
+    while cursor is not None:
+        res = client.get("/records", params={"source_id": "pages", "limit": limit, "cursor": cursor, **params})
+        assert res.status_code == 200
+        body = res.json()
+        pages.append(body["docs"])
+        cursor = body["next_cursor"]
+    return pages
+
+def test_cursor_pages_cover_every_record_once_in_order(client):
+    pages = _walk(client, 10)
+    assert [len(p) for p in pages] == [10, 10, 5]
+    assert [d["n"] for p in pages for d in p] == list(range(25))
+
+def test_exact_multiple_ends_with_an_empty_page(client):
+    assert [len(p) for p in _walk(client, 5)] == [5, 5, 5, 5, 5, 0]
+
+def test_cursor_paging_with_projection(client):
+    [first, *_] = _walk(client, 10, fields="n")
+    assert set(first[0]) == {"_id", "n"}
+
+def test_cursor_survives_inserts_behind_it(client):
+    res = client.get("/records", params={"source_id": "pages", "limit": 10, "cursor": ""}).json()
+    db[f"{config.DATA_COLLECTION_PREFIX}pages"].insert_one({"n": 25})
+    nxt = client.get("/records", params={"source_id": "pages", "limit": 100, "cursor": res["next_cursor"]}).json()
+    assert [d["n"] for d in nxt["docs"]] == list(range(10, 26))
+
+def test_bad_cursor_and_legacy_offset_paging(client, monkeypatch):
+    assert client.get("/records", params={"source_id": "pages", "cursor": "not-a-cursor"}).status_code == 400
+    legacy = client.get("/records", params={"source_id": "pages", "limit": 10, "page": 2}).json()
+    assert [d["n"] for d in legacy] == list(range(20, 25))
+    monkeypatch.setattr(config, "RECORDS_MAX_LIMIT", 3)
+    assert len(client.get("/records", params={"source_id": "pages", "limit": 50, "cursor": ""}).json()["docs"]) == 3
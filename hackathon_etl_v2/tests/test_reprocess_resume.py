@@ -0,0 +1,129 @@
+# tests/test_reprocess_resume.py
+from collections import Counter
+from datetime import datetime
+import pytest
+from src import pipeline, reprocess
+from src.batch import RecordBatch
+from src.config import config
+from src.loader import db
+from src.runs import RunStateError
+
+def _ingest(tmp_path, source_id="s1"):
+    parts = []
+    for i in range(6):
+        parts.append('{"id": %d, "name": "item%d", "price": %d.5}' % (i, i, i))
+        parts.append("sku,qty\nA%d,%d\nB%d,%d" % (i, i, i, i + 1))
+    path = tmp_path / "in.txt"
+    path.write_text("\n\n".join(parts) + "\n")
+    pipeline.run_pipeline(str(path), source_id)
+
+def _records(source_id="s1"):
+    return Counter((r["_chunk_id"], str(sorted((k, str(v)) for k, v in r.items() if k not in ("_id", "_chunk_id", "_run_id", "_batch"))))
+                   for r in db[f"{config.DATA_COLLECTION_PREFIX}{source_id}"].find())
+
+def test_crashed_reprocess_resumes_without_losing_records(tmp_path, monkeypatch):
+    _ingest(tmp_path)
+    before = _records()
+    monkeypatch.setattr(config, "PARSER_VERSIONS", {**config.PARSER_VERSIONS, "json": 99, "csv": 99})
+    monkeypatch.setattr(config, "REPROCESS_BATCH_CHUNKS", 2)
+
+    calls = []
+    real = reprocess.records_for_chunk
+
+    def crashing(chunk):
+        calls.append(chunk["type"])
+        if len(calls) == 5:
+            raise RuntimeError("worker killed")
+        return real(chunk)
+
+    monkeypatch.setattr(reprocess, "records_for_chunk", crashing)
+    with pytest.raises(RuntimeError):
+        reprocess.reprocess_source("s1")
+    assert db[config.REPROCESS_CHECKPOINTS_COLLECTION].find_one({"source_id": "s1"})["done_reparse"] == 4
+
+    monkeypatch.setattr(reprocess, "records_for_chunk", real)
+    res = reprocess.reprocess_source("s1")
+    assert res["status"] == "ok"
+    assert _records() == before
+    assert all(c["parser_version"] == 99 for c in db[config.CHUNKS_COLLECTION].find({"source_id": "s1", "type": {"$in": ["json", "csv"]}}))
+    assert db[config.REPROCESS_CHECKPOINTS_COLLECTION].find_one({"source_id": "s1"}) is None
+    assert reprocess.reprocess_source("s1")["status"] == "up_to_date"
+
+def test_unflushed_batch_is_replaced_not_duplicated(tmp_path, monkeypatch):
+    _ingest(tmp_path)
+    before = _records()
+    monkeypatch.setattr(config, "PARSER_VERSIONS", {**config.PARSER_VERSIONS, "csv": 99})
+    monkeypatch.setattr(config, "REPROCESS_BATCH_CHUNKS", 3)
+
+    # crash after the first batch's records are staged but before its checkpoint is written
+    real_checkpoints = reprocess._checkpoints
+    class Flaky:
+        def __init__(self):
+            self.coll = real_checkpoints()
+        def __getattr__(self, name):
+            return getattr(self.coll, name)
+        def update_one(self, flt, update, *a, **kw):
+            if any(k.startswith("done_") and v for k, v in update.get("$set", {}).items()):
+                raise RuntimeError("connection lost")
+            return self.coll.update_one(flt, update, *a, **kw)
+    monkeypatch.setattr(reprocess, "_checkpoints", Flaky)
+    with pytest.raises(RuntimeError):
+        reprocess.reprocess_source("s1")
+
+    monkeypatch.setattr(reprocess, "_checkpoints", real_checkpoints)
+    assert reprocess.reprocess_source("s1")["status"] == "ok"
+    assert _records() == before
+
+def _tokens(source_id="s1"):
+    return {d["_id"]: d["count"] for d in db[f"{config.TOKEN_COLLECTION_PREFIX}{source_id}"].find()}
+
+def test_swap_keeps_indexes_and_recounts_profile_and_tokens(tmp_path, monkeypatch):
+    path = tmp_path / "in.txt"
+    path.write_text("\n\n".join("sku,qty\nA%d,%d\nB%d,%d" % (i, i, i, i + 1) for i in range(6)) + "\n")
+    pipeline.run_pipeline(str(path), "s1", typed=True)
+    data = db[f"{config.DATA_COLLECTION_PREFIX}s1"]
+    indexes = set(data.index_information())
+    assert {"run_batch", "typed_qty"} <= indexes
+    tokens = _tokens()
+    monkeypatch.setattr(config, "PARSER_VERSIONS", {**config.PARSER_VERSIONS, "csv": 99})
+    # the "new parser" adds a field to every record
+    real = reprocess.records_for_chunk
+    monkeypatch.setattr(reprocess, "records_for_chunk", lambda chunk: RecordBatch.from_records(
+        [{**r, "note": "zebra"} for r in real(chunk).head(1000)]))
+    assert reprocess.reprocess_source("s1")["status"] == "ok"
+    assert indexes <= set(data.index_information())
+    n = data.count_documents({})
+    assert _tokens() == {**tokens, "zebra": n}
+    profile = db[config.FIELD_PROFILES_COLLECTION].find_one({"source_id": "s1"}, sort=[("version", -1)])
+    assert profile["records"] == n
+    assert "note" in [f["field"] for f in profile["fields"]]
+
+def test_refuses_while_a_run_is_live(tmp_path, monkeypatch):
+    _ingest(tmp_path)
+    monkeypatch.setattr(config, "PARSER_VERSIONS", {**config.PARSER_VERSIONS, "csv": 99})
+    now = datetime.utcnow().isoformat() + "Z"
+    db[config.PIPELINE_RUNS_COLLECTION].insert_one({"run_id": "live", "source_id": "s1", "status": "running",
+                                                    "owner": "elsewhere:1", "started_at": now, "heartbeat_at": now})
+    with pytest.raises(RunStateError):
+        reprocess.reprocess_source("s1")
+
+def test_records_of_a_run_during_reprocess_survive_the_swap(tmp_path, monkeypatch):
+    _ingest(tmp_path)
+    clean = db[f"{config.DATA_COLLECTION_PREFIX}s1"].count_documents({})
+    monkeypatch.setattr(config, "PARSER_VERSIONS", {**config.PARSER_VERSIONS, "csv": 99})
+    other = tmp_path / "more.txt"
+    other.write_text("sku,qty\nC1,1\nC2,2\n")
+    real = reprocess.records_for_chunk
+    calls = []
+
+    def ingest_meanwhile(chunk):
+        calls.append(chunk)
+        if len(calls) == 1:
+            pipeline.run_pipeline(str(other), "s1")
+        return real(chunk)
+
+    monkeypatch.setattr(reprocess, "records_for_chunk", ingest_meanwhile)
+    res = reprocess.reprocess_source("s1")
+    assert res["status"] == "ok"
+    assert res["records"] == clean + 2
+    assert db[f"{config.DATA_COLLECTION_PREFIX}s1"].count_documents({"sku": "C2"}) == 1
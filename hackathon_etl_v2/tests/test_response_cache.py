@@ -0,0 +1,35 @@
+# tests/test_response_cache.py
+import pytest
+from src.config import config
+from src.loader import db, update_source_stats
+
+fastapi = pytest.importorskip("fastapi")
+from fastapi.testclient import TestClient
+from api.api import app
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(config, "GZIP_MIN_BYTES", 1)
+    db["data_s"].insert_one({"a": 1})
+    update_source_stats("s", [], 1, 1)
+    return TestClient(app)
+
+def test_etag_differs_per_content_coding(client):
+    plain = client.get("/sources", headers={"Accept-Encoding": "identity"})
+    gz = client.get("/sources", headers={"Accept-Encoding": "gzip"})
+    assert plain.headers.get("content-encoding") is None
+    assert gz.headers["content-encoding"] == "gzip"
+    assert plain.headers["etag"] != gz.headers["etag"]
+    assert "Accept-Encoding" in plain.headers["vary"] and "Accept-Encoding" in gz.headers["vary"]
+
+def test_conditional_get_per_representation(client):
+    gz = client.get("/sources", headers={"Accept-Encoding": "gzip"})
+    hit = client.get("/sources", headers={"Accept-Encoding": "gzip", "If-None-Match": gz.headers["etag"]})
+    assert hit.status_code == 304 and hit.headers["etag"] == gz.headers["etag"]
+    # a client that can't take gzip must not be told its gzip copy is current
+    miss = client.get("/sources", headers={"Accept-Encoding": "identity", "If-None-Match": gz.headers["etag"]})
+    assert miss.status_code == 200
+    # a new ingest changes the version, and with it every ETag
+    update_source_stats("s", [], 1, 1)
+    again = client.get("/sources", headers={"Accept-Encoding": "gzip", "If-None-Match": gz.headers["etag"]})
+    assert again.status_code == 200
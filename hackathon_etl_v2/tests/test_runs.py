@@ -0,0 +1,87 @@
+# tests/test_runs.py
+import json
+from datetime import datetime, timedelta
+import pytest
+from src import pipeline
+from src.config import config
+from src.loader import db, get_current_schema
+from src.runs import RunStateError, rollback_run
+
+def _write(tmp_path, records):
+    path = tmp_path / "in.txt"
+    path.write_text("\n\n".join(json.dumps(r) for r in records) + "\n")
+    return str(path)
+
+def test_schema_sees_fields_outside_the_sample(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "RUN_SCHEMA_SAMPLE", 3)
+    records = [{"id": i, "price": i} for i in range(40)]
+    records[25]["rare"] = "x"
+    records[31]["price"] = 2.5
+    records[37]["id"] = None
+    pipeline.run_pipeline(_write(tmp_path, records), "s1")
+    fields = get_current_schema("s1")["fields"]
+    assert fields["rare"]["suggested_type"] == "string"
+    assert fields["price"]["suggested_type"] == "decimal"
+    assert fields["id"]["nullable"] is True
+    assert "id" not in get_current_schema("s1")["primary_key_candidates"]
+
+def _clean_count(path):
+    return pipeline.run_pipeline(path, "clean")["records"]
+
+def _failed_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "RUN_BATCH_CHUNKS", 2)
+    path = _write(tmp_path, [{"id": i} for i in range(6)])
+    real = pipeline.records_for_chunk
+    calls = []
+
+    def crashing(chunk):
+        calls.append(chunk["type"])
+        if len(calls) == 4:
+            raise RuntimeError("killed")
+        return real(chunk)
+
+    monkeypatch.setattr(pipeline, "records_for_chunk", crashing)
+    with pytest.raises(RuntimeError):
+        pipeline.run_pipeline(path, "s1")
+    monkeypatch.setattr(pipeline, "records_for_chunk", real)
+    return db[config.PIPELINE_RUNS_COLLECTION].find_one({"source_id": "s1", "status": "error"})["run_id"]
+
+def _mark_running(run_id, heartbeat_age: float, owner: str):
+    beat = (datetime.utcnow() - timedelta(seconds=heartbeat_age)).isoformat() + "Z"
+    db[config.PIPELINE_RUNS_COLLECTION].update_one(
+        {"run_id": run_id}, {"$set": {"status": "running", "heartbeat_at": beat, "owner": owner}})
+
+def test_resume_refuses_a_live_run(tmp_path, monkeypatch):
+    run_id = _failed_run(tmp_path, monkeypatch)
+    # another host with a fresh heartbeat: can't tell it's dead
+    _mark_running(run_id, 5, "elsewhere:1234")
+    with pytest.raises(RunStateError, match="still running"):
+        pipeline.resume_pipeline(run_id)
+    with pytest.raises(RunStateError, match="still running"):
+        rollback_run(run_id)
+
+def test_resume_takes_over_an_expired_lease(tmp_path, monkeypatch):
+    run_id = _failed_run(tmp_path, monkeypatch)
+    _mark_running(run_id, config.RUN_LEASE_SECONDS + 1, "elsewhere:1234")
+    out = pipeline.resume_pipeline(run_id)
+    expected = _clean_count(str(tmp_path / "in.txt"))
+    assert out["records"] == expected
+    assert db[f"{config.DATA_COLLECTION_PREFIX}s1"].count_documents({}) == expected
+
+def test_resume_takes_over_a_dead_local_owner(tmp_path, monkeypatch):
+    import subprocess, sys
+    from src.tracing import run_owner
+    run_id = _failed_run(tmp_path, monkeypatch)
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    _mark_running(run_id, 5, f"{run_owner().rpartition(':')[0]}:{proc.pid}")
+    assert pipeline.resume_pipeline(run_id)["records"] == _clean_count(str(tmp_path / "in.txt"))
+
+def test_rollback_bumps_data_versions(tmp_path, monkeypatch):
+    from src.loader import get_data_version
+    pipeline.run_pipeline(_write(tmp_path, [{"id": 1}]), "s1")
+    run_id = _failed_run(tmp_path, monkeypatch)
+    before = get_data_version("s1"), get_data_version()
+    rollback_run(run_id)
+    assert get_data_version("s1") > before[0]
+    assert get_data_version() > before[1]
@@ -0,0 +1,57 @@
+# tests/test_salvage.py
+import json
+from src import salvage
+from src.config import config
+
+LINES = [
+    '{"id": 1, "name": "ok"}',
+    '{"{\\"id\\": 4, \\"name\\"": " \\"Dave\\"}"}',
+    'garbage {"a": 1} more {"b": [2, 3]} tail',
+    'list [1, 2] only',
+    'prefix {"x": "}"} suffix',
+    '',
+    'no json here',
+    '[1, 2, 3]',
+]
+
+def test_json_spans_ignore_brackets_in_strings():
+    s = 'x {"a": "}{"} y [1, [2]] ]'
+    assert [(s[a:b], d) for a, b, d in salvage.json_spans(s)] == [('{"a": "}{"}', 0), ("[2]", 1), ("[1, [2]]", 0)]
+
+def test_repair_line_tags():
+    tags = [salvage.repair_line(line)[1] for line in LINES]
+    assert tags == ["ok", "keys_fixed", "salvaged_merged", "salvaged_list", "salvaged_merged", "empty", "raw_only", "ok"]
+    doc, _, details = salvage.repair_line(LINES[1])
+    assert doc == {"id": 4, "name": "Dave"} and details["set"] == ["id", "name"]
+    doc, _, _ = salvage.repair_line(LINES[2])
+    assert doc["salvaged_json"]["merged_object"] == {"a": 1, "b": [2, 3]} and doc["_raw_line"] == LINES[2]
+    assert salvage.repair_line(LINES[7])[0] == {"value": [1, 2, 3]}
+
+def test_shards_end_on_line_boundaries(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "SALVAGE_MIN_SHARD_BYTES", 64)
+    path = tmp_path / "in.jsonl"
+    path.write_text("\n".join(json.dumps({"n": i, "pad": "x" * (i % 7)}) for i in range(200)) + "\n")
+    data = path.read_bytes()
+    bounds = salvage.shard_bounds(str(path), 8)
+    assert len(bounds) == 8 and bounds[0][0] == 0 and bounds[-1][1] == len(data)
+    for (_, end), (start, _) in zip(bounds, bounds[1:]):
+        assert end == start and data[end - 1:end] == b"\n"
+
+def test_repair_file_round_trip_keeps_line_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "SALVAGE_MIN_SHARD_BYTES", 1)
+    lines = [LINES[i % len(LINES)] for i in range(40)]
+    src = tmp_path / "backup.jsonl"
+    src.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    out, report = tmp_path / "out.jsonl", tmp_path / "report.ndjson"
+    totals = salvage.repair_file(str(src), str(out), str(report), workers=2)
+
+    expected = [salvage.repair_line(line)[0] for line in lines]
+    assert [json.loads(l) for l in out.read_text(encoding="utf-8").splitlines()] == [d for d in expected if d is not None]
+    assert totals["total"] == 40 and totals["shards"] > 1 and totals["empty"] == 5
+    rep = [json.loads(l) for l in report.read_text(encoding="utf-8").splitlines()]
+    assert rep[-1] == {"summary": totals}
+    # one report line per line that needed work, pointing at its byte offset
+    raw = src.read_bytes()
+    for r in rep[:-1]:
+        line = raw[r["offset"]:raw.index(b"\n", r["offset"])].decode("utf-8")
+        assert salvage.repair_line(line)[1] == r["tag"] != "ok"
@@ -0,0 +1,41 @@
+# tests/test_schema_commit.py
+import pytest
+from src import pipeline
+from src.config import config
+from src.loader import db, ensure_indexes, get_current_schema, try_save_schema
+
+def _guess(**fields):
+    return {"fields": {k: {"suggested_type": t, "nullable": False} for k, t in fields.items()}}
+
+def test_lost_race_keeps_winners_fields(monkeypatch):
+    pipeline.commit_schema("s", _guess(id="integer"))
+    monkeypatch.setattr(config, "SCHEMA_COMMIT_BACKOFF", 0.0)
+    raced = []
+
+    def racing_save(schema):
+        if not raced:
+            # a concurrent writer claims the same version first, adding "email"
+            raced.append(True)
+            winner = pipeline.SchemaEvolver.evolve(get_current_schema("s"), _guess(id="integer", email="string"), "s")[0]
+            assert try_save_schema(winner)
+        return try_save_schema(schema)
+
+    monkeypatch.setattr(pipeline, "try_save_schema", racing_save)
+    out = pipeline.commit_schema("s", _guess(id="integer", price="decimal"))
+    assert out["version"] == 3
+    assert set(out["fields"]) == {"id", "email", "price"}
+    assert get_current_schema("s")["version"] == 3
+
+def test_merge_keeps_nullable():
+    current = {"fields": {"a": {"suggested_type": "string", "nullable": True}}}
+    merged = pipeline.merge_schema_fields(current, _guess(a="string", b="integer"))
+    assert merged["fields"]["a"]["nullable"] is True
+    assert set(merged["fields"]) == {"a", "b"}
+
+def test_duplicate_versions_refuse_to_start():
+    registry = db[config.SCHEMA_REGISTRY_COLLECTION]
+    registry.drop()
+    registry.insert_many([{"source_id": "s", "version": 1}, {"source_id": "s", "version": 1},
+                          {"source_id": "t", "version": 1}])
+    with pytest.raises(RuntimeError, match="s v1"):
+        ensure_indexes()
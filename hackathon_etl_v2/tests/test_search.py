@@ -0,0 +1,70 @@
+# tests/test_search.py
+from bson import ObjectId
+from src import search
+from src.config import config
+from src.loader import db
+
+def _index(texts, source_id="s1"):
+    ids = [ObjectId() for _ in texts]
+    search.index_chunks(source_id, ids, texts)
+    return ids
+
+def _ranked(q, **kw):
+    return [r["chunk_id"] for r in search.search(q, **kw)["results"]]
+
+def _df(term):
+    doc = db[config.SEARCH_TERMS_COLLECTION].find_one({"_id": term})
+    return doc["df"] if doc else 0
+
+def test_more_matched_terms_then_higher_impact_rank_first():
+    ids = _index(["red widget", "red red red widget", "blue widget", "red"])
+    assert _ranked("red widget")[:2] == [str(ids[1]), str(ids[0])]
+    # (1 + ln 3) / 2 > 1 / 1 > 1 / sqrt 2
+    assert _ranked("red") == [str(ids[1]), str(ids[3]), str(ids[0])]
+    res = search.search("widget")["results"]
+    assert {r["chunk_id"] for r in res} == {str(i) for i in ids[:3]}
+
+def test_offsets_and_source_filter():
+    [a] = _index(["alpha beta alpha"], "s1")
+    [b] = _index(["alpha"], "s2")
+    [hit] = search.search("alpha", source_id="s1")["results"]
+    assert hit["chunk_id"] == str(a) and hit["offsets"] == {"alpha": [0, 11]}
+    assert _ranked("alpha", source_id="s2") == [str(b)]
+
+def test_blocks_delta_encode_chunk_ids(monkeypatch):
+    monkeypatch.setattr(config, "SEARCH_BLOCK_POSTINGS", 3)
+    ids = _index([f"shared word{i}" for i in range(7)])
+    blocks = list(db[config.SEARCH_POSTINGS_COLLECTION].find({"term": "shared"}).sort("first", 1))
+    assert [b["n"] for b in blocks] == [3, 3, 1]
+    assert blocks[0]["chunks"][0] == 0 and all(d > 0 for d in blocks[0]["chunks"][1:])
+    assert [cid for b in blocks for cid in search.block_chunk_ids(b)] == ids
+    assert _df("shared") == 7
+
+def test_top_postings_per_term_are_exact_across_blocks(monkeypatch):
+    monkeypatch.setattr(config, "SEARCH_BLOCK_POSTINGS", 2)
+    monkeypatch.setattr(config, "SEARCH_CANDIDATES_PER_TERM", 3)
+    texts = ["hit " + "pad " * n for n in (9, 0, 7, 1, 8, 2)]
+    ids = _index(texts)
+    # shortest chunks have the highest impact
+    assert _ranked("hit") == [str(ids[i]) for i in (1, 3, 5)]
+
+def test_remove_chunks_drops_hits_and_document_frequencies(monkeypatch):
+    monkeypatch.setattr(config, "SEARCH_BLOCK_POSTINGS", 2)
+    ids = _index(["gamma one", "gamma two", "gamma three", "delta"])
+    search.remove_chunks([ids[1], ids[3]])
+    assert set(_ranked("gamma")) == {str(ids[0]), str(ids[2])}
+    assert _ranked("delta") == [] and _df("delta") == 0
+    assert _df("gamma") == 2
+    meta = db[config.META_COLLECTION].find_one({"_id": "search_chunks"})
+    assert meta["value"] == 2
+
+def test_clear_and_rebuild_one_source():
+    from src.loader import save_chunks
+    ids = save_chunks("s1", [{"type": "raw", "content": "kappa lambda", "start": 0, "end": 12}])
+    search.index_chunks("s1", ids, ["kappa lambda"])
+    _index(["kappa"], "s2")
+    search.clear_index("s1")
+    assert _df("kappa") == 1 and _df("lambda") == 0
+    assert _ranked("lambda") == []
+    assert search.rebuild_index("s1") == 1
+    assert _ranked("lambda") == [str(ids[0])] and _df("kappa") == 2
@@ -0,0 +1,20 @@
+# tests/test_snapshot.py
+import pytest
+from src.snapshot import _ColumnBuilder, write_columns
+
+MIXED = [{"t": "a", "n": 1}, {"t": ["x"], "n": {"k": 1}}, {"t": "b", "n": 2}, {"t": {"y": 2}, "n": None}]
+
+def test_nested_value_after_category_skips_the_field():
+    b = _ColumnBuilder(0)
+    for v in ("a", True, ["x"], "b", {"k": 1}, 5):
+        b.add(v)
+    assert b.kind == "skip"
+    assert b.codes is None and b.cats == [] and b.index == {}
+    assert len(b.state) == 6
+
+def test_write_columns_skips_mixed_scalar_and_nested_fields(tmp_path):
+    pytest.importorskip("numpy")
+    meta = write_columns(str(tmp_path / "snap"), MIXED + [{"t": "c", "s": "z"}], {})
+    assert sorted(meta["skipped"]) == ["n", "t"]
+    assert [c["name"] for c in meta["columns"]] == ["s"]
+    assert meta["rows"] == 5
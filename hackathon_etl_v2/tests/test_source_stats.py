@@ -0,0 +1,54 @@
+# tests/test_source_stats.py
+import pytest
+from src import loader
+from src.config import config
+from src.loader import (db, ensure_source_stats, get_data_version, get_source_stats,
+                        rebuild_source_stats, update_source_stats)
+
+def _stats(source_id):
+    [st] = get_source_stats(source_id)
+    return st
+
+def test_ingests_fold_into_the_stats_document():
+    update_source_stats("s", [{"type": "csv"}, {"type": "json"}], 5, 2)
+    update_source_stats("s", [{"type": "csv"}], 3, 1)
+    st = _stats("s")
+    assert st["record_count"] == 8 and st["chunk_count"] == 3
+    assert st["chunk_types"] == {"csv": 2, "json": 1}
+    # an older writer finishing late doesn't roll the version back
+    assert st["latest_version"] == 2
+    assert get_data_version("s") == 2 and get_data_version() >= 2
+
+def test_rebuild_counts_from_stored_data():
+    db[config.CHUNKS_COLLECTION].insert_many([{"source_id": "s", "type": "csv"}, {"source_id": "s", "type": None}])
+    db[f"{config.DATA_COLLECTION_PREFIX}s"].insert_many([{"a": i} for i in range(4)])
+    db[config.SCHEMA_REGISTRY_COLLECTION].insert_many([{"source_id": "s", "version": v} for v in (1, 3)])
+    update_source_stats("s", [], 100, 1)
+    before = get_data_version("s")
+    assert rebuild_source_stats(["s"]) == 1
+    st = _stats("s")
+    assert st["record_count"] == 4 and st["chunk_types"] == {"csv": 1, "raw": 1}
+    assert st["latest_version"] == 3 and st["data_version"] == before + 1
+
+def test_sources_stored_before_stats_are_backfilled(monkeypatch):
+    monkeypatch.setattr(loader, "_stats_backfilled", False)
+    db[f"{config.DATA_COLLECTION_PREFIX}legacy"].insert_many([{"a": 1}, {"a": 2}])
+    db[f"{config.DATA_COLLECTION_PREFIX}legacy__reprocess"].insert_one({"a": 1})
+    update_source_stats("fresh", [], 1, 1)
+    assert ensure_source_stats() == 1
+    assert [st["source_id"] for st in get_source_stats()] == ["fresh", "legacy"]
+    assert _stats("legacy")["record_count"] == 2
+    # once per process
+    db[f"{config.DATA_COLLECTION_PREFIX}later"].insert_one({"a": 1})
+    assert ensure_source_stats() == 0
+
+def test_sources_endpoint_lists_backfilled_sources(monkeypatch):
+    pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+    from api.api import app, response_cache
+    # entries cached by earlier tests are keyed by data versions this fresh store reuses
+    response_cache.clear()
+    monkeypatch.setattr(loader, "_stats_backfilled", False)
+    db[f"{config.DATA_COLLECTION_PREFIX}legacy"].insert_one({"a": 1})
+    body = TestClient(app).get("/sources").json()
+    assert [(s["source_id"], s["record_count"]) for s in body] == [("legacy", 1)]
@@ -0,0 +1,52 @@
+# tests/test_tokens.py
+import random
+from collections import Counter
+from src.config import config
+from src.loader import db, save_token_counts
+from src.tokens import SpaceSaving, TokenIndexer, tokenize, tokenize_with_offsets
+
+def test_tokenize_lowercases_and_drops_stopwords():
+    assert list(tokenize("The Widget and a BLUE-ish x_1 widget")) == ["widget", "blue-ish", "x_1", "widget"]
+
+def test_offsets_point_into_the_original_text():
+    text = "Straße  ARRIVES today"
+    for tok, pos in tokenize_with_offsets(text):
+        assert text[pos:pos + len(tok)].lower() == tok
+
+def test_space_saving_is_exact_below_capacity():
+    ss = SpaceSaving(10)
+    for item in "aababcabcd":
+        ss.add(item)
+    assert ss.top() == [("a", 4, 0), ("b", 3, 0), ("c", 2, 0), ("d", 1, 0)]
+
+def test_space_saving_keeps_heavy_hitters_with_bounded_error():
+    rng = random.Random(1)
+    stream = [f"hot{i}" for i in range(5) for _ in range(300)] + [f"rare{rng.randint(0, 5000)}" for _ in range(3000)]
+    rng.shuffle(stream)
+    true = Counter(stream)
+    ss = SpaceSaving(50)
+    for item in stream:
+        ss.add(item)
+    top = {i: (c, e) for i, c, e in ss.top()}
+    assert len(top) == 50 and ss.total == len(stream)
+    for i in range(5):
+        count, err = top[f"hot{i}"]
+        assert count - err <= true[f"hot{i}"] <= count
+    assert [i for i, _, _ in ss.top(5)] == sorted(f"hot{i}" for i in range(5))
+
+def test_indexer_skips_bookkeeping_fields_and_walks_nested_values():
+    ti = TokenIndexer(100)
+    ti.add_record({"_raw": "ignored words", "_chunk_type": "csv", "name": "Red widget",
+                   "tags": ["red", {"deep": "widget"}], "n": 5})
+    assert dict(ti.top()) == {"red": 2, "widget": 2}
+    again = TokenIndexer.from_state(ti.to_state())
+    again.add_text("red")
+    assert dict(again.top()) == {"red": 3, "widget": 2}
+
+def test_token_counts_merge_across_ingests_or_replace():
+    coll = db[f"{config.TOKEN_COLLECTION_PREFIX}s"]
+    save_token_counts("s", [("red", 2), ("blue", 1)])
+    save_token_counts("s", [("red", 3)])
+    assert {d["_id"]: d["count"] for d in coll.find()} == {"red": 5, "blue": 1}
+    save_token_counts("s", [("green", 4)], replace=True)
+    assert {d["_id"]: d["count"] for d in coll.find()} == {"green": 4}
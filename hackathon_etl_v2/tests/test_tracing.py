@@ -0,0 +1,47 @@
+# tests/test_tracing.py
+import os, sys
+from src import pipeline
+from src.tracing import RunTrace, get_run, slowest_runs, stage_breakdown
+
+def _ingest(tmp_path, name="in.txt", source_id="s1", **kw):
+    path = tmp_path / name
+    path.write_text('{"id": 1, "name": "a"}\n\nsku,qty\nA,1\nB,2\n')
+    return pipeline.run_pipeline(str(path), source_id, **kw)
+
+def test_run_document_carries_stage_counters_and_memory(tmp_path):
+    _ingest(tmp_path)
+    [run] = slowest_runs(5, "s1")
+    run = get_run(run["run_id"], with_state=True)
+    assert run["status"] == "ok" and run["error"] is None
+    assert {"detect", "store_chunks", "infer"} <= set(run["stages"])
+    assert run["chunk_types"]["csv"]["count"] >= 1
+    assert run["bytes_in"] > 0 and run["records_out"] > 0 and run["chunks"] > 0
+    assert "state" not in run["checkpoint"]
+    if sys.platform.startswith("linux"):
+        assert 0 < run["peak_rss_mb"] <= run["process_peak_rss_mb"] + 1
+
+def test_peak_rss_is_sampled_per_run(monkeypatch):
+    from src import tracing
+    rss = iter([50.0, 80.0, 60.0, 70.0])
+    monkeypatch.setattr(tracing, "_rss_mb", lambda: next(rss))
+    trace = RunTrace("s1", "x.txt")
+    with trace.span("parse"):
+        pass
+    trace.sample_rss()
+    doc = trace.finish()
+    assert doc["peak_rss_mb"] == 80.0
+
+def test_profiled_run_dumps_stats(tmp_path):
+    summary = _ingest(tmp_path, profile=True)
+    assert os.path.exists(summary["profile_path"])
+    run = get_run(slowest_runs(5, "s1")[0]["run_id"])
+    assert run["profile_top"] and run["peak_traced_mb"] >= 0
+
+def test_stage_breakdown_sums_runs(tmp_path):
+    _ingest(tmp_path, "a.txt")
+    _ingest(tmp_path, "b.txt")
+    runs = slowest_runs(5, "s1")
+    out = stage_breakdown(runs)
+    assert out["runs"] == 2
+    assert out["chunk_types"]["csv"]["count"] == sum(r["chunk_types"]["csv"]["count"] for r in runs)
+    assert all(0 <= s["share"] <= 1 for s in out["stages"].values())